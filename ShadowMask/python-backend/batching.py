@@ -0,0 +1,122 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Collects work items (explicit windows, implicit sentences) coming from
+    concurrent requests and runs them through the model together.
+
+    A batch is closed as soon as it holds `max_batch_size` items or the oldest
+    item in it has waited `max_wait_ms`. `run_batch` receives the list of items
+    and must return one result per item, in the same order. Every caller gets
+    its own result back through a Future.
+
+    `workers` threads collect and run batches side by side; each of them calls
+    `worker_init` once when it starts (e.g. to set its torch thread budget).
+    """
+
+    def __init__(self, name, run_batch, max_batch_size=16, max_wait_ms=5.0, workers=1, worker_init=None):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.workers = max(1, int(workers))
+        self.worker_init = worker_init
+
+        self._queue = queue.Queue()
+        self._worker_threads = None
+        self._worker_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._last_fill_ratio = 0.0
+
+    # --- Public API ---
+
+    def submit(self, item):
+        """Queues a single item and returns a Future for its result."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def run(self, items):
+        """Queues all `items` and blocks until every result is available."""
+        futures = [self.submit(item) for item in items]
+        return [future.result() for future in futures]
+
+    def stats(self):
+        with self._stats_lock:
+            batches = self._batches
+            items = self._items
+            last_fill_ratio = self._last_fill_ratio
+        return {
+            "queue_depth": self._queue.qsize(),
+            "workers": self.workers,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": batches,
+            "items": items,
+            "avg_batch_size": items / batches if batches else 0.0,
+            "avg_fill_ratio": items / (batches * self.max_batch_size) if batches else 0.0,
+            "last_fill_ratio": last_fill_ratio,
+        }
+
+    # --- Worker ---
+
+    def _ensure_worker(self):
+        if self._worker_threads is not None:
+            return
+        with self._worker_lock:
+            if self._worker_threads is None:
+                threads = [
+                    threading.Thread(target=self._loop, name=f"{self.name}-batcher-{i}", daemon=True)
+                    for i in range(self.workers)
+                ]
+                for thread in threads:
+                    thread.start()
+                self._worker_threads = threads
+
+    def _collect_batch(self):
+        # Block for the first item, then keep filling until the batch is full or the wait is over
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        if self.worker_init is not None:
+            self.worker_init()
+        while True:
+            batch = self._collect_batch()
+            items = [item for item, _ in batch]
+            try:
+                results = list(self.run_batch(items))
+                if len(results) != len(items):
+                    raise ValueError(f"{self.name} batch returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                logging.exception(f"{self.name} batch of {len(items)} failed")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(items)
+                self._last_fill_ratio = len(items) / self.max_batch_size
@@ -0,0 +1,50 @@
+"""
+Compares tokens/sec of the explicit model between the old one-window-at-a-time
+loop (batch size 1) and batched window inference.
+
+Usage (from python-backend/):
+    python benchmarks/bench_explicit_batching.py --tokens 20000 --batch-sizes 1 8 16 32
+"""
+import argparse
+import time
+
+from common import build_document
+
+from explicit_model import model as explicit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=20000, help="Approximate document size in tokens")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16, 32])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per batch size (best run is reported)")
+    args = parser.parse_args()
+
+    explicit.loader.ensure_loaded()
+    text = build_document(args.tokens, explicit.tokenizer)
+    n_tokens = len(explicit.tokenizer(text, add_special_tokens=False)["input_ids"])
+    print(f"Document: {len(text)} chars, {n_tokens} tokens")
+
+    # Warm-up so the first measured run does not pay for lazy initialisation
+    explicit.predict_explicit_pii(text[:2000], batch_size=1)
+
+    baseline = None
+    reference = None
+    for batch_size in args.batch_sizes:
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            entities = explicit.predict_explicit_pii(text, batch_size=batch_size)
+            best = min(best, time.perf_counter() - start)
+
+        if reference is None:
+            reference = entities
+        tokens_per_sec = n_tokens / best
+        baseline = baseline or tokens_per_sec
+        same = "yes" if entities == reference else "NO"
+        print(f"batch_size={batch_size:<4} {best:8.3f}s  {tokens_per_sec:10.0f} tokens/sec  "
+              f"x{tokens_per_sec / baseline:5.2f}  same entities: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Latency and throughput of the explicit and implicit models per inference engine
+(PyTorch, ONNX Runtime FP32, ONNX Runtime INT8).
+
+Latency is measured on a single example document, throughput on a large
+synthetic document built from the examples.
+
+Usage (from python-backend/, after `python onnx_engine.py export`):
+    python benchmarks/bench_onnx.py --tokens 20000 --repeat 5
+"""
+import argparse
+import time
+
+from common import build_document, percentile, sample_texts
+
+from explicit_model import model as explicit
+from implicit_model import model as implicit
+
+
+def measure(function, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--tokens", type=int, default=20000, help="Approximate size of the throughput document")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    explicit.loader.ensure_loaded()
+    implicit.loader.ensure_loaded()
+
+    short_text = sample_texts()[0]
+    long_text = build_document(args.tokens, explicit.tokenizer)
+    n_tokens = len(explicit.tokenizer(long_text, add_special_tokens=False)["input_ids"])
+    n_sentences = len(implicit.split_sentences(long_text))
+    print(f"Latency document: {len(short_text)} chars | throughput document: {n_tokens} tokens, {n_sentences} sentences")
+
+    for engine in args.engines:
+        if not (explicit.use_engine(engine) and implicit.use_engine(engine)):
+            print(f"{engine:<10} export not available, skipped")
+            continue
+
+        # Warm-up
+        explicit.predict_explicit_pii(short_text)
+        implicit.predict_implicit_pii(short_text)
+
+        explicit_latency = measure(lambda: explicit.predict_explicit_pii(short_text), args.repeat)
+        implicit_latency = measure(lambda: implicit.predict_implicit_pii(short_text), args.repeat)
+        explicit_bulk = min(measure(lambda: explicit.predict_explicit_pii(long_text), max(1, args.repeat // 2)))
+        implicit_bulk = min(measure(lambda: implicit.predict_implicit_pii(long_text), max(1, args.repeat // 2)))
+
+        print(f"{engine:<10} explicit: p50 {percentile(explicit_latency, 50) * 1000:8.1f} ms  "
+              f"p95 {percentile(explicit_latency, 95) * 1000:8.1f} ms  {n_tokens / explicit_bulk:10.0f} tokens/sec")
+        print(f"{'':<10} implicit: p50 {percentile(implicit_latency, 50) * 1000:8.1f} ms  "
+              f"p95 {percentile(implicit_latency, 95) * 1000:8.1f} ms  {n_sentences / implicit_bulk:10.0f} sentences/sec")
+
+    explicit.use_engine("torch")
+    implicit.use_engine("torch")
+
+
+if __name__ == "__main__":
+    main()
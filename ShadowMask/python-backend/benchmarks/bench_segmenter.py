@@ -0,0 +1,74 @@
+"""
+Microbenchmark of the implicit model's sentence segmentation: the old
+regex.split + text.find implementation against implicit_model.segmenter, on
+multi-megabyte synthetic documents. Also checks that both give the same
+sentences and offsets.
+
+Usage (from python-backend/):
+    python benchmarks/bench_segmenter.py --sizes-mb 1 4 16
+"""
+import argparse
+import time
+
+import regex
+
+from common import sample_texts
+from synthetic import build_synthetic_document
+
+from implicit_model.segmenter import Segmenter
+
+LEGACY_SPLIT_REGEX = r'(?<!\b(Jl|No|Bpk|Ibu|Dr|Prof|H))\.\s+|(?<=[?!])\s+|\s*[\r\n]+\s*'
+
+
+def legacy_split_sentences(text):
+    """split_sentences as it was before the segmenter module."""
+    sentences = regex.split(LEGACY_SPLIT_REGEX, text)
+    sentences = [s.strip() for s in sentences if s and s.strip()]
+
+    spans = []
+    current_pos = 0
+    for sentence_text in sentences:
+        start_char = text.find(sentence_text, current_pos)
+        end_char = start_char + len(sentence_text)
+        current_pos = end_char
+        spans.append((sentence_text, start_char, end_char))
+    return spans
+
+
+def best_time(function, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 4, 16], help="Document sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per implementation (best run is reported)")
+    args = parser.parse_args()
+
+    segmenter = Segmenter()
+    # The example documents hold the abbreviations and line breaks of real input
+    examples = "\n".join(sample_texts())
+
+    for size_mb in args.sizes_mb:
+        target = int(size_mb * 1024 * 1024)
+        text, _ = build_synthetic_document(target, pii_density=0.5, seed=f"segmenter-{size_mb}")
+        text = (examples + "\n" + text)[:target]
+
+        legacy_seconds, legacy = best_time(legacy_split_sentences, text, args.repeat)
+        split_seconds, split = best_time(segmenter.split, text, args.repeat)
+        spans_seconds, spans = best_time(segmenter.spans, text, args.repeat)
+
+        same = split == legacy and spans == [(start, end) for _, start, end in legacy]
+        print(f"{len(text) / 2 ** 20:6.1f} MB  {len(legacy):8d} sentences  "
+              f"legacy {legacy_seconds * 1000:8.1f} ms  split {split_seconds * 1000:8.1f} ms  "
+              f"spans {spans_seconds * 1000:8.1f} ms  speedup {legacy_seconds / split_seconds:5.2f}x  "
+              f"{'same output' if same else 'OUTPUT DIFFERS'}")
+
+
+if __name__ == "__main__":
+    main()
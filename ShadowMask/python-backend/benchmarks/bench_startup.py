@@ -0,0 +1,150 @@
+"""
+Startup benchmark: time-to-ready of the backend, per phase, for the different
+ways the packaged build can find its model files.
+
+Every scenario runs in a fresh interpreter and reports:
+    extract       copying the model folders to a fresh temp dir, like the PyInstaller
+                  onefile bootloader does at every launch (only the files it bundles)
+    import        importing the model modules
+    <model>.*     the load phases of each model (import, model_cache, tokenizer, weights, ...)
+    first_predict the first prediction of each model
+    ready         from process start until both models answered their first prediction
+
+Scenarios:
+    bundled       weights unpacked with the app and loaded from there (no manifest)
+    cache-cold    manifest present, empty model cache: files are copied and hashed once
+    cache-warm    manifest present, cache filled by an earlier launch
+    external      cache-warm with ANONYMASK_EXTERNAL_WEIGHTS builds: the weights are
+                  not in the onefile archive, so nothing large is unpacked
+
+The model folders default to explicit_model/ and implicit_model/ (they must hold
+the real weights, not Git LFS pointers); point --explicit-dir / --implicit-dir
+at other checkouts (e.g. a Hugging Face snapshot) otherwise. Results are printed
+as JSON.
+
+Usage (from python-backend/):
+    python benchmarks/bench_startup.py --runs 3
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import BACKEND_DIR, percentile
+
+import model_cache
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {backend!r})
+from explicit_model import model as explicit
+from implicit_model import model as implicit
+imported = time.perf_counter()
+
+explicit.MODEL_PATH = {explicit_dir!r}
+implicit.IMPLICIT_MODEL_PATH = {implicit_dir!r}
+implicit.MLB_PATH = {mlb_path!r}
+explicit.loader.start()
+implicit.loader.start()
+ok = explicit.loader.wait() and implicit.loader.wait()
+
+first = time.perf_counter()
+explicit.predict_explicit_pii("Nama saya Budi Santoso, tinggal di Jakarta.")
+implicit.predict_implicit_pii("Nama saya Budi Santoso, tinggal di Jakarta.")
+done = time.perf_counter()
+
+result = {{"ok": ok, "import": imported - start, "first_predict": done - first, "ready": done - start}}
+for name, loader in (("explicit", explicit.loader), ("implicit", implicit.loader)):
+    for phase, seconds in loader.phases.items():
+        result[name + "." + phase] = seconds
+print("RESULT " + json.dumps(result))
+"""
+
+
+def stage(source_dirs, bundle_dir, with_manifest, with_weights):
+    """Copies the model folders into `bundle_dir` the way the onefile bootloader unpacks them."""
+    start = time.perf_counter()
+    for package, source in source_dirs.items():
+        target = bundle_dir / package
+        target.mkdir(parents=True)
+        for name in model_cache.model_files(source):
+            if with_weights or not name.endswith(".safetensors"):
+                shutil.copyfile(Path(source) / name, target / name)
+        if with_manifest:
+            shutil.copyfile(Path(source) / model_cache.MANIFEST_FILENAME, target / model_cache.MANIFEST_FILENAME)
+    return time.perf_counter() - start
+
+
+def run_once(source_dirs, cache_dir, scenario):
+    with tempfile.TemporaryDirectory(prefix="anonymask-meipass-") as bundle:
+        bundle_dir = Path(bundle)
+        with_manifest = scenario != "bundled"
+        extract = stage(source_dirs, bundle_dir, with_manifest, with_weights=scenario != "external")
+
+        env = dict(os.environ, ANONYMASK_MODEL_CACHE_DIR=str(cache_dir))
+        code = CHILD.format(
+            backend=str(BACKEND_DIR),
+            explicit_dir=str(bundle_dir / "explicit_model"),
+            implicit_dir=str(bundle_dir / "implicit_model"),
+            mlb_path=str(bundle_dir / "implicit_model" / "mlb.pkl"),
+        )
+        output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, cwd=bundle)
+        lines = [line for line in output.stdout.splitlines() if line.startswith("RESULT ")]
+        if not lines:
+            raise RuntimeError(f"{scenario} run failed:\n{output.stderr[-2000:]}")
+        result = json.loads(lines[-1][len("RESULT "):])
+        if not result.pop("ok"):
+            raise RuntimeError(f"{scenario} run could not load the models:\n{output.stdout[-2000:]}")
+        result["extract"] = extract
+        result["ready"] += extract
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--explicit-dir", default=str(BACKEND_DIR / "explicit_model"))
+    parser.add_argument("--implicit-dir", default=str(BACKEND_DIR / "implicit_model"))
+    parser.add_argument("--runs", type=int, default=3, help="Runs per scenario (cache-cold always starts empty)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="anonymask-sources-") as sources:
+        # Staged copies of the model folders, with the mlb.pkl and manifest a build would ship
+        source_dirs = {}
+        for package, source in (("explicit_model", args.explicit_dir), ("implicit_model", args.implicit_dir)):
+            staged = Path(sources) / package
+            shutil.copytree(source, staged, ignore=shutil.ignore_patterns("*.py", "__pycache__", "onnx"))
+            if package == "implicit_model" and not (staged / "mlb.pkl").exists():
+                shutil.copyfile(BACKEND_DIR / "implicit_model" / "mlb.pkl", staged / "mlb.pkl")
+            with contextlib.redirect_stdout(sys.stderr):  # Keep stdout for the JSON report
+                model_cache.write_manifest(staged)
+            source_dirs[package] = staged
+
+        report = {}
+        for scenario in ("bundled", "cache-cold", "cache-warm", "external"):
+            runs = []
+            with tempfile.TemporaryDirectory(prefix="anonymask-cache-") as cache_dir:
+                if scenario in ("cache-warm", "external"):
+                    run_once(source_dirs, cache_dir, "cache-cold")  # Fill the cache
+                for _ in range(args.runs):
+                    if scenario == "cache-cold":
+                        shutil.rmtree(cache_dir, ignore_errors=True)
+                    runs.append(run_once(source_dirs, cache_dir, scenario))
+            phases = sorted({phase for run in runs for phase in run})
+            report[scenario] = {
+                phase: {"p50": percentile([run[phase] for run in runs], 50), "max": max(run[phase] for run in runs)}
+                for phase in phases
+            }
+            print(f"{scenario:<11} ready p50 {report[scenario]['ready']['p50']:.2f}s", file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
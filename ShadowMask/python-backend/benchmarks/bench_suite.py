@@ -0,0 +1,278 @@
+"""
+Reproducible benchmark suite for the detection backend.
+
+Builds synthetic documents (see synthetic.py) for every combination of size and
+PII density, and runs each of them through:
+    explicit            predict_explicit_pii
+    implicit            predict_implicit_pii
+    /predictExplicit    the HTTP endpoints, through the app in-process (or --url)
+    /predictImplicit
+    /predict
+
+For every scenario it reports the latency percentiles, throughput (documents
+and characters per second) and the peak RSS of the process while the scenario
+ran. The prediction and sentence caches are disabled and every document has its
+own seed, so each call really runs the models. Results are saved as JSON along
+with the commit and machine they come from; --compare prints the change against
+an earlier result file.
+
+Usage (from python-backend/):
+    python benchmarks/bench_suite.py --sizes 1000 10000 --densities 0.1 0.5 --docs 5
+    python benchmarks/bench_suite.py --targets explicit implicit --compare benchmarks/results/<commit>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from common import BACKEND_DIR, percentile
+from synthetic import build_synthetic_document
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FUNCTION_TARGETS = ("explicit", "implicit")
+HTTP_TARGETS = ("/predictExplicit", "/predictImplicit", "/predict")
+RESULTS_DIR = BACKEND_DIR / "benchmarks" / "results"
+
+
+# --- Memory ---
+
+def current_rss():
+    """Resident set size of this process in bytes, or None when it cannot be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def process_peak_rss():
+    """Peak RSS of the whole process so far, in bytes."""
+    if resource is None:
+        return psutil.Process().memory_info().peak_wset if psutil is not None else None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RssSampler:
+    """Polls the RSS on a background thread and keeps the highest value seen."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        rss = current_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+
+# --- Targets ---
+
+def function_target(name):
+    from explicit_model.model import predict_explicit_pii, loader as explicit_loader
+    from implicit_model.model import predict_implicit_pii, loader as implicit_loader
+
+    if name == "explicit":
+        explicit_loader.ensure_loaded()
+        return predict_explicit_pii
+    implicit_loader.ensure_loaded()
+    return predict_implicit_pii
+
+
+def http_client(url):
+    import httpx
+
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=None)
+    import main as backend
+
+    # The in-process transport does not run the lifespan, so load the models here
+    for loader in backend.model_loaders.values():
+        loader.ensure_loaded()
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=backend.app), base_url="http://backend", timeout=None)
+
+
+def run_scenario(call, documents):
+    """Runs `call` over every document in turn. Returns the latencies and the peak RSS."""
+    call(documents[0])  # Warm-up, not measured
+    latencies = []
+    with RssSampler() as sampler:
+        for text in documents[1:]:
+            start = time.perf_counter()
+            call(text)
+            latencies.append(time.perf_counter() - start)
+    return latencies, sampler.peak
+
+
+def summarize(target, size, density, documents, spans, latencies, peak_rss, measure_rss=True):
+    measured = documents[1:]
+    total = sum(latencies)
+    return {
+        "target": target,
+        "size_chars": size,
+        "pii_density": density,
+        "documents": len(measured),
+        "pii_values": sum(len(s) for s in spans[1:]),
+        "mean_ms": total / len(latencies) * 1000.0,
+        "p50_ms": percentile(latencies, 50) * 1000.0,
+        "p90_ms": percentile(latencies, 90) * 1000.0,
+        "p99_ms": percentile(latencies, 99) * 1000.0,
+        "docs_per_sec": len(latencies) / total if total else 0.0,
+        "chars_per_sec": sum(len(text) for text in measured) / total if total else 0.0,
+        "peak_rss_mb": round(peak_rss / 2 ** 20, 1) if measure_rss and peak_rss else None,
+    }
+
+
+# --- Reporting ---
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def machine_info():
+    import torch
+
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "engine": os.environ.get("ANONYMASK_ENGINE", "torch"),
+    }
+
+
+def scenario_key(result):
+    return result["target"], result["size_chars"], result["pii_density"]
+
+
+def print_result(result):
+    rss = f"{result['peak_rss_mb']:7.1f} MB" if result["peak_rss_mb"] is not None else "      n/a"
+    print(f"{result['target']:<17} {result['size_chars']:>8} chars  density {result['pii_density']:<4} "
+          f"p50 {result['p50_ms']:9.1f} ms  p99 {result['p99_ms']:9.1f} ms  "
+          f"{result['docs_per_sec']:7.2f} docs/s  {result['chars_per_sec']:10.0f} chars/s  rss {rss}")
+
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {scenario_key(result): result for result in baseline["results"]}
+    print(f"\nChange against {baseline.get('commit', '?')} ({baseline_path}):")
+    for result in results:
+        old = previous.get(scenario_key(result))
+        if old is None:
+            continue
+        p50_change = (result["p50_ms"] / old["p50_ms"] - 1.0) * 100.0 if old["p50_ms"] else 0.0
+        throughput_change = (result["chars_per_sec"] / old["chars_per_sec"] - 1.0) * 100.0 if old["chars_per_sec"] else 0.0
+        print(f"{result['target']:<17} {result['size_chars']:>8} chars  density {result['pii_density']:<4} "
+              f"p50 {p50_change:+6.1f}%  throughput {throughput_change:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="Document sizes in characters")
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.1, 0.5], help="Share of sentences with PII")
+    parser.add_argument("--docs", type=int, default=5, help="Measured documents per scenario (plus one warm-up)")
+    parser.add_argument("--targets", nargs="+", default=list(FUNCTION_TARGETS + HTTP_TARGETS),
+                        choices=FUNCTION_TARGETS + HTTP_TARGETS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="Base URL of a running backend for the HTTP targets (default: in-process)")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    # Every call must run the models, not the caches
+    os.environ.setdefault("ANONYMASK_CACHE_ENTRIES", "0")
+    os.environ.setdefault("ANONYMASK_SENTENCE_CACHE_ENTRIES", "0")
+    os.environ.setdefault("ANONYMASK_LOG_SAMPLE_RATE", "0")
+
+    http_targets = [target for target in args.targets if target in HTTP_TARGETS]
+    client = http_client(args.url) if http_targets else None
+    loop = asyncio.new_event_loop()
+
+    def post(endpoint):
+        def call(text):
+            response = loop.run_until_complete(client.post(endpoint, json={"text": text}))
+            response.raise_for_status()
+        return call
+
+    results = []
+    for size in args.sizes:
+        for density in args.densities:
+            generated = [
+                build_synthetic_document(size, density, seed=f"{args.seed}-{size}-{density}-{i}")
+                for i in range(args.docs + 1)
+            ]
+            documents = [text for text, _ in generated]
+            spans = [s for _, s in generated]
+            for target in args.targets:
+                call = function_target(target) if target in FUNCTION_TARGETS else post(target)
+                latencies, peak_rss = run_scenario(call, documents)
+                # With --url the models run in another process, whose memory is not measured here
+                result = summarize(target, size, density, documents, spans, latencies, peak_rss,
+                                   measure_rss=not (args.url and target in HTTP_TARGETS))
+                print_result(result)
+                results.append(result)
+
+    if client is not None:
+        loop.run_until_complete(client.aclose())
+    loop.close()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "settings": {"docs": args.docs, "seed": args.seed, "url": args.url},
+        "process_peak_rss_mb": round(process_peak_rss() / 2 ** 20, 1) if process_peak_rss() else None,
+        "results": results,
+    }
+    output = args.output or str(RESULTS_DIR / f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {output}")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
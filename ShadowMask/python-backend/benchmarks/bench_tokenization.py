@@ -0,0 +1,99 @@
+"""
+Tokenization time and peak memory of one /predict document, before and after
+the shared tokenization stage (tokenization.py):
+
+  legacy  the explicit model tokenizes into overflowing windows (every window a
+          Python list holding its own copy of the overlap), and the implicit model
+          tokenizes every sentence again
+  shared  one tokenizer call into contiguous arrays, windows as views, sentence
+          tokens sliced from the same arrays
+
+Peak memory is the tracemalloc peak of the Python and NumPy allocations made
+while tokenizing (the tokenizer's own Rust buffers are not included). Also
+checks that both give the same windows and sentence tokens.
+
+Usage (from python-backend/):
+    python benchmarks/bench_tokenization.py --tokens 10000 100000
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from common import build_document
+
+from explicit_model import model as explicit
+from implicit_model import model as implicit
+from tokenization import special_tokens, tokenize_document, window_bounds
+
+
+def legacy_tokenize(text):
+    windows = explicit.tokenizer(
+        text,
+        return_offsets_mapping=True,
+        truncation=True,
+        max_length=explicit.MAX_LENGTH,
+        stride=explicit.OVERLAP,
+        return_overflowing_tokens=True,
+    )
+    sentences = [sentence for sentence, _, _ in implicit.split_sentences(text)]
+    sentence_ids = implicit.implicit_tokenizer(sentences, truncation=True, max_length=512)["input_ids"] if sentences else []
+    return windows, sentence_ids
+
+
+def shared_tokenize(text):
+    # The fixed windows, the ones the legacy path makes
+    tokens = tokenize_document(explicit.tokenizer, text)
+    windows = window_bounds(len(tokens), explicit.MAX_LENGTH - sum(map(len, special_tokens(explicit.tokenizer))), explicit.OVERLAP)
+    window_ids = explicit.window_input_ids(tokens, windows)
+    spans = implicit.split_sentences(text)
+    sentence_ids = implicit.encode_sentences(tokens.sentence_ids(spans))
+    return (tokens, window_ids), sentence_ids
+
+
+def measure(function, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = function(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def same_output(legacy, shared):
+    (windows, legacy_sentences), ((_, window_ids), shared_sentences) = legacy, shared
+    prefix, suffix = special_tokens(explicit.tokenizer)
+    same_windows = [list(ids) for ids in windows["input_ids"]] == [prefix + ids.tolist() + suffix for ids in window_ids]
+    same_sentences = [list(ids) for ids in legacy_sentences] == [np.asarray(ids).tolist() for ids in shared_sentences]
+    return same_windows and same_sentences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, nargs="+", default=[10000, 100000], help="Approximate document sizes in tokens")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per implementation (best run is reported)")
+    args = parser.parse_args()
+
+    explicit.loader.ensure_loaded()
+    implicit.loader.ensure_loaded()
+
+    for target in args.tokens:
+        text = build_document(target, explicit.tokenizer)
+        legacy_seconds, legacy_peak, legacy = measure(legacy_tokenize, text, args.repeat)
+        shared_seconds, shared_peak, shared = measure(shared_tokenize, text, args.repeat)
+
+        print(f"{len(shared[0][0]):8d} tokens  "
+              f"legacy {legacy_seconds * 1000:8.1f} ms {legacy_peak / 2 ** 20:7.1f} MB  "
+              f"shared {shared_seconds * 1000:8.1f} ms {shared_peak / 2 ** 20:7.1f} MB  "
+              f"speedup {legacy_seconds / shared_seconds:5.2f}x  memory {legacy_peak / max(1, shared_peak):5.2f}x less  "
+              f"{'same tokens' if same_output(legacy, shared) else 'TOKENS DIFFER'}")
+
+
+if __name__ == "__main__":
+    main()
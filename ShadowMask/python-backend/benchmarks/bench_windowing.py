@@ -0,0 +1,104 @@
+"""
+Throughput and accuracy of the explicit model across window settings.
+
+A setting is "fixed" (MAX_LENGTH windows, the last window wins) or
+"adaptive:<max window>" (see explicit_model.model.WINDOWING; 0 is the model's
+maximum). Every setting runs over synthetic documents of several sizes and
+reports, per size:
+  - docs/s and tokens/s, and the window tokens run through the model per
+    document token (the recomputed overlap)
+  - agreement with the first setting: F1 of the entities against its entities
+  - F1 against the PII values the synthetic documents were built with (an
+    entity counts when its label and offsets match the inserted value exactly)
+
+Usage (from python-backend/):
+    python benchmarks/bench_windowing.py --settings fixed adaptive:128 adaptive:256 adaptive:0
+"""
+import argparse
+import time
+
+from common import percentile
+from synthetic import build_synthetic_document
+
+from explicit_model import model as explicit
+from tokenization import special_tokens
+
+
+def apply_setting(setting):
+    name, _, max_window = setting.partition(":")
+    explicit.WINDOWING = name
+    explicit.MAX_WINDOW = int(max_window or 0)
+
+
+def f1(found, expected):
+    found, expected = set(found), set(expected)
+    if not found and not expected:
+        return 1.0
+    correct = len(found & expected)
+    return 2 * correct / (len(found) + len(expected))
+
+
+def entity_keys(entities):
+    return [(e["label"], e["start"], e["end"]) for e in entities]
+
+
+def run_setting(documents, repeat):
+    latencies = []
+    results = []
+    for text, _ in documents:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            entities = explicit.predict_explicit_pii(text)
+            best = min(best, time.perf_counter() - start)
+        latencies.append(best)
+        results.append(entity_keys(entities))
+    return latencies, results
+
+
+def window_tokens(documents):
+    """Tokens run through the model (special tokens included) and document tokens."""
+    computed = tokens = 0
+    prefix, suffix = special_tokens(explicit.tokenizer)
+    for text, _ in documents:
+        document_tokens, windows = explicit.tokenize_windows(text)
+        tokens += len(document_tokens)
+        computed += sum(end - start + len(prefix) + len(suffix) for start, end, _, _ in windows)
+    return computed, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--settings", nargs="+", default=["fixed", "adaptive:128", "adaptive:256", "adaptive:0"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 5000, 20000], help="Document sizes in characters")
+    parser.add_argument("--documents", type=int, default=8, help="Documents per size")
+    parser.add_argument("--repeat", type=int, default=2, help="Runs per document (best run is reported)")
+    args = parser.parse_args()
+
+    explicit.loader.ensure_loaded()
+    explicit.predict_explicit_pii("Nama saya Budi Santoso.")  # Warm-up
+
+    for size in args.sizes:
+        documents = [
+            build_synthetic_document(size, pii_density=0.5, seed=f"windowing-{size}-{index}")
+            for index in range(args.documents)
+        ]
+        expected = [entity_keys(spans) for _, spans in documents]
+        print(f"\n{size} characters, {len(documents)} documents")
+
+        reference = None
+        for setting in args.settings:
+            apply_setting(setting)
+            latencies, results = run_setting(documents, args.repeat)
+            computed, tokens = window_tokens(documents)
+            reference = reference or results
+            agreement = sum(f1(r, e) for r, e in zip(results, reference)) / len(results)
+            accuracy = sum(f1(r, e) for r, e in zip(results, expected)) / len(results)
+            seconds = sum(latencies)
+            print(f"  {setting:14s} {len(documents) / seconds:8.1f} docs/s {tokens / seconds:10.0f} tokens/s  "
+                  f"p50 {percentile(latencies, 50) * 1000:7.1f} ms  window tokens x{computed / max(1, tokens):4.2f}  "
+                  f"agreement F1 {agreement:.3f}  synthetic F1 {accuracy:.3f}")
+
+
+if __name__ == "__main__":
+    main()
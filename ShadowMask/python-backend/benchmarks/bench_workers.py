@@ -0,0 +1,75 @@
+"""
+Measures what the model worker processes (worker_pool.py) cost in memory and
+how requests spread over them.
+
+For the server process and every worker it prints RSS, PSS (shared pages split
+between the processes that map them) and USS (pages only this process holds),
+read from /proc/<pid>/smaps_rollup, so it needs Linux. A worker's USS is what
+adding it costs; compare it with the size of the weights.
+
+Usage (from python-backend/):
+    python benchmarks/bench_workers.py --workers 4 --requests 40
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import sample_texts
+
+from explicit_model import model as explicit
+from implicit_model import model as implicit
+from worker_pool import WorkerPool
+
+
+def memory_mb(pid):
+    """Returns (rss, pss, uss) of a process in MB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024.0
+    uss = fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0)
+    return fields.get("Rss", 0.0), fields.get("Pss", 0.0), uss
+
+
+def weights_mb(model):
+    return sum(p.numel() * p.element_size() for p in model.parameters()) / (1024.0 * 1024.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=40, help="Requests per model")
+    args = parser.parse_args()
+
+    explicit.loader.ensure_loaded()
+    implicit.loader.ensure_loaded()
+    print(f"Weights: explicit {weights_mb(explicit.model):.1f} MB, implicit {weights_mb(implicit.implicit_model):.1f} MB")
+
+    pool = WorkerPool(args.workers)
+    start = time.perf_counter()
+    pool.start({"explicit": explicit.shared_state(), "implicit": implicit.shared_state()})
+    print(f"Started {args.workers} workers in {time.perf_counter() - start:.1f}s")
+
+    texts = sample_texts()
+    jobs = [(kind, texts[i % len(texts)]) for i in range(args.requests) for kind in ("explicit", "implicit")]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2 * args.workers) as clients:
+        list(clients.map(lambda job: pool.run(*job), jobs))
+    elapsed = time.perf_counter() - start
+    print(f"{len(jobs)} requests in {elapsed:.2f}s ({len(jobs) / elapsed:.1f} req/s)")
+
+    print(f"{'process':<10} {'pid':>8} {'requests':>9} {'RSS MB':>9} {'PSS MB':>9} {'USS MB':>9}")
+    rss, pss, uss = memory_mb(os.getpid())
+    print(f"{'server':<10} {os.getpid():>8} {'':>9} {rss:9.1f} {pss:9.1f} {uss:9.1f}")
+    for index, worker in enumerate(pool.stats()["workers"]):
+        rss, pss, uss = memory_mb(worker["pid"])
+        print(f"{'worker ' + str(index):<10} {worker['pid']:>8} {worker['completed']:>9} {rss:9.1f} {pss:9.1f} {uss:9.1f}")
+
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
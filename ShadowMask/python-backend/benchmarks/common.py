@@ -0,0 +1,34 @@
+"""Shared helpers for the benchmark scripts."""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+EXAMPLE_DIR = BACKEND_DIR.parent.parent / "ExampleFile" / "original_document"
+FALLBACK_SAMPLE = "Nama saya Budi Santoso, tinggal di Jl. Merdeka No. 10 Jakarta. Nomor HP saya 081234567890."
+
+# Make the backend modules importable when a benchmark is run as a script
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+def sample_texts():
+    """Returns the example documents shipped with the repo."""
+    texts = [p.read_text(encoding="utf-8") for p in sorted(EXAMPLE_DIR.glob("*.txt"))]
+    return texts or [FALLBACK_SAMPLE]
+
+
+def build_document(target_tokens, tokenizer):
+    """Repeats the example documents until the text reaches roughly `target_tokens` tokens."""
+    sample = "\n".join(sample_texts())
+    sample_tokens = max(1, len(tokenizer(sample, add_special_tokens=False)["input_ids"]))
+    repeats = max(1, target_tokens // sample_tokens)
+    return "\n".join([sample] * repeats)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
@@ -0,0 +1,79 @@
+"""
+Load test for the prediction endpoints: N concurrent clients each send a series
+of requests, and the p50 / p99 latency and throughput are reported per level.
+
+By default the app is driven in-process (no server needed) with the prediction
+and sentence caches disabled, so every request really runs the models. Use
+--url to load an already running backend instead.
+
+Usage (from python-backend/):
+    python benchmarks/load_test.py --clients 1 4 16 --requests 20
+    python benchmarks/load_test.py --url http://localhost:8000 --endpoint /predict
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from common import percentile, sample_texts
+
+import httpx
+
+
+async def run_client(client, endpoint, texts, client_index, requests, latencies):
+    for i in range(requests):
+        # A unique line per request keeps the backend caches from answering
+        text = f"{texts[i % len(texts)]}\nDokumen {client_index}-{i}"
+        start = time.perf_counter()
+        response = await client.post(endpoint, json={"text": text})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_level(client, endpoint, texts, clients, requests):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(client, endpoint, texts, c, requests, latencies) for c in range(clients)))
+    elapsed = time.perf_counter() - start
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000.0,
+        "p99_ms": percentile(latencies, 99) * 1000.0,
+        "requests_per_sec": len(latencies) / elapsed,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running backend (default: drive the app in-process)")
+    parser.add_argument("--endpoint", default="/predictExplicit")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client at every level")
+    args = parser.parse_args()
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=None)
+    else:
+        os.environ.setdefault("ANONYMASK_CACHE_ENTRIES", "0")
+        os.environ.setdefault("ANONYMASK_SENTENCE_CACHE_ENTRIES", "0")
+        import main as backend
+
+        # The in-process transport does not run the lifespan, so load the models here
+        for loader in backend.model_loaders.values():
+            loader.ensure_loaded()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=backend.app), base_url="http://backend", timeout=None)
+
+    texts = sample_texts()
+    async with client:
+        await run_level(client, args.endpoint, texts, 1, 2)  # Warm-up
+        print(f"{args.endpoint}")
+        for clients in args.clients:
+            result = await run_level(client, args.endpoint, texts, clients, args.requests)
+            print(f"clients={result['clients']:<3} requests={result['requests']:<5} "
+                  f"p50={result['p50_ms']:8.1f} ms  p99={result['p99_ms']:8.1f} ms  "
+                  f"{result['requests_per_sec']:7.2f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+"""
+Synthetic Indonesian documents with a known amount of PII, for benchmarks.
+
+Every label of AnonyMaskLabels.txt has a sentence template and a value
+generator. A document is a mix of PII sentences and filler sentences: with
+`pii_density` 0.3, about 30% of the sentences carry one PII value. The same
+seed (an int or a string) always gives the same document, so runs can be
+compared across commits.
+"""
+import random
+
+from common import BACKEND_DIR
+
+LABELS_FILE = BACKEND_DIR.parent.parent / "AnonyMaskLabels.txt"
+
+FIRST_NAMES = ["Budi", "Siti", "Agus", "Dewi", "Rina", "Andi", "Putri", "Joko", "Wulan", "Hendra", "Ayu", "Rizky"]
+LAST_NAMES = ["Santoso", "Wijaya", "Saputra", "Lestari", "Hidayat", "Pratama", "Kusuma", "Nugroho", "Siregar", "Halim"]
+CITIES = ["Jakarta", "Bandung", "Surabaya", "Medan", "Semarang", "Makassar", "Yogyakarta", "Denpasar", "Palembang"]
+STREETS = ["Merdeka", "Sudirman", "Thamrin", "Diponegoro", "Gatot Subroto", "Ahmad Yani", "Pemuda", "Asia Afrika"]
+COMPANIES = ["PT Maju Jaya", "PT Sinar Abadi", "CV Karya Mandiri", "PT Nusantara Digital", "Bank Sejahtera"]
+MONTHS = ["Januari", "Februari", "Maret", "April", "Mei", "Juni", "Juli", "Agustus", "September", "Oktober",
+          "November", "Desember"]
+
+FILLER = [
+    "Terima kasih atas perhatian dan kerja sama Bapak dan Ibu.",
+    "Kami akan menindaklanjuti permintaan ini dalam waktu tiga hari kerja.",
+    "Mohon periksa kembali dokumen yang sudah dilampirkan sebelumnya.",
+    "Layanan pelanggan kami tersedia setiap hari mulai pukul delapan pagi.",
+    "Rapat koordinasi dijadwalkan ulang karena ada perubahan agenda.",
+    "Formulir ini harus diisi dengan lengkap sebelum diserahkan.",
+    "Pembaruan sistem akan dilakukan pada akhir pekan ini.",
+    "Silakan hubungi bagian administrasi jika ada pertanyaan lebih lanjut.",
+    "Laporan bulanan sudah dikirim ke semua kepala divisi.",
+    "Keluhan yang masuk akan diproses sesuai urutan penerimaan.",
+]
+
+
+def _name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _digits(rng, count):
+    return "".join(rng.choice("0123456789") for _ in range(count))
+
+
+def _date(rng):
+    return f"{rng.randint(1, 28)} {rng.choice(MONTHS)} {rng.randint(1960, 2005)}"
+
+
+def _email(rng):
+    return f"{rng.choice(FIRST_NAMES).lower()}.{rng.choice(LAST_NAMES).lower()}{rng.randint(1, 99)}"
+
+
+# label -> (sentence template with {value}, value generator)
+TEMPLATES = {
+    "Work_Mail": ("Email kantor saya adalah {value}.", lambda rng: _email(rng) + "@majujaya.co.id"),
+    "Mail": ("Silakan kirim balasan ke {value}.", lambda rng: _email(rng) + "@gmail.com"),
+    "Phone_Number": ("Nomor HP saya {value}.", lambda rng: "08" + _digits(rng, 10)),
+    "Work_Phone_Number": ("Telepon kantor dapat dihubungi di {value}.", lambda rng: "021-" + _digits(rng, 7)),
+    "Name": ("Nama saya {value}.", _name),
+    "Nickname": ("Teman-teman biasa memanggil saya {value}.", lambda rng: rng.choice(["Bud", "Sisi", "Gus", "Uwi", "Kiki"])),
+    "Location": ("Saat ini saya sedang berada di {value}.", lambda rng: rng.choice(CITIES)),
+    "POB": ("Saya lahir di {value}.", lambda rng: rng.choice(CITIES)),
+    "Parent_Name": ("Nama ibu kandung saya {value}.", _name),
+    "Username": ("Username akun saya {value}.", lambda rng: rng.choice(FIRST_NAMES).lower() + "_" + _digits(rng, 3)),
+    "Criminal_Hist": ("Saya pernah {value}.", lambda rng: rng.choice([
+        "dipenjara dua tahun karena kasus penipuan", "ditahan polisi karena perkelahian"])),
+    "Edu_Hist": ("Saya lulusan {value}.", lambda rng: rng.choice([
+        "S1 Teknik Informatika Universitas Indonesia", "SMA Negeri 3 Bandung", "S2 Manajemen ITB"])),
+    "Med_Hist": ("Saya memiliki riwayat {value}.", lambda rng: rng.choice(["diabetes", "asma", "hipertensi", "penyakit jantung"])),
+    "Occ_Hist": ("Sebelumnya saya bekerja sebagai {value}.", lambda rng: rng.choice([
+        "akuntan di " + rng.choice(COMPANIES), "guru honorer", "staf IT di " + rng.choice(COMPANIES)])),
+    "Asset": ("Saya memiliki {value}.", lambda rng: rng.choice(["rumah di Bekasi", "dua unit mobil", "tanah seluas 500 meter persegi"])),
+    "Address": ("Alamat rumah saya di {value}.", lambda rng: f"Jl. {rng.choice(STREETS)} No. {rng.randint(1, 200)}, {rng.choice(CITIES)}"),
+    "Race": ("Saya keturunan {value}.", lambda rng: rng.choice(["Jawa", "Sunda", "Batak", "Tionghoa", "Bugis"])),
+    "Religion": ("Agama saya {value}.", lambda rng: rng.choice(["Islam", "Kristen", "Katolik", "Hindu", "Buddha"])),
+    "Marr_Status": ("Status pernikahan saya {value}.", lambda rng: rng.choice(["menikah", "belum menikah", "cerai"])),
+    "Gender": ("Jenis kelamin saya {value}.", lambda rng: rng.choice(["laki-laki", "perempuan"])),
+    "Blood_Type": ("Golongan darah saya {value}.", lambda rng: rng.choice(["A", "B", "AB", "O"])),
+    "Balance": ("Saldo rekening saya saat ini {value}.", lambda rng: f"Rp {rng.randint(1, 900)}.{_digits(rng, 3)}.000"),
+    "Account": ("Nomor rekening saya {value}.", lambda rng: _digits(rng, 10)),
+    "Card_Number": ("Nomor kartu kredit saya {value}.", lambda rng: " ".join(_digits(rng, 4) for _ in range(4))),
+    "NIP": ("NIP saya {value}.", lambda rng: _digits(rng, 18)),
+    "SSN": ("NIK saya {value}.", lambda rng: "32" + _digits(rng, 14)),
+    "Salary": ("Gaji saya per bulan {value}.", lambda rng: f"Rp {rng.randint(3, 40)}.{_digits(rng, 3)}.000"),
+    "Score": ("Nilai IPK saya {value}.", lambda rng: f"{rng.randint(2, 3)},{_digits(rng, 2)}"),
+    "DOB": ("Saya lahir pada tanggal {value}.", _date),
+    "Plate": ("Nomor polisi kendaraan saya {value}.", lambda rng: f"B {rng.randint(1000, 9999)} {rng.choice(['ABC', 'KJT', 'UYZ'])}"),
+    "Body_Height": ("Tinggi badan saya {value}.", lambda rng: f"{rng.randint(150, 190)} cm"),
+    "Body_Weight": ("Berat badan saya {value}.", lambda rng: f"{rng.randint(45, 100)} kg"),
+    "Blood_Pressure": ("Tekanan darah saya {value}.", lambda rng: f"{rng.randint(100, 150)}/{rng.randint(60, 95)} mmHg"),
+}
+
+
+def load_labels():
+    """The labels of AnonyMaskLabels.txt, or the template labels when the file is not there."""
+    try:
+        labels = [line.strip() for line in LABELS_FILE.read_text(encoding="utf-8").splitlines() if line.strip()]
+    except OSError:
+        return list(TEMPLATES)
+    missing = [label for label in labels if label not in TEMPLATES]
+    if missing:
+        raise ValueError(f"No synthetic template for: {', '.join(missing)}")
+    return labels
+
+
+def build_synthetic_document(target_chars, pii_density=0.3, seed=0, labels=None):
+    """
+    Builds a document of about `target_chars` characters in which a share
+    `pii_density` (0..1) of the sentences carries a PII value. Returns
+    (text, spans) where spans are {"label", "start", "end"} of the inserted values.
+    """
+    rng = random.Random(seed)
+    labels = labels or load_labels()
+    parts = []
+    spans = []
+    length = 0
+    sentences_in_paragraph = 0
+
+    while length < target_chars:
+        if rng.random() < pii_density:
+            label = rng.choice(labels)
+            template, generate = TEMPLATES[label]
+            value = generate(rng)
+            prefix, suffix = template.split("{value}")
+            start = length + len(prefix)
+            spans.append({"label": label, "start": start, "end": start + len(value)})
+            sentence = prefix + value + suffix
+        else:
+            sentence = rng.choice(FILLER)
+
+        sentences_in_paragraph += 1
+        separator = "\n" if sentences_in_paragraph % 5 == 0 else " "
+        parts.append(sentence + separator)
+        length += len(sentence) + len(separator)
+
+    return "".join(parts), spans
@@ -0,0 +1,114 @@
+"""
+Compact prediction responses.
+
+The default JSON responses repeat the detected word, the label name and the
+sentence text for every result. The compact format leaves out all text the
+client already has and sends, per detector:
+
+    explicit   {"labels": [label id, ...], "offsets": [start, end, start, end, ...]}
+    implicit   {"offsets": [start, end, ...], "topic_counts": [topics per sentence, ...],
+                "topic_ids": [label id, ...], "topic_scores": [score, ...]}
+
+Label ids index the tables of GET /labelTable. Every compact response carries
+the "table" version it was encoded with, so a client can tell when to fetch
+the tables again (after a model update).
+
+It is opt-in through the Accept header:
+    application/msgpack                     MessagePack, integer arrays as little-endian
+                                            int32 binary, scores as float32 binary
+    application/vnd.anonymask.compact+json  the same structure as plain JSON
+Any other Accept header gets the usual JSON response.
+"""
+import hashlib
+import json
+
+import msgpack
+import numpy as np
+from fastapi import Response
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+COMPACT_JSON_MEDIA_TYPE = "application/vnd.anonymask.compact+json"
+MSGPACK_ALIASES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+
+def negotiate(accept):
+    """Returns "msgpack", "json" (compact JSON) or None (the usual response) for an Accept header."""
+    if not accept:
+        return None
+    media_types = [part.split(";")[0].strip().lower() for part in accept.split(",")]
+    for media_type in media_types:
+        if media_type in MSGPACK_ALIASES:
+            return "msgpack"
+        if media_type == COMPACT_JSON_MEDIA_TYPE:
+            return "json"
+    return None
+
+
+class LabelTables:
+    """The explicit entity types and implicit topics, with a version derived from their content."""
+
+    def __init__(self, explicit_labels, implicit_labels):
+        self.explicit = list(explicit_labels)
+        self.implicit = list(implicit_labels)
+        self.version = hashlib.sha256(json.dumps([self.explicit, self.implicit]).encode("utf-8")).hexdigest()[:12]
+        self._explicit_ids = {label: index for index, label in enumerate(self.explicit)}
+        # Several binarizer classes can share a base topic ("B_Name" / "I_Name"): the first one wins
+        self._implicit_ids = {}
+        for index, label in enumerate(self.implicit):
+            self._implicit_ids.setdefault(label, index)
+
+    def as_dict(self):
+        return {"version": self.version, "explicit": self.explicit, "implicit": self.implicit}
+
+    def compact_explicit(self, entities):
+        labels = np.fromiter((self._explicit_ids[e["label"]] for e in entities), dtype=np.int32, count=len(entities))
+        offsets = np.fromiter(
+            (offset for e in entities for offset in (e["start"], e["end"])), dtype=np.int32, count=2 * len(entities)
+        )
+        return {"labels": labels, "offsets": offsets}
+
+    def compact_implicit(self, sentences):
+        offsets = np.fromiter(
+            (offset for s in sentences for offset in (s["start"], s["end"])), dtype=np.int32, count=2 * len(sentences)
+        )
+        topics = [topic for s in sentences for topic in s["predicted_topics"]]
+        return {
+            "offsets": offsets,
+            "topic_counts": np.fromiter((len(s["predicted_topics"]) for s in sentences), dtype=np.int32, count=len(sentences)),
+            "topic_ids": np.fromiter((self._implicit_ids[t["topic"]] for t in topics), dtype=np.int32, count=len(topics)),
+            "topic_scores": np.fromiter((t["score"] for t in topics), dtype=np.float32, count=len(topics)),
+        }
+
+
+# --- Encoding ---
+
+def compact_response(content, encoding):
+    """Encodes a compact response `content` (numpy arrays allowed) as MessagePack or JSON."""
+    if encoding == "msgpack":
+        return Response(packb(content), media_type=MSGPACK_MEDIA_TYPE)
+    return Response(json.dumps(content, default=_json_default, separators=(",", ":")), media_type=COMPACT_JSON_MEDIA_TYPE)
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def packb(value):
+    """
+    MessagePack encoding of a response: numpy arrays become little-endian binary,
+    numpy scalars plain numbers.
+    """
+    return msgpack.packb(value, default=_msgpack_default, use_bin_type=True, unicode_errors="surrogatepass")
+
+
+def _msgpack_default(value):
+    if isinstance(value, np.ndarray):
+        dtype = value.dtype.newbyteorder("<") if value.dtype.byteorder == ">" else value.dtype
+        return np.ascontiguousarray(value, dtype=dtype).tobytes()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot encode {type(value).__name__} as MessagePack")
@@ -0,0 +1,71 @@
+import threading
+import uuid
+from collections import OrderedDict
+
+
+def apply_edits(text, edits):
+    """
+    Applies (start, end, replacement) edits to `text`. Offsets refer to the
+    original text and the edits must not overlap. Returns (new_text, change_start,
+    change_end), where old text[change_start:change_end] is the smallest range that
+    covers every edit. Raises ValueError for out of range or overlapping edits.
+    """
+    edits = sorted(edits, key=lambda edit: (edit[0], edit[1]))
+    if not edits:
+        return text, 0, 0
+
+    pieces = []
+    position = 0
+    for start, end, replacement in edits:
+        if not 0 <= start <= end <= len(text):
+            raise ValueError(f"Edit [{start}, {end}) is outside the document (length {len(text)})")
+        if start < position:
+            raise ValueError(f"Edit [{start}, {end}) overlaps the previous edit")
+        pieces.append(text[position:start])
+        pieces.append(replacement)
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces), edits[0][0], max(end for _, end, _ in edits)
+
+
+class DocumentStore:
+    """
+    Keeps the last detection state of recently edited documents, so an edit can
+    be re-detected incrementally instead of from scratch.
+
+    Every document is a dict with its "text" and, per model name, the model
+    identity and the state the detector produced for that text. The least
+    recently used documents are dropped once `max_entries` is reached.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max(0, int(max_entries))
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    def get(self, document_id):
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document is not None:
+                self._documents.move_to_end(document_id)
+            return document
+
+    def put(self, document_id, document):
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._documents[document_id] = document
+            self._documents.move_to_end(document_id)
+            while len(self._documents) > self.max_entries:
+                self._documents.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+    def __len__(self):
+        return len(self._documents)
@@ -1,9 +1,16 @@
 import logging
+import numpy as np
 import torch
-from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
 import re
 import os
 from datetime import datetime
+from onnx_engine import ENGINE, OnnxLogitsModel, load_engine
+from model_loader import ModelLoader, import_lock
+from model_cache import resolve_model_dir
+import metrics
+from request_log import phase
+from masker import substitute_spans
+from tokenization import SharedTokens, adaptive_window_bounds, special_tokens, tokenize_document, tokenize_documents, window_bounds
 
 # --- MODEL AND TOKENIZER SETUP ---
 # In a real app, this would be done once on startup.
@@ -19,9 +26,11 @@ BASE_DIR = Path(getattr(sys, '_MEIPASS', Path(__file__).resolve().parent))
 # If running from PyInstaller, add subfolder
 if hasattr(sys, '_MEIPASS'):
     MODEL_PATH = str(BASE_DIR) + "\explicit_model"
+    ONNX_DIR = BASE_DIR / "explicit_model" / "onnx"
 else:
     # In dev mode, the script is already inside explicit_model/
     MODEL_PATH = "WhiteCloudd/AnonymaskExplicit"
+    ONNX_DIR = BASE_DIR / "onnx"
 
 logging.basicConfig(
     filename="anonymask_backend.log",  # This log file will appear in the working dir (see below)
@@ -35,153 +44,511 @@ logging.info("Explicit model path: " + MODEL_PATH)
 # MODEL_PATH = "WhiteCloudd/AnonymaskExplicit"
 MAX_LENGTH = 128  # The maximum sequence length for the model
 OVERLAP = 30      # The number of tokens to overlap between chunks
+# How the text is cut into windows:
+#   adaptive  windows sized to the document, up to MAX_WINDOW tokens (0: as long as the model's
+#             position embeddings allow); a document that fits is one window without overlap, and
+#             a token seen by two windows takes the prediction of the one where it is most central
+#   fixed     MAX_LENGTH-token windows every MAX_LENGTH - OVERLAP tokens, the last window wins
+# "fixed" stays the default until benchmarks/bench_windowing.py has been run on the released model.
+WINDOWING = os.environ.get("ANONYMASK_EXPLICIT_WINDOWING", "fixed")
+MAX_WINDOW = int(os.environ.get("ANONYMASK_EXPLICIT_MAX_WINDOW", "0"))
+# Number of windows sent through the model in one forward pass.
+# A batch size of 1 reproduces the old one-window-at-a-time behaviour.
+BATCH_SIZE = int(os.environ.get("ANONYMASK_EXPLICIT_BATCH_SIZE", "16"))
 
-print("Loading EXPLICIT classification model...")
 print("Full path of this file:", os.path.abspath(__file__))
-device = "cuda" if torch.cuda.is_available() else "cpu"
-try:
-    # Load the fine-tuned model and tokenizer
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-    model = AutoModelForTokenClassification.from_pretrained(MODEL_PATH).to(device)
+# Every code point for which str.isspace() is true (U+3000 is the highest one)
+WHITESPACE_CODEPOINTS = np.array([c for c in range(0x3001) if chr(c).isspace()], dtype=np.uint32)
+
+
+def build_label_tables(id2label):
+    """
+    Maps every label id to the id of its base entity type ("B_Name" / "I_Name" -> "Name").
+    The "O" label maps to -1. Returns (label_type_ids, entity_types).
+    """
+    entity_types = []
+    label_type_ids = np.full(max(id2label) + 1, -1, dtype=np.int64)
+    for label_id, label in id2label.items():
+        if label == 'O':
+            continue
+        base_entity_type = label[2:]
+        if base_entity_type not in entity_types:
+            entity_types.append(base_entity_type)
+        label_type_ids[label_id] = entity_types.index(base_entity_type)
+    return label_type_ids, entity_types
+
 
-    # model.save_pretrained("models/AnonymaskExplicit")
-    # tokenizer.save_pretrained("models/AnonymaskExplicit")
+device = "cuda" if torch.cuda.is_available() else "cpu"
 
-    model.eval()
+# Filled in by load_explicit_model(). Nothing is loaded at import time: main.py starts
+# the load in the background and the predict functions wait for it through `loader`.
+tokenizer = None
+model = None
+index_to_label = None
+label_type_ids, entity_types = None, None
+onnx_session = None
+
+
+def load_explicit_model():
+    """Loads the fine-tuned model and tokenizer into the module globals."""
+    global tokenizer, model, index_to_label, label_type_ids, entity_types, onnx_session
+
+    print("Loading EXPLICIT classification model...")
+    # Imported here rather than at the top: importing transformers alone takes seconds
+    with loader.phase("import"), import_lock:
+        from transformers import AutoTokenizer, AutoModelForTokenClassification
+    try:
+        # Packaged builds load from the persistent model cache instead of the freshly unpacked copy
+        with loader.phase("model_cache"):
+            model_dir = resolve_model_dir("explicit_model", MODEL_PATH)
+
+        # Load the fine-tuned model and tokenizer
+        with loader.phase("tokenizer"):
+            loaded_tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        with loader.phase("weights"):
+            loaded_model = AutoModelForTokenClassification.from_pretrained(model_dir).to(device)
+
+        # model.save_pretrained("models/AnonymaskExplicit")
+        # tokenizer.save_pretrained("models/AnonymaskExplicit")
+
+        loaded_model.eval()
+    except Exception as e:
+        print(f"Error loading model: {e}")
+        print(f"Please make sure the path '{MODEL_PATH}' points to your saved model directory.")
+        raise
 
     # Load labels dynamically from the model's config for robustness
-    index_to_label = model.config.id2label
+    index_to_label = loaded_model.config.id2label
+    label_type_ids, entity_types = build_label_tables(index_to_label)
+
+    # Optional ONNX Runtime engine (ANONYMASK_ENGINE=onnx / onnx-int8); None means PyTorch
+    with loader.phase("engine"):
+        onnx_session = load_engine(ENGINE, ONNX_DIR)
+
+    tokenizer, model = loaded_tokenizer, loaded_model
     print("Model loaded successfully.")
 
-except Exception as e:
-    print(f"Error loading model: {e}")
-    print(f"Please make sure the path '{MODEL_PATH}' points to your saved model directory.")
-    model = None
+
+loader = ModelLoader("explicit", load_explicit_model)
+
+
+def shared_state():
+    """
+    Everything a worker process needs to predict without loading the model again
+    (see worker_pool.py). The weights are moved to shared memory first, so the
+    workers map the same pages instead of holding a copy each.
+    """
+    model.share_memory()
+    return {
+        "tokenizer": tokenizer,
+        "model": model,
+        "onnx_path": onnx_session.path if onnx_session is not None else None,
+    }
+
+
+def install_shared_state(state):
+    """Installs the state from shared_state() in this process and marks the model as loaded."""
+    global tokenizer, model, index_to_label, label_type_ids, entity_types, onnx_session
+
+    tokenizer, model = state["tokenizer"], state["model"]
+    index_to_label = model.config.id2label
+    label_type_ids, entity_types = build_label_tables(index_to_label)
+    if state["onnx_path"]:
+        onnx_session = OnnxLogitsModel(state["onnx_path"], intra_op_threads=int(os.environ.get("ANONYMASK_ONNX_THREADS", "0")))
+    loader.mark_ready()
+
+
+def model_identity():
+    """
+    Identifies everything that changes the explicit predictions for a given text
+    (weights, engine, windowing). None while the model is not loaded.
+    """
+    if not loader.ready:
+        return None
+    engine = onnx_session.path if onnx_session is not None else "torch"
+    return f"explicit|{MODEL_PATH}|{engine}|{WINDOWING}|{window_length()}|{OVERLAP}"
+
+
+def label_table():
+    """The entity types in label id order (the "label" of every entity is one of them)."""
+    loader.ensure_loaded()
+    return list(entity_types)
+
+
+def use_engine(engine):
+    """Switches the explicit model between "torch", "onnx" and "onnx-int8" at runtime."""
+    global onnx_session
+    onnx_session = load_engine(engine, ONNX_DIR)
+    return onnx_session is not None or engine == "torch"
+
+
+def forward_logits(input_ids, attention_mask):
+    """
+    Runs one forward pass on int64 NumPy arrays with the selected engine and
+    returns the logits as a NumPy array.
+    """
+    if onnx_session is not None:
+        return onnx_session(input_ids, attention_mask)
+    with torch.no_grad():
+        return model(
+            input_ids=torch.from_numpy(input_ids).to(device),
+            attention_mask=torch.from_numpy(attention_mask).to(device),
+        ).logits.cpu().numpy()
+
+
+def run_window_batches(window_input_ids, batch_size=BATCH_SIZE):
+    """
+    Runs the model over the windows, `batch_size` windows per forward pass. Windows
+    hold the token ids without special tokens (views from tokenize_windows); the
+    special tokens are added while a window is copied into the batch. Windows in a
+    batch are right-padded to the longest one and the padding is hidden from the
+    model with the attention mask. Returns one array of label ids per window, for
+    the window's own tokens.
+    """
+    batch_size = max(1, int(batch_size))
+    pad_token_id = tokenizer.pad_token_id
+    prefix, suffix = special_tokens(tokenizer)
+    window_predictions = []
+
+    for batch_start in range(0, len(window_input_ids), batch_size):
+        batch = window_input_ids[batch_start:batch_start + batch_size]
+        longest = max(len(ids) for ids in batch) + len(prefix) + len(suffix)
+
+        input_ids = np.full((len(batch), longest), pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(batch), longest), dtype=np.int64)
+        input_ids[:, :len(prefix)] = prefix
+        for row, ids in enumerate(batch):
+            end = len(prefix) + len(ids)
+            input_ids[row, len(prefix):end] = ids
+            input_ids[row, end:end + len(suffix)] = suffix
+            attention_mask[row, :end + len(suffix)] = 1
+
+        metrics.BATCH_SIZE.observe(len(batch), "explicit")
+        predictions = np.argmax(forward_logits(input_ids, attention_mask), axis=2)
+
+        for row, ids in enumerate(batch):
+            window_predictions.append(predictions[row, len(prefix):len(prefix) + len(ids)])
+
+    return window_predictions
+
+
+def model_max_length():
+    """The longest input, special tokens included, the model's position embeddings allow."""
+    config = model.config
+    # RoBERTa-style models number the positions from pad_token_id + 1
+    offset = config.pad_token_id + 1 if config.model_type in ("roberta", "xlm-roberta", "camembert") else 0
+    return config.max_position_embeddings - offset
+
+
+def window_length():
+    """The longest window, special tokens included, for the current WINDOWING."""
+    if WINDOWING == "fixed":
+        return MAX_LENGTH
+    return min(MAX_WINDOW, model_max_length()) if MAX_WINDOW > 0 else model_max_length()
+
+
+def window_width():
+    """Tokens of the text per window: the window length minus the special tokens."""
+    prefix, suffix = special_tokens(tokenizer)
+    return window_length() - len(prefix) - len(suffix)
+
+
+def tokenize_windows(text, tokens=None):
+    """
+    Tokenizes the text once and splits it into overlapping windows (see WINDOWING).
+    `tokens` can hand in a DocumentTokens of `text` made with this tokenizer (see
+    tokenization.SharedTokens). Returns (tokens, windows) with a
+    (start, end, keep_start, keep_end) token range per window: the tokens it sees
+    and the tokens whose prediction it keeps.
+    """
+    if tokens is None:
+        tokens = tokenize_document(tokenizer, text)
+    if WINDOWING == "fixed":
+        windows = window_bounds(len(tokens), window_width(), OVERLAP)
+    else:
+        windows = adaptive_window_bounds(len(tokens), window_width(), OVERLAP)
+    observe_document(text, tokens, windows)
+    return tokens, windows
+
+
+def shared_tokens(text):
+    """
+    A tokenization of `text` with this model's tokenizer that both models can use:
+    pass it to predict_explicit_pii and predict_implicit_pii.
+    """
+    return SharedTokens(text, lambda: tokenizer)
+
+
+def window_input_ids(tokens, windows):
+    """The token ids of every window, as views into the document's id array."""
+    return [tokens.ids[start:end] for start, end, _, _ in windows]
 
 
-def predict_explicit_pii(text: str):
+def observe_document(text, tokens, windows):
+    """Records the size of a document for /metrics (characters, tokens, windows)."""
+    metrics.DOCUMENT_CHARACTERS.observe(len(text), "explicit")
+    metrics.DOCUMENT_TOKENS.observe(len(tokens), "explicit")
+    metrics.DOCUMENT_WINDOWS.observe(len(windows))
+
+
+def predict_explicit_pii(text: str, batch_size=BATCH_SIZE, infer=None, shared_tokens=None):
     """
     Predicts PII entities in a given text using a sliding window approach
     and a robust entity grouping logic that correctly handles punctuation.
+    The windows are run through the model `batch_size` at a time, or handed to
+    `infer` (e.g. a shared MicroBatcher) which must return label ids per window.
+    `shared_tokens` (tokenization.SharedTokens over this model's tokenizer) lets
+    the implicit model reuse the same tokenization.
     """
-    if not model:
+    if not loader.ensure_loaded():
         print("Model not loaded. Cannot run prediction.")
         return []
 
     # --- Step 1: Tokenize and Predict on Chunks ---
 
-    tokens = tokenizer(
-        text,
-        return_offsets_mapping=True,
-        truncation=True,
-        max_length=MAX_LENGTH,
-        stride=OVERLAP,
-        return_overflowing_tokens=True
-    )
+    with phase("explicit", "tokenize"):
+        tokens, windows = tokenize_windows(text, shared_tokens.get() if shared_tokens is not None else None)
 
-    all_token_predictions = []
+    with phase("explicit", "inference"):
+        window_predictions = infer_windows(window_input_ids(tokens, windows), batch_size, infer)
 
-    for i in range(len(tokens["input_ids"])):
-        chunk_input_ids = torch.tensor([tokens["input_ids"][i]], device=device)
-        chunk_offset_mapping = tokens["offset_mapping"][i]
+    # --- Step 2: Entity Grouping ---
+    return entities_from_windows(text, tokens, windows, window_predictions)
 
-        with torch.no_grad():
-            outputs = model(chunk_input_ids).logits
-            predictions = torch.argmax(outputs, dim=2)
 
-        for j, pred_idx in enumerate(predictions[0]):
-            label = index_to_label[pred_idx.item()]
-            offset = chunk_offset_mapping[j]
+def infer_windows(windows, batch_size=BATCH_SIZE, infer=None):
+    """Label ids of every window, from `infer` when given, otherwise from run_window_batches."""
+    if not windows:
+        return []
+    if infer is not None:
+        return infer(windows)
+    return run_window_batches(windows, batch_size=batch_size)
 
-            if offset is None or (offset[0] == 0 and offset[1] == 0):
-                continue
 
-            all_token_predictions.append({"label": label, "start": offset[0], "end": offset[1]})
+def predict_explicit_pii_batch(texts, batch_size=BATCH_SIZE, infer=None):
+    """
+    Runs predict_explicit_pii over several documents at once. The windows of all
+    documents are packed into shared batches, so small documents fill up the
+    batches together. Returns one entity list per text, in input order.
+    """
+    if not loader.ensure_loaded():
+        print("Model not loaded. Cannot run prediction.")
+        return [[] for _ in texts]
 
-    unique_predictions_by_start = {pred['start']: pred for pred in all_token_predictions}
-    sorted_predictions = sorted(unique_predictions_by_start.values(), key=lambda x: x['start'])
+    # All documents go through the fast tokenizer in one call
+    with phase("explicit", "tokenize"):
+        documents = [tokenize_windows(text, tokens) for text, tokens in zip(texts, tokenize_documents(tokenizer, texts))]
+    all_windows = [ids for tokens, windows in documents for ids in window_input_ids(tokens, windows)]
 
-    # **DEBUGGING:** Print the raw token predictions before grouping
-    print("\n--- Raw Token Predictions (Before Grouping) ---")
-    for pred in sorted_predictions:
-        if pred['label'] != 'O': # Only print non-O tags to see what the model found
-             print(f"Token: '{text[pred['start']:pred['end']]}', Label: {pred['label']}")
-    print("---------------------------------------------\n")
+    with phase("explicit", "inference"):
+        all_predictions = infer_windows(all_windows, batch_size, infer)
 
+    results = []
+    window_start = 0
+    for text, (tokens, windows) in zip(texts, documents):
+        window_end = window_start + len(windows)
+        results.append(entities_from_windows(text, tokens, windows, all_predictions[window_start:window_end]))
+        window_start = window_end
+    return results
 
-    # --- Step 2: **IMPROVED** Entity Grouping Logic ---
-    final_entities = []
-    i = 0
-    while i < len(sorted_predictions):
-        pred = sorted_predictions[i]
-        label = pred['label']
 
-        if label == 'O':
-            i += 1
-            continue
+def entities_from_windows(text, tokens, windows, window_predictions):
+    """
+    Turns the label ids predicted for every window of `text` into entities.
+    """
+    with phase("explicit", "decode"):
+        starts, ends, label_ids = resolve_token_predictions(tokens, windows, window_predictions)
+    with phase("explicit", "group"):
+        return group_entities(text, starts, ends, label_ids)
 
-        # Get the base entity type (e.g., 'Name' from 'B-Name' or 'I-Name')
-        base_entity_type = label[2:]
-        start_offset = pred['start']
-        end_offset = pred['end']
-
-        # Look ahead to merge adjacent or nearby tokens of the same entity type
-        k = i + 1
-        while k < len(sorted_predictions):
-            next_pred = sorted_predictions[k]
-            next_label = next_pred['label']
-
-            # Allow 'O' labels for spaces or punctuation between entity parts
-            if next_label == 'O':
-                gap_text = text[end_offset:next_pred['start']]
-                if gap_text.isspace() or gap_text == '':
-                    # If the token after the gap is part of the same entity, merge it
-                    if k + 1 < len(sorted_predictions):
-                        potential_next_part = sorted_predictions[k+1]
-                        if potential_next_part['label'][2:] == base_entity_type:
-                            end_offset = potential_next_part['end']
-                            k += 2 # Skip the 'O' token and the merged part
-                            continue
-                # If it's not a mergeable gap, stop.
-                break
-
-            next_base_entity_type = next_label[2:]
-
-            # Condition to merge: must have the same base type and be adjacent or separated by only a space
-            gap_text = text[end_offset:next_pred['start']]
-            if next_base_entity_type == base_entity_type and (next_pred['start'] == end_offset or gap_text.isspace()):
-                end_offset = next_pred['end']
-                k += 1
-            else:
-                break # Stop if there's a significant gap or the entity type changes
-
-        final_entities.append({
-            "word": text[start_offset:end_offset],
-            "label": base_entity_type,
-            "start": start_offset,
-            "end": end_offset
-        })
 
-        # Move the main index past all the tokens we just processed
-        i = k
+def iter_explicit_pii(text: str, batch_size=BATCH_SIZE, infer=None):
+    """
+    Streaming version of predict_explicit_pii. Runs the windows `batch_size` at a
+    time and yields, after every batch, the list of entities that can no longer
+    change. Offsets are absolute to `text` and the entities are the same as the
+    ones predict_explicit_pii returns.
+    """
+    if not loader.ensure_loaded():
+        print("Model not loaded. Cannot run prediction.")
+        return
+
+    batch_size = max(1, int(batch_size))
+    tokens, windows = tokenize_windows(text)
+    if infer is None:
+        infer = lambda windows: run_window_batches(windows, batch_size=len(windows))
 
-    return final_entities
+    # Tokens that are final but may still belong to an entity that is not closed yet
+    pending = (np.zeros(0, dtype=np.int64),) * 3
 
-def mask_text_with_spans(original_text, pii_results):
+    if not windows:
+        return
+
+    for batch_start in range(0, len(windows), batch_size):
+        batch_end = min(batch_start + batch_size, len(windows))
+        batch_windows = windows[batch_start:batch_end]
+        window_predictions = infer(window_input_ids(tokens, batch_windows))
+        # Only the tokens the batch's windows keep are resolved: the rest of the overlap with
+        # the next window takes that window's prediction, so everything resolved here is final.
+        starts, ends, label_ids = resolve_token_predictions(tokens, batch_windows, window_predictions)
+        is_last_batch = batch_end == len(windows)
+
+        starts, ends, label_ids = (np.concatenate(pair) for pair in zip(pending, (starts, ends, label_ids)))
+        entities = group_entities(text, starts, ends, label_ids)
+
+        if is_last_batch:
+            yield entities
+            return
+
+        # The last entity could still grow into the next windows: hold back its tokens
+        if entities:
+            held = starts >= entities[-1]["start"]
+            pending = (starts[held], ends[held], label_ids[held])
+            entities = entities[:-1]
+        else:
+            pending = (np.zeros(0, dtype=np.int64),) * 3
+
+        if entities:
+            yield entities
+
+
+def predict_explicit_tokens(text: str, batch_size=BATCH_SIZE, infer=None, known_windows=None):
     """
-    Masks PII entities in a text using their start and end character positions.
+    Runs the windows over the whole text and returns the resolved token predictions
+    (starts, ends, label_ids) instead of entities, and the predictions of every
+    window keyed by its token ids. Together they are the per-document state that
+    update_explicit_tokens updates; group_entities turns the token predictions into
+    entities. Windows found in `known_windows` (same token ids) are not run again.
+    Returns (token_predictions, window_predictions, (region_start, region_end)) with
+    the characters whose predictions come from windows that went through the model.
+    """
+    known_windows = known_windows or {}
+    with phase("explicit", "tokenize"):
+        tokens, windows = tokenize_windows(text)
+        window_ids = window_input_ids(tokens, windows)
+        keys = [ids.tobytes() for ids in window_ids]
+    missing = [i for i, key in enumerate(keys) if key not in known_windows]
+    with phase("explicit", "inference"):
+        computed = infer_windows([window_ids[i] for i in missing], batch_size, infer)
+    window_predictions = {key: known_windows[key] for key in keys if key in known_windows}
+    window_predictions.update((keys[i], predictions) for i, predictions in zip(missing, computed))
+    with phase("explicit", "decode"):
+        token_predictions = resolve_token_predictions(tokens, windows, [window_predictions[key] for key in keys])
+
+    region = (0, 0)
+    if missing:
+        first_token, last_token = windows[missing[0]][2], windows[missing[-1]][3]
+        if last_token > first_token:
+            region = (int(tokens.offsets[first_token, 0]), int(tokens.offsets[last_token - 1, 1]))
+    return token_predictions, window_predictions, region
+
+
+def update_explicit_tokens(state, new_text, batch_size=BATCH_SIZE, infer=None):
+    """
+    Re-detects an edited document from the `state` (token predictions, window
+    predictions) that predict_explicit_tokens returned for its previous text. The
+    new text is tokenized again and cut into the windows a full run makes; only the
+    windows whose tokens changed go through the model, so the result is the one of
+    a full run. Returns the same as predict_explicit_tokens.
+    """
+    _, known_windows = state
+    return predict_explicit_tokens(new_text, batch_size=batch_size, infer=infer, known_windows=known_windows)
+
+
+def resolve_token_predictions(tokens, windows, window_predictions):
     """
-    pii_results.sort(key=lambda x: x['start'])
+    Takes from every window the predictions of the tokens it keeps (see
+    tokenize_windows) and returns token arrays sorted by start offset, for the
+    tokens the given windows keep. Empty-offset tokens are dropped, and of
+    several tokens with the same start the last one is kept. Returns
+    (starts, ends, label_ids) as NumPy arrays.
+    """
+    if not len(window_predictions):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    first_token, last_token = windows[0][2], windows[len(window_predictions) - 1][3]
+    label_ids = np.empty(last_token - first_token, dtype=np.int64)
+    for (start, _, keep_start, keep_end), predictions in zip(windows, window_predictions):
+        label_ids[keep_start - first_token:keep_end - first_token] = predictions[keep_start - start:keep_end - start]
+    offsets = tokens.offsets[first_token:last_token]
 
-    masked_text = ""
-    last_index = 0
+    is_real_token = (offsets[:, 0] != 0) | (offsets[:, 1] != 0)
+    offsets, label_ids = offsets[is_real_token], label_ids[is_real_token]
 
-    for entity in pii_results:
-        masked_text += original_text[last_index:entity['start']]
-        masked_text += f"[{entity['label'].upper()}]"
-        last_index = entity['end']
+    # np.unique keeps the first occurrence, so search the reversed arrays to keep the last token
+    # with a given start. The unique starts come back sorted, which gives the final token order.
+    _, last_from_end = np.unique(offsets[::-1, 0], return_index=True)
+    keep = len(offsets) - 1 - last_from_end
+    return offsets[keep, 0], offsets[keep, 1], label_ids[keep]
+
+
+def group_entities(text, starts, ends, label_ids):
+    """
+    Merges token predictions into entities with one vectorized pass.
 
-    masked_text += original_text[last_index:]
+    A token continues the entity of the token before it when both have the same
+    base type (B_/I_ prefixes are ignored) and they touch or are separated by
+    whitespace only. A single "O" token can be bridged when it follows the entity
+    directly (or after whitespace) and the token after it has the same type.
+    Every other entity token starts a new entity.
+    """
+    types = label_type_ids[label_ids]
+    is_entity = types >= 0
+    if not is_entity.any():
+        return []
+
+    # Describe the gap between every token and the one before it
+    gap_from, gap_to = ends[:-1], starts[1:]
+    gap_empty = gap_to <= gap_from
+    gap_touching = gap_to == gap_from
+    gap_whitespace = np.zeros(len(gap_from), dtype=bool)
+    has_gap = ~gap_empty
+    if has_gap.any():
+        codepoints = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+        non_space_before = np.concatenate(([0], np.cumsum(~np.isin(codepoints, WHITESPACE_CODEPOINTS))))
+        gap_whitespace[has_gap] = non_space_before[gap_to[has_gap]] == non_space_before[gap_from[has_gap]]
+
+    # Token t directly continues token t-1
+    continues = np.zeros(len(types), dtype=bool)
+    continues[1:] = (
+        is_entity[1:] & is_entity[:-1] & (types[1:] == types[:-1])
+        & (gap_touching | gap_whitespace)
+    )
+    # Token t continues token t-2 across a single "O" token at t-1
+    if len(types) > 2:
+        continues[2:] |= (
+            is_entity[2:] & ~is_entity[1:-1] & is_entity[:-2] & (types[2:] == types[:-2])
+            & (gap_empty[:-1] | gap_whitespace[:-1])
+        )
+
+    # Every entity token that does not continue the previous one opens a new entity,
+    # which runs until the entity token just before the next opening token.
+    entity_tokens = np.flatnonzero(is_entity)
+    opens = np.flatnonzero(~continues[entity_tokens])
+    closes = np.append(opens[1:] - 1, len(entity_tokens) - 1)
+
+    entity_starts = starts[entity_tokens[opens]].tolist()
+    entity_ends = ends[entity_tokens[closes]].tolist()
+    entity_labels = types[entity_tokens[opens]].tolist()
+
+    return [
+        {
+            "word": text[start_offset:end_offset],
+            "label": entity_types[type_id],
+            "start": start_offset,
+            "end": end_offset
+        }
+        for start_offset, end_offset, type_id in zip(entity_starts, entity_ends, entity_labels)
+    ]
+
+def mask_text_with_spans(original_text, pii_results):
+    """
+    Masks PII entities in a text using their start and end character positions.
+    """
+    masked_text, _ = substitute_spans(
+        original_text, [(entity['start'], entity['end'], f"[{entity['label'].upper()}]") for entity in pii_results]
+    )
     return masked_text
 
 # import torch
@@ -2,12 +2,18 @@ import logging
 import torch
 import numpy as np
 import joblib
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import regex as re
 import json
 import sys
 import os
 from pathlib import Path
+from onnx_engine import ENGINE, OnnxLogitsModel, load_engine
+from model_loader import ModelLoader, import_lock
+from model_cache import resolve_model_dir
+import metrics
+from request_log import phase
+from implicit_model.sentence_cache import SentenceScoreCache
+from implicit_model.segmenter import default_segmenter
+from tokenization import fingerprint, special_tokens
 
 # --- 1. CONFIGURATION ---
 
@@ -21,10 +27,12 @@ BASE_DIR = Path(getattr(sys, '_MEIPASS', Path(__file__).resolve().parent))
 if hasattr(sys, '_MEIPASS'):
     IMPLICIT_MODEL_PATH =  os.path.join(BASE_DIR, "implicit_model")
     MLB_PATH = os.path.join(BASE_DIR, "implicit_model", "mlb.pkl")
+    ONNX_DIR = BASE_DIR / "implicit_model" / "onnx"
 else:
     # In dev mode, the script is already inside explicit_model/
     IMPLICIT_MODEL_PATH = "WhiteCloudd/AnonymaskImplicit"
     MLB_PATH = os.path.join(BASE_DIR, "mlb.pkl")
+    ONNX_DIR = BASE_DIR / "onnx"
 
 
 logging.basicConfig(
@@ -40,6 +48,10 @@ logging.info("MLB PATH: " + str(MLB_PATH))
 # MLB_PATH = IMPLICIT_MODEL_PATH / "mlb.pkl"
 
 CONFIDENCE_THRESHOLD = 0.5 # Only show predictions with a score > 0.5
+# Number of sentences scored together in one forward pass
+BATCH_SIZE = int(os.environ.get("ANONYMASK_IMPLICIT_BATCH_SIZE", "32"))
+# Number of distinct sentences whose probabilities are remembered (0 disables the memo)
+SENTENCE_CACHE_ENTRIES = int(os.environ.get("ANONYMASK_SENTENCE_CACHE_ENTRIES", "50000"))
 # IMPLICIT_MODEL_PATH = "WhiteCloudd/AnonymaskImplicit"
 # MLB_PATH = IMPLICIT_MODEL_LOCAL_PATH + "/mlb.pkl"
 
@@ -53,12 +65,14 @@ CONFIDENCE_THRESHOLD = 0.5 # Only show predictions with a score > 0.5
 # ]
 # --- 2. MODEL LOADING --
 
-print("Loading implicit classification model...")
 print("Full path of this file:", os.path.abspath(__file__))
 # device = "cuda" if torch.cuda.is_available() else "cpu"
 
 def load_implicit_tools(model_path, mlb_path):
     """Loads the fine-tuned model, tokenizer, and MultiLabelBinarizer."""
+    # Imported here rather than at the top: importing transformers alone takes seconds
+    with loader.phase("import"), import_lock:
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
     print("--- Loading Implicit Model and Tools ---")
     device = "cuda" if torch.cuda.is_available() else "cpu"
     print(f"Using device: {device}")
@@ -67,11 +81,20 @@ def load_implicit_tools(model_path, mlb_path):
         # if not model_path.exists() or not mlb_path.exists():
         #     raise FileNotFoundError("Model or mlb.pkl not found in the specified path.")
 
-        model = AutoModelForSequenceClassification.from_pretrained(model_path)
+        # Packaged builds load from the persistent model cache instead of the freshly unpacked copy
+        with loader.phase("model_cache"):
+            cached_dir = resolve_model_dir("implicit_model", model_path)
+            if cached_dir != str(model_path):
+                model_path, mlb_path = cached_dir, os.path.join(cached_dir, os.path.basename(mlb_path))
+
+        with loader.phase("weights"):
+            model = AutoModelForSequenceClassification.from_pretrained(model_path)
         logging.info("1")
-        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        with loader.phase("tokenizer"):
+            tokenizer = AutoTokenizer.from_pretrained(model_path)
         logging.info("2")
-        mlb = joblib.load(mlb_path)
+        with loader.phase("labels"):
+            mlb = joblib.load(mlb_path)
         logging.info("3")
 
         # model.save_pretrained("models/AnonymaskImplicit")
@@ -95,11 +118,138 @@ def load_implicit_tools(model_path, mlb_path):
         logging.info(f"Please ensure the path '{model_path}' and '{mlb_path}' are correct.")
         return None, None, None, None
 
-# Load all necessary components at the start
-implicit_model, implicit_tokenizer, mlb, device = load_implicit_tools(IMPLICIT_MODEL_PATH, MLB_PATH)
+# Filled in by load_implicit_model(). Nothing is loaded at import time: main.py starts
+# the load in the background and the predict functions wait for it through `loader`.
+implicit_model, implicit_tokenizer, mlb = None, None, None
+device = "cuda" if torch.cuda.is_available() else "cpu"
+onnx_session = None
+# Probability rows per normalized sentence, shared by every request
+sentence_cache = SentenceScoreCache(SENTENCE_CACHE_ENTRIES)
+
+def load_implicit_model():
+    """Loads all necessary components into the module globals."""
+    global implicit_model, implicit_tokenizer, mlb, device, onnx_session
+
+    print("Loading implicit classification model...")
+    loaded_model, loaded_tokenizer, loaded_mlb, loaded_device = load_implicit_tools(IMPLICIT_MODEL_PATH, MLB_PATH)
+    if loaded_model is None:
+        raise RuntimeError(f"Could not load the implicit model from '{IMPLICIT_MODEL_PATH}' / '{MLB_PATH}'")
+
+    # Optional ONNX Runtime engine (ANONYMASK_ENGINE=onnx / onnx-int8); None means PyTorch
+    with loader.phase("engine"):
+        onnx_session = load_engine(ENGINE, ONNX_DIR)
+
+    implicit_tokenizer, mlb, device = loaded_tokenizer, loaded_mlb, loaded_device
+    implicit_model = loaded_model
+    sentence_cache.clear()
+
+loader = ModelLoader("implicit", load_implicit_model)
+
+def shared_state():
+    """
+    Everything a worker process needs to predict without loading the model again
+    (see worker_pool.py). The weights are moved to shared memory first, so the
+    workers map the same pages instead of holding a copy each.
+    """
+    implicit_model.share_memory()
+    return {
+        "model": implicit_model,
+        "tokenizer": implicit_tokenizer,
+        "mlb": mlb,
+        "onnx_path": onnx_session.path if onnx_session is not None else None,
+    }
+
+def install_shared_state(state):
+    """Installs the state from shared_state() in this process and marks the model as loaded."""
+    global implicit_model, implicit_tokenizer, mlb, onnx_session
+
+    implicit_model, implicit_tokenizer, mlb = state["model"], state["tokenizer"], state["mlb"]
+    if state["onnx_path"]:
+        onnx_session = OnnxLogitsModel(state["onnx_path"], intra_op_threads=int(os.environ.get("ANONYMASK_ONNX_THREADS", "0")))
+    loader.mark_ready()
+
+def model_identity():
+    """
+    Identifies everything that changes the implicit predictions for a given text
+    (weights, engine, threshold). None while the model is not loaded.
+    """
+    if not loader.ready:
+        return None
+    engine = onnx_session.path if onnx_session is not None else "torch"
+    return f"implicit|{IMPLICIT_MODEL_PATH}|{engine}|{CONFIDENCE_THRESHOLD}"
+
+def topic_table():
+    """The base topic of every binarizer class, in class order (the "topic" of every result is one of them)."""
+    loader.ensure_loaded()
+    return topic_label_table(mlb)[0].tolist()
+
+def use_engine(engine):
+    """Switches the implicit model between "torch", "onnx" and "onnx-int8" at runtime."""
+    global onnx_session
+    onnx_session = load_engine(engine, ONNX_DIR)
+    # Memoized rows were produced by the previous engine
+    sentence_cache.clear()
+    return onnx_session is not None or engine == "torch"
+
+def forward_logits(input_ids, attention_mask):
+    """
+    Runs one forward pass on int64 NumPy arrays with the selected engine and
+    returns the logits as a NumPy array.
+    """
+    if onnx_session is not None:
+        return onnx_session(input_ids, attention_mask)
+    with torch.no_grad():
+        return implicit_model(
+            input_ids=torch.from_numpy(input_ids).to(device),
+            attention_mask=torch.from_numpy(attention_mask).to(device),
+        ).logits.cpu().numpy()
 
 # --- 3. IMPLICIT PREDICTION LOGIC ---
 
+def topic_label_table(binarizer):
+    """
+    Returns the base topic name for every binarizer class ("B_Name" -> "Name")
+    and a boolean mask of the classes that count as a topic at all.
+    """
+    base_labels = np.array([
+        label[2:] if label.startswith("B_") or label.startswith("I_") else label
+        for label in binarizer.classes_
+    ], dtype=object)
+    is_topic = np.array([bool(label) and label != '-' for label in base_labels], dtype=bool)
+    return base_labels, is_topic
+
+def topics_from_probability_matrix(probabilities, binarizer, threshold=0.5):
+    """
+    Applies the threshold to a whole (sentences x labels) probability matrix at
+    once and returns, per sentence, its detected topics sorted by score.
+    """
+    probabilities = np.asarray(probabilities)
+    base_labels, is_topic = topic_label_table(binarizer)
+
+    rows, cols = np.nonzero((probabilities > threshold) & is_topic)
+    scores = probabilities[rows, cols]
+
+    # Sentence first, highest score first, label order as tie-breaker
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+
+    topics_per_sentence = [[] for _ in range(probabilities.shape[0])]
+    bounds = np.searchsorted(rows, np.arange(probabilities.shape[0] + 1))
+    topic_names = base_labels[cols].tolist()
+    topic_scores = scores.tolist()
+    for row in np.unique(rows).tolist():
+        topics_per_sentence[row] = [
+            {"topic": topic, "score": score}
+            for topic, score in zip(topic_names[bounds[row]:bounds[row + 1]], topic_scores[bounds[row]:bounds[row + 1]])
+        ]
+    return topics_per_sentence
+
+def topics_from_probabilities(probabilities, binarizer, threshold=0.5):
+    """
+    Maps one row of sigmoid probabilities to the list of detected topics.
+    """
+    return topics_from_probability_matrix(np.asarray(probabilities)[None, :], binarizer, threshold)[0]
+
 def predict_single_sentence(text: str, model, tokenizer, binarizer, threshold=0.5):
     """
     Runs a prediction on a single sentence and returns a list of detected topics.
@@ -119,49 +269,113 @@ def predict_single_sentence(text: str, model, tokenizer, binarizer, threshold=0.
     probabilities = torch.sigmoid(logits).cpu().numpy()[0]
 
     # 4. Map probabilities to labels and apply threshold
-    detected_topics = []
-    for i, prob in enumerate(probabilities):
-        if prob > threshold:
-            label_name = binarizer.classes_[i]
-            if label_name.startswith("B_") or label_name.startswith("I_"):
-                # Slice the string to remove the first 2 characters (e.g., "B_")
-                base_label = label_name[2:]
-            else:
-                # Otherwise, use the label name as is
-                base_label = label_name
-            # -----------------------------
-
-            if base_label and base_label != '-':
-                detected_topics.append({"topic": base_label, "score": float(prob)})
-
-    # Sort by score for cleaner output
-    return sorted(detected_topics, key=lambda x: x['score'], reverse=True)
-
-def predict_implicit_pii(text: str):
+    return topics_from_probabilities(probabilities, binarizer, threshold)
+
+def encode_sentences(sentences):
     """
-    Splits text into sentences, runs prediction on each, and returns aggregated results.
+    Token ids with special tokens, truncated to 512, for every sentence. A sentence
+    can be given as text or as the token ids of its text without special tokens
+    (a view from a shared document tokenization, see sentence_inputs); the texts
+    are tokenized together in one call.
     """
-    if not implicit_model:
-        return "Model not loaded. Cannot run prediction."
-
-    SENTENCE_SPLIT_REGEX = r'(?<!\b(Jl|No|Bpk|Ibu|Dr|Prof|H))\.\s+|(?<=[?!])\s+|\s*[\r\n]+\s*'
-    sentences = re.split(SENTENCE_SPLIT_REGEX, text)
-    sentences = [s.strip() for s in sentences if s and s.strip()]
+    encoded = list(sentences)
+    texts = [index for index, sentence in enumerate(encoded) if isinstance(sentence, str)]
+    if texts:
+        tokenized = implicit_tokenizer([encoded[index] for index in texts], truncation=True, max_length=512)["input_ids"]
+        for index, ids in zip(texts, tokenized):
+            encoded[index] = ids
+    if len(texts) < len(encoded):
+        prefix, suffix = special_tokens(implicit_tokenizer)
+        limit = 512 - len(prefix) - len(suffix)
+        for index, sentence in enumerate(encoded):
+            if isinstance(sentence, np.ndarray):
+                encoded[index] = np.concatenate((prefix, sentence[:limit], suffix))
+    return encoded
+
+def score_sentences(sentences, batch_size=BATCH_SIZE):
+    """
+    Scores sentences in bulk. All sentences are tokenized in one call (see
+    encode_sentences), sorted by token length and grouped into batches of
+    `batch_size`, so each padded batch wastes little compute on padding. Returns
+    a (sentences x labels) matrix of sigmoid probabilities in the original
+    sentence order.
+    """
+    batch_size = max(1, int(batch_size))
+    encoded = encode_sentences(sentences)
+    lengths = np.fromiter((len(ids) for ids in encoded), dtype=np.int64, count=len(encoded))
+    order = np.argsort(lengths, kind="stable")
+    pad_token_id = implicit_tokenizer.pad_token_id
+
+    probabilities = np.empty((len(encoded), implicit_model.config.num_labels), dtype=np.float32)
+    for batch_start in range(0, len(order), batch_size):
+        rows = order[batch_start:batch_start + batch_size]
+        longest = int(lengths[rows].max())
+
+        input_ids = np.full((len(rows), longest), pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(rows), longest), dtype=np.int64)
+        for row, sentence_index in enumerate(rows):
+            length = lengths[sentence_index]
+            input_ids[row, :length] = encoded[sentence_index]
+            attention_mask[row, :length] = 1
+
+        metrics.BATCH_SIZE.observe(len(rows), "implicit")
+        logits = forward_logits(input_ids, attention_mask)
+        probabilities[rows] = 1.0 / (1.0 + np.exp(-logits))
+
+    return probabilities
+
+def score_sentences_cached(sentences, batch_size=BATCH_SIZE, infer=None, stats=None, token_ids=None):
+    """
+    Returns the probability matrix for `sentences`, going through the shared
+    sentence memo: only sentences that were not seen before are scored, by
+    `infer` when given, otherwise by score_sentences. When `stats` is a dict,
+    it receives the sentence count, cache hits and hit rate of this call.
+    `token_ids` (from sentence_inputs) gives the tokens of every sentence, so
+    the sentences that are scored need no tokenization of their own.
+    """
+    if token_ids is not None:
+        inputs = {}
+        for sentence, ids in zip(sentences, token_ids):
+            inputs.setdefault(sentence, ids if ids is not None else sentence)
+        prepare = lambda missing: [inputs[sentence] for sentence in missing]
+    else:
+        prepare = lambda missing: missing
+    if infer is not None:
+        score_missing = lambda missing: np.asarray(infer(prepare(missing)))
+    else:
+        score_missing = lambda missing: score_sentences(prepare(missing), batch_size=batch_size)
+    return sentence_cache.score(sentences, score_missing, stats=stats)
+
+def sentence_inputs(spans, shared_tokens):
+    """
+    The token ids of every sentence, sliced from the document tokens of
+    `shared_tokens` (tokenization.SharedTokens) when they come from a tokenizer
+    identical to this model's. None when they cannot be reused.
+    """
+    if shared_tokens is None or shared_tokens.fingerprint() != fingerprint(implicit_tokenizer):
+        return None
+    return shared_tokens.get().sentence_ids(spans)
 
-    if not sentences:
-        return []
+def split_sentences(text: str):
+    """
+    Splits text into sentences and returns (sentence, start, end) tuples with
+    character offsets into `text`.
+    """
+    spans = default_segmenter.split(text)
 
-    results = []
-    current_pos = 0
-    for sentence_text in sentences:
-        start_char = text.find(sentence_text, current_pos)
-        end_char = start_char + len(sentence_text)
-        current_pos = end_char
+    metrics.DOCUMENT_CHARACTERS.observe(len(text), "implicit")
+    metrics.DOCUMENT_SENTENCES.observe(len(spans))
+    return spans
 
-        predicted_topics = predict_single_sentence(
-            sentence_text, implicit_model, implicit_tokenizer, mlb, threshold=CONFIDENCE_THRESHOLD
-        )
+def build_sentence_results(spans, sentence_probabilities):
+    """
+    Thresholds the probabilities of the given sentences and keeps the sentences
+    that have at least one detected topic.
+    """
+    topics_per_sentence = topics_from_probability_matrix(sentence_probabilities, mlb, threshold=CONFIDENCE_THRESHOLD)
 
+    results = []
+    for (sentence_text, start_char, end_char), predicted_topics in zip(spans, topics_per_sentence):
         if predicted_topics:
             results.append({
                 "sentence": sentence_text,
@@ -170,3 +384,125 @@ def predict_implicit_pii(text: str):
                 "end": end_char
             })
     return results
+
+def predict_implicit_pii(text: str, infer=None, stats=None, shared_tokens=None):
+    """
+    Splits text into sentences, runs prediction on each, and returns aggregated results.
+    All sentences are scored in bulk by `score_sentences`, or handed to `infer`
+    (e.g. a shared MicroBatcher) which must return one row of probabilities per sentence.
+    Sentences already in the sentence memo are not scored again; pass a dict as
+    `stats` to get the memo hit rate of this call. With `shared_tokens`, the
+    sentences take their tokens from the explicit model's tokenization of `text`.
+    """
+    if not loader.ensure_loaded():
+        return "Model not loaded. Cannot run prediction."
+
+    with phase("implicit", "split"):
+        spans = split_sentences(text)
+    if not spans:
+        return []
+
+    sentences = [sentence_text for sentence_text, _, _ in spans]
+    with phase("implicit", "tokenize"):
+        token_ids = sentence_inputs(spans, shared_tokens)
+    with phase("implicit", "inference"):
+        sentence_probabilities = score_sentences_cached(sentences, infer=infer, stats=stats, token_ids=token_ids)
+    with phase("implicit", "decode"):
+        return build_sentence_results(spans, sentence_probabilities)
+
+def predict_implicit_sentences(text: str, batch_size=BATCH_SIZE, infer=None, stats=None):
+    """
+    Splits and scores the whole text, returning (spans, probabilities) with one
+    probability row per sentence. This is the per-document state that
+    update_implicit_sentences edits incrementally; build_sentence_results turns
+    it into the usual results.
+    """
+    with phase("implicit", "split"):
+        spans = split_sentences(text)
+    sentences = [sentence_text for sentence_text, _, _ in spans]
+    if not sentences:
+        return spans, np.zeros((0, len(mlb.classes_)), dtype=np.float32)
+    with phase("implicit", "inference"):
+        return spans, score_sentences_cached(sentences, batch_size=batch_size, infer=infer, stats=stats)
+
+def update_implicit_sentences(sentence_state, old_text, new_text, change_start, change_end, batch_size=BATCH_SIZE, infer=None, stats=None):
+    """
+    Updates the (spans, probabilities) of `old_text` after the characters
+    old_text[change_start:change_end] were replaced, giving `new_text`.
+
+    Only the sentences touching the change, plus one sentence on each side (the
+    change can merge or split sentences), are split and scored again. The other
+    sentences keep their probabilities and are shifted by the change in length.
+    Returns (spans, probabilities, (region_start, region_end)) with the
+    re-detected region in `new_text` coordinates.
+    """
+    spans, probabilities = sentence_state
+    delta = len(new_text) - len(old_text)
+    count = len(spans)
+    sentence_starts = np.array([start for _, start, _ in spans], dtype=np.int64)
+    sentence_ends = np.array([end for _, _, end in spans], dtype=np.int64)
+
+    first_changed = int(np.searchsorted(sentence_ends, change_start, side="left"))
+    first_after = int(np.searchsorted(sentence_starts, change_end, side="right"))
+    low = max(0, first_changed - 1)
+    high = min(count, first_after + 1)
+
+    region_start = min(int(sentence_starts[low]) if low > 0 else 0, change_start)
+    region_end = max(int(sentence_ends[high - 1]) if high < count else len(old_text), change_end)
+
+    region_spans, region_probabilities = predict_implicit_sentences(
+        new_text[region_start:region_end + delta], batch_size=batch_size, infer=infer, stats=stats
+    )
+    region_spans = [(sentence_text, start + region_start, end + region_start) for sentence_text, start, end in region_spans]
+    shifted_spans = [(sentence_text, start + delta, end + delta) for sentence_text, start, end in spans[high:]]
+
+    new_spans = spans[:low] + region_spans + shifted_spans
+    new_probabilities = np.concatenate((probabilities[:low], region_probabilities, probabilities[high:]))
+    return new_spans, new_probabilities, (region_start, region_end + delta)
+
+def predict_implicit_pii_batch(texts, batch_size=BATCH_SIZE, infer=None, stats=None):
+    """
+    Runs predict_implicit_pii over several documents at once. The sentences of all
+    documents are scored together in shared batches. Returns one result list per
+    text, in input order.
+    """
+    if not loader.ensure_loaded():
+        return ["Model not loaded. Cannot run prediction." for _ in texts]
+
+    with phase("implicit", "split"):
+        documents = [split_sentences(text) for text in texts]
+    all_sentences = [sentence_text for spans in documents for sentence_text, _, _ in spans]
+    if not all_sentences:
+        return [[] for _ in texts]
+
+    with phase("implicit", "inference"):
+        all_probabilities = score_sentences_cached(all_sentences, batch_size=batch_size, infer=infer, stats=stats)
+
+    results = []
+    sentence_start = 0
+    with phase("implicit", "decode"):
+        for spans in documents:
+            sentence_end = sentence_start + len(spans)
+            results.append(build_sentence_results(spans, all_probabilities[sentence_start:sentence_end]))
+            sentence_start = sentence_end
+    return results
+
+def iter_implicit_pii(text: str, batch_size=BATCH_SIZE, infer=None, stats=None):
+    """
+    Streaming version of predict_implicit_pii. Scores the sentences `batch_size`
+    at a time, in document order, and yields the results of every batch as soon
+    as it is done. Offsets are absolute to `text`.
+    """
+    if not loader.ensure_loaded():
+        return
+
+    batch_size = max(1, int(batch_size))
+    spans = split_sentences(text)
+    for batch_start in range(0, len(spans), batch_size):
+        batch_spans = spans[batch_start:batch_start + batch_size]
+        sentences = [sentence_text for sentence_text, _, _ in batch_spans]
+        sentence_probabilities = score_sentences_cached(sentences, batch_size=batch_size, infer=infer, stats=stats)
+
+        results = build_sentence_results(batch_spans, sentence_probabilities)
+        if results:
+            yield results
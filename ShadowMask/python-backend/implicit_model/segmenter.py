@@ -0,0 +1,62 @@
+import os
+
+import regex
+
+# Abbreviations whose period does not end a sentence ("Jl. Merdeka", "Dr. Budi").
+# More can be added with ANONYMASK_SENTENCE_ABBREVIATIONS (comma separated) or per Segmenter.
+DEFAULT_ABBREVIATIONS = ("Jl", "No", "Bpk", "Ibu", "Dr", "Prof", "H")
+
+
+def configured_abbreviations():
+    extra = os.environ.get("ANONYMASK_SENTENCE_ABBREVIATIONS", "")
+    return DEFAULT_ABBREVIATIONS + tuple(word.strip() for word in extra.split(",") if word.strip())
+
+
+class Segmenter:
+    """
+    Splits text into sentences in one pass and returns their character offsets.
+
+    A sentence ends at a period followed by whitespace (unless the period closes
+    one of the `abbreviations`), at whitespace after "?" or "!", and at every
+    line break. Sentences are stripped of surrounding whitespace and empty ones
+    are dropped.
+
+    The separator pattern is compiled once. The abbreviation check is a lookbehind
+    placed after the period, so it only runs where there is a period. Offsets come
+    straight from the separator matches, so the text is never searched again for
+    a sentence.
+    """
+
+    def __init__(self, abbreviations=DEFAULT_ABBREVIATIONS):
+        self.abbreviations = tuple(dict.fromkeys(abbreviations))
+        alternatives = "|".join(regex.escape(word) for word in self.abbreviations)
+        period = rf"\.(?<!\b(?:{alternatives})\.)\s+" if alternatives else r"\.\s+"
+        # Whitespace before a line break stays in the sentence and is stripped with it
+        self._separator = regex.compile(rf"{period}|(?<=[?!])\s+|[\r\n]\s*")
+
+    def spans(self, text):
+        """Returns the (start, end) offsets of every sentence of `text`."""
+        spans = []
+        position = 0
+        for match in self._separator.finditer(text):
+            start = match.start()
+            if start > position:
+                self._add_piece(text, position, start, spans)
+            position = match.end()
+        self._add_piece(text, position, len(text), spans)
+        return spans
+
+    def split(self, text):
+        """Returns (sentence, start, end) for every sentence of `text`."""
+        return [(text[start:end], start, end) for start, end in self.spans(text)]
+
+    @staticmethod
+    def _add_piece(text, start, end, spans):
+        piece = text[start:end]
+        stripped = piece.strip()
+        if stripped:
+            start += len(piece) - len(piece.lstrip())
+            spans.append((start, start + len(stripped)))
+
+
+default_segmenter = Segmenter(configured_abbreviations())
@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_sentence(sentence):
+    """Cache key of a sentence: its text with runs of whitespace collapsed to one space."""
+    return " ".join(sentence.split())
+
+
+class SentenceScoreCache:
+    """
+    Bounded LRU cache of implicit-model probability rows, keyed by normalized
+    sentence text. Templated documents (letters, forms, spreadsheet rows) repeat
+    the same sentences over and over; only sentences that were never seen
+    before need to go through the model.
+    """
+
+    def __init__(self, max_entries=50000):
+        self.max_entries = max(0, int(max_entries))
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def score(self, sentences, score_missing, stats=None):
+        """
+        Returns the (sentences x labels) probability matrix for `sentences`.
+        `score_missing` is called once with the unseen sentences (each distinct
+        sentence only once) and must return one probability row per sentence.
+        When `stats` is a dict, it receives the hit counts for this call.
+        """
+        keys = [normalize_sentence(sentence) for sentence in sentences]
+
+        rows = {}
+        with self._lock:
+            for key in keys:
+                if key not in rows and key in self._rows:
+                    self._rows.move_to_end(key)
+                    rows[key] = self._rows[key]
+        cached_keys = set(rows)
+
+        # Every distinct unseen sentence is scored once, with the text of its first occurrence
+        missing = {}
+        for key, sentence in zip(keys, sentences):
+            if key not in rows and key not in missing:
+                missing[key] = sentence
+        if missing:
+            scored = np.asarray(score_missing(list(missing.values())), dtype=np.float32)
+            rows.update(zip(missing.keys(), scored))
+            self._store(zip(missing.keys(), scored))
+
+        if stats is not None:
+            hits = sum(1 for key in keys if key in cached_keys)
+            stats["sentences"] = stats.get("sentences", 0) + len(keys)
+            stats["cache_hits"] = stats.get("cache_hits", 0) + hits
+            stats["scored"] = stats.get("scored", 0) + len(missing)
+            stats["hit_rate"] = stats["cache_hits"] / stats["sentences"] if stats["sentences"] else 0.0
+
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([rows[key] for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rows)
+
+    def _store(self, items):
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            for key, row in items:
+                self._rows[key] = row
+                self._rows.move_to_end(key)
+            while len(self._rows) > self.max_entries:
+                self._rows.popitem(last=False)
@@ -0,0 +1,109 @@
+"""
+Inference executor: thread budgets for the forward passes and bounded,
+awaitable execution of the (blocking) prediction functions.
+
+    ANONYMASK_INFERENCE_WORKERS      forward-pass workers per model (default 1)
+    ANONYMASK_TORCH_THREADS          intra-op threads per worker (default: CPU cores / all workers)
+    ANONYMASK_TORCH_INTEROP_THREADS  inter-op threads (default 1)
+    ANONYMASK_MAX_CONCURRENT_REQUESTS  predictions in flight per model (default 8)
+
+Without a budget every forward pass uses all cores, so two models (or two
+workers) running at the same time oversubscribe the CPU and slow each other down.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+INFERENCE_WORKERS = max(1, int(os.environ.get("ANONYMASK_INFERENCE_WORKERS", "1")))
+MAX_CONCURRENT_REQUESTS = max(1, int(os.environ.get("ANONYMASK_MAX_CONCURRENT_REQUESTS", "8")))
+
+
+def torch_thread_budget(total_workers):
+    """Intra-op threads for each of `total_workers` forward-pass workers."""
+    configured = int(os.environ.get("ANONYMASK_TORCH_THREADS", "0"))
+    if configured > 0:
+        return configured
+    return max(1, (os.cpu_count() or 1) // max(1, total_workers))
+
+
+def configure_torch_threads(intra_op_threads):
+    """
+    Applies the thread budget to the process. The inter-op pool can only be sized
+    before torch first uses it, so a second call keeps the existing inter-op setting.
+    """
+    torch.set_num_threads(intra_op_threads)
+    try:
+        torch.set_num_interop_threads(int(os.environ.get("ANONYMASK_TORCH_INTEROP_THREADS", "1")))
+    except RuntimeError:
+        pass
+    print(f"Torch threads: {intra_op_threads} intra-op, {torch.get_num_interop_threads()} inter-op")
+    logging.info(f"Torch threads: {intra_op_threads} intra-op, {torch.get_num_interop_threads()} inter-op")
+
+
+def worker_initializer(intra_op_threads):
+    """Returns a function that applies the intra-op budget inside a worker thread."""
+    def initialize():
+        torch.set_num_threads(intra_op_threads)
+    return initialize
+
+
+class InferenceExecutor:
+    """
+    Runs blocking prediction calls for one model on a dedicated thread pool, so
+    async handlers can await them without blocking the event loop. At most
+    `max_concurrency` calls run at once; the others wait in line without holding
+    a thread.
+    """
+
+    def __init__(self, name, max_concurrency=MAX_CONCURRENT_REQUESTS):
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix=f"{name}-request")
+
+        self._stats_lock = threading.Lock()
+        self._submitted = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+
+    async def run(self, function, *args, **kwargs):
+        """Calls `function(*args, **kwargs)` on the pool and awaits its result."""
+        with self._stats_lock:
+            self._submitted += 1
+        # Run in a copy of the caller's context, so request-scoped state (phase timings) follows the call
+        context = contextvars.copy_context()
+        future = self._pool.submit(context.run, self._call, function, args, kwargs)
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "waiting": self._submitted - self._completed - self._failed - self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _call(self, function, args, kwargs):
+        with self._stats_lock:
+            self._running += 1
+        try:
+            result = function(*args, **kwargs)
+        except BaseException:
+            with self._stats_lock:
+                self._running -= 1
+                self._failed += 1
+            raise
+        with self._stats_lock:
+            self._running -= 1
+            self._completed += 1
+        return result
@@ -0,0 +1,422 @@
+"""
+Server-side text extraction for uploaded documents (PDF, DOCX, XLSX, CSV, TXT).
+
+extract_pages() yields a document one page at a time, as soon as that page is
+parsed, so detection of a page can run while the next one is extracted:
+
+    pdf    one page per PDF page (read with pypdf)
+    docx   pages split at the page breaks Word stored in the file, or every
+           PAGE_CHARACTERS characters (at a paragraph end) when there are none
+    xlsx   one page per sheet
+    csv    one page per CSV_ROWS_PER_PAGE rows
+    txt    pages of about PAGE_CHARACTERS characters, split at line ends
+
+Spreadsheet pages use the text layout of the masking page ("Sheet: <name>",
+then one "<header>: <cell> | <cell>." line per column) and list the offsets of
+every cell, so detection can run cell by cell (see tabular.py).
+
+DOCX and XLSX are read with the standard library (zipfile + iterparse), one
+paragraph / row at a time.
+"""
+import csv
+import io
+import os
+import queue
+import tempfile
+import threading
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+from pypdf import PdfReader
+from pypdf.errors import PdfReadError
+
+PAGE_CHARACTERS = int(os.environ.get("ANONYMASK_INGEST_PAGE_CHARACTERS", "4000"))
+CSV_ROWS_PER_PAGE = int(os.environ.get("ANONYMASK_INGEST_CSV_ROWS", "500"))
+MAX_UPLOAD_BYTES = int(os.environ.get("ANONYMASK_INGEST_MAX_BYTES", str(200 * 1024 * 1024)))
+# Uploads up to this size stay in memory, bigger ones are spooled to a temporary file
+SPOOL_BYTES = int(os.environ.get("ANONYMASK_INGEST_SPOOL_BYTES", str(8 * 1024 * 1024)))
+# Pages that are extracted ahead of detection
+READ_AHEAD_PAGES = int(os.environ.get("ANONYMASK_INGEST_READ_AHEAD", "4"))
+# The document text is the page texts joined with this separator; page offsets count it
+PAGE_SEPARATOR = "\n"
+
+EXTENSIONS = {".pdf": "pdf", ".docx": "docx", ".xlsx": "xlsx", ".xlsm": "xlsx", ".csv": "csv", ".txt": "txt"}
+MEDIA_TYPES = {
+    "application/pdf": "pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+    "text/csv": "csv",
+    "text/plain": "txt",
+}
+# The part a DOCX / XLSX archive cannot be read without
+ZIP_PARTS = {"docx": "word/document.xml", "xlsx": "xl/workbook.xml"}
+
+
+class UnsupportedDocument(ValueError):
+    """The upload is not a document type that can be extracted here."""
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class Page:
+    """
+    One unit of a document: its `name` ("Page 3", "Sheet: Customers"), its text,
+    and for spreadsheet pages the (start, end) offsets of every cell in the text.
+    """
+
+    def __init__(self, name, text, cells=None):
+        self.name = name
+        self.text = text
+        self.cells = cells
+
+
+def document_kind(filename, content_type):
+    """The document type from the file name's extension, else from the media type. None when unsupported."""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in EXTENSIONS:
+        return EXTENSIONS[extension]
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return MEDIA_TYPES.get(media_type)
+
+
+async def receive_upload(chunks, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Writes the chunks of a streamed request body to a spooled temporary file and
+    returns it, rewound. Raises UploadTooLarge past `max_bytes`.
+    """
+    upload = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"The upload is larger than {max_bytes} bytes")
+            upload.write(chunk)
+    except BaseException:
+        upload.close()
+        raise
+    upload.seek(0)
+    return upload
+
+
+def extract_pages(upload, kind):
+    """
+    Returns an iterator over the Pages of the document in the seekable binary file
+    `upload`. Raises UnsupportedDocument right away when it cannot be read at all.
+    """
+    if kind in ZIP_PARTS:
+        try:
+            with zipfile.ZipFile(upload) as archive:
+                valid = ZIP_PARTS[kind] in archive.namelist()
+        except zipfile.BadZipFile:
+            valid = False
+        if not valid:
+            raise UnsupportedDocument(f"The upload is not a valid {kind.upper()} file")
+    upload.seek(0)
+    extractors = {"pdf": _pdf_pages, "docx": _docx_pages, "xlsx": _xlsx_pages, "csv": _csv_pages, "txt": _text_pages}
+    if kind not in extractors:
+        raise UnsupportedDocument(f"Unsupported document type: {kind}")
+    return extractors[kind](upload)
+
+
+class ReadAhead:
+    """
+    Runs a page iterator in a background thread, at most `depth` pages ahead of
+    the consumer. next() blocks until the next page is ready and returns None at
+    the end; an extraction error is raised from next().
+    """
+
+    _END = object()
+
+    def __init__(self, pages, depth=READ_AHEAD_PAGES):
+        self._pages = pages
+        self._queue = queue.Queue(maxsize=max(1, depth))
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ingest-extract", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for page in self._pages:
+                if not self._put(page):
+                    return
+            self._put(self._END)
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def next(self):
+        item = self._queue.get()
+        if item is self._END:
+            return None
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def close(self):
+        """Stops the extraction thread (e.g. when the client went away)."""
+        self._stopped.set()
+
+
+# --- Plain text and PDF ---
+
+def _text_pages(upload):
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig", errors="replace", newline="")
+    lines = []
+    size = 0
+    number = 1
+    for line in text:
+        lines.append(line)
+        size += len(line)
+        if size >= PAGE_CHARACTERS:
+            yield Page(f"Page {number}", "".join(lines))
+            lines, size, number = [], 0, number + 1
+    if lines or number == 1:
+        yield Page(f"Page {number}", "".join(lines))
+    text.detach()
+
+
+def _pdf_pages(upload):
+    try:
+        reader = PdfReader(upload)
+    except PdfReadError as e:
+        raise UnsupportedDocument(f"The upload is not a valid PDF file: {e}")
+
+    def pages():
+        for number, page in enumerate(reader.pages, 1):
+            yield Page(f"Page {number}", page.extract_text() or "")
+    return pages()
+
+
+# --- DOCX ---
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _docx_pages(upload):
+    """
+    Paragraphs of word/document.xml, one line each. A page ends at a page break
+    stored in the file (an explicit break or the last rendered one), or at the
+    paragraph end that passes PAGE_CHARACTERS when the file has no page breaks.
+    """
+    with zipfile.ZipFile(upload) as archive, archive.open("word/document.xml") as document:
+        lines = []
+        number = 1
+        has_breaks = False
+        depth = 0
+        for event, element in iterparse(document, events=("start", "end")):
+            if _local(element.tag) != "p":
+                continue
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth:
+                continue  # A paragraph inside a text box: read with the paragraph around it
+
+            line = []
+            for child in element.iter():
+                name = _local(child.tag)
+                if name == "t" and child.text:
+                    line.append(child.text)
+                elif name == "tab":
+                    line.append("\t")
+                elif name in ("br", "cr") and child.get(_attribute(child, "type")) != "page":
+                    line.append("\n")
+                elif name == "lastRenderedPageBreak" or (name == "br" and child.get(_attribute(child, "type")) == "page"):
+                    has_breaks = True
+                    if lines or line:
+                        # The text before the break ends the current page
+                        if line:
+                            lines.append("".join(line))
+                            line = []
+                        yield Page(f"Page {number}", "\n".join(lines))
+                        lines, number = [], number + 1
+            element.clear()
+            lines.append("".join(line))
+
+            if not has_breaks and sum(len(l) + 1 for l in lines) >= PAGE_CHARACTERS:
+                yield Page(f"Page {number}", "\n".join(lines))
+                lines, number = [], number + 1
+        if lines or number == 1:
+            yield Page(f"Page {number}", "\n".join(lines))
+
+
+def _attribute(element, name):
+    """The qualified name of attribute `name` in the namespace of `element` (w:type and the like)."""
+    tag = element.tag
+    return tag[:tag.index("}") + 1] + name if tag.startswith("{") else name
+
+
+# --- Spreadsheets ---
+
+def sheet_page(name, headers, columns):
+    """
+    A spreadsheet page in the masking page's layout: "Sheet: <name>", then one
+    "<header>: <cell> | <cell>." line per column, with the offset of every cell.
+    """
+    parts = [f"Sheet: {name}\n"]
+    size = len(parts[0])
+    cells = []
+    for header, values in zip(headers, columns):
+        prefix = f"{header}: "
+        parts.append(prefix)
+        size += len(prefix)
+        for index, value in enumerate(values):
+            if index:
+                parts.append(" | ")
+                size += 3
+            cells.append((size, size + len(value)))
+            parts.append(value)
+            size += len(value)
+        parts.append(".\n")
+        size += 2
+    return Page(f"Sheet: {name}", "".join(parts), cells)
+
+
+def _table_columns(rows):
+    """Headers (the first row) and, per header, the non-empty values below it."""
+    if not rows:
+        return [], []
+    headers = rows[0]
+    columns = [[row[index] for row in rows[1:] if index < len(row) and row[index] != ""] for index in range(len(headers))]
+    return headers, columns
+
+
+def _csv_pages(upload):
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        sample = text.read(64 * 1024)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(text, dialect)
+        headers = next(reader, None)
+        if headers is None:
+            yield sheet_page("Rows", [], [])
+            return
+        rows = []
+        first_row = 2
+        for row in reader:
+            if not any(row):
+                continue
+            rows.append(row)
+            if len(rows) == CSV_ROWS_PER_PAGE:
+                _, columns = _table_columns([headers] + rows)
+                yield sheet_page(f"Rows {first_row}-{first_row + len(rows) - 1}", headers, columns)
+                first_row += len(rows)
+                rows = []
+        if rows or first_row == 2:
+            _, columns = _table_columns([headers] + rows)
+            yield sheet_page(f"Rows {first_row}-{first_row + len(rows) - 1}", headers, columns)
+    finally:
+        text.detach()
+
+
+def _xlsx_pages(upload):
+    with zipfile.ZipFile(upload) as archive:
+        names = set(archive.namelist())
+        shared = _shared_strings(archive) if "xl/sharedStrings.xml" in names else []
+        for sheet_name, path in _sheet_paths(archive):
+            if path not in names:
+                continue
+            with archive.open(path) as sheet:
+                headers, columns = _table_columns(_sheet_rows(sheet, shared))
+            yield sheet_page(sheet_name, headers, columns)
+
+
+def _sheet_paths(archive):
+    """(name, path in the archive) of every sheet, in workbook order."""
+    targets = {}
+    with archive.open("xl/_rels/workbook.xml.rels") as rels:
+        for _, element in iterparse(rels):
+            if _local(element.tag) == "Relationship":
+                target = element.get("Target", "")
+                targets[element.get("Id")] = target.lstrip("/") if target.startswith("/") else "xl/" + target
+    sheets = []
+    with archive.open("xl/workbook.xml") as workbook:
+        for _, element in iterparse(workbook):
+            if _local(element.tag) == "sheet":
+                relation = next((value for key, value in element.attrib.items() if _local(key) == "id"), None)
+                sheets.append((element.get("name", ""), targets.get(relation, "")))
+    return sheets
+
+
+def _shared_strings(archive):
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as source:
+        for _, element in iterparse(source):
+            if _local(element.tag) != "si":
+                continue
+            # Plain text, or rich text runs that are concatenated; phonetic hints (rPh) are left out
+            parts = []
+            for child in element:
+                name = _local(child.tag)
+                if name == "t":
+                    parts.append(child.text or "")
+                elif name == "r":
+                    parts.extend(t.text or "" for t in child if _local(t.tag) == "t")
+            strings.append("".join(parts))
+            element.clear()
+    return strings
+
+
+def _column_index(reference):
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def _cell_value(cell, shared):
+    kind = cell.get("t", "n")
+    if kind == "inlineStr":
+        return "".join(t.text or "" for t in cell.iter() if _local(t.tag) == "t")
+    value = next((child.text for child in cell if _local(child.tag) == "v"), None)
+    if value is None:
+        return ""
+    if kind == "s":
+        return shared[int(value)]
+    if kind == "b":
+        return "TRUE" if value == "1" else "FALSE"
+    if kind == "n":
+        number = float(value)
+        return str(int(number)) if number.is_integer() and abs(number) < 1e15 else repr(number)
+    return value
+
+
+def _sheet_rows(sheet, shared):
+    """The rows of a worksheet as lists of cell texts ("" for empty cells); empty rows are skipped."""
+    rows = []
+    for _, element in iterparse(sheet):
+        if _local(element.tag) != "row":
+            continue
+        row = []
+        position = 0
+        for cell in element:
+            if _local(cell.tag) != "c":
+                continue
+            reference = cell.get("r")
+            index = _column_index(reference) if reference else position
+            row.extend([""] * (index - len(row)))
+            row.append(_cell_value(cell, shared))
+            position = index + 1
+        element.clear()
+        if any(row):
+            rows.append(row)
+    return rows
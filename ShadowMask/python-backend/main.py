@@ -1,16 +1,58 @@
 import logging
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import List, Literal, Optional
 import uvicorn
-from explicit_model.model import predict_explicit_pii
-from implicit_model.model import predict_implicit_pii
+from explicit_model.model import (
+    loader as explicit_loader, model_identity as explicit_model_identity, predict_explicit_pii, predict_explicit_pii_batch, iter_explicit_pii, run_window_batches,
+    predict_explicit_tokens, update_explicit_tokens, group_entities, label_table as explicit_label_table, shared_tokens, shared_state as explicit_shared_state, BATCH_SIZE as EXPLICIT_BATCH_SIZE
+)
+from implicit_model.model import (
+    loader as implicit_loader, model_identity as implicit_model_identity, predict_implicit_pii, predict_implicit_pii_batch, iter_implicit_pii, score_sentences,
+    predict_implicit_sentences, update_implicit_sentences, build_sentence_results, topic_table as implicit_topic_table, shared_state as implicit_shared_state, sentence_cache as implicit_sentence_cache, BATCH_SIZE as IMPLICIT_BATCH_SIZE
+)
+from batching import MicroBatcher
+from inference_executor import (
+    InferenceExecutor, INFERENCE_WORKERS, torch_thread_budget, configure_torch_threads, worker_initializer
+)
+from prediction_cache import PredictionCache, cache_key
+from worker_pool import WorkerPool, PROCESS_WORKERS
+import compact_format
+import metrics
+import request_log
+from document_store import DocumentStore, apply_edits
+from masker import mask_spans, unmask_text
+import tabular
+import ingestion
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
+from contextlib import asynccontextmanager
+import asyncio
+from collections import deque
+import json
+import multiprocessing
 import os
 import sys
+import threading
+import time
 from pathlib import Path
 
-app = FastAPI()
+model_loaders = {"explicit": explicit_loader, "implicit": implicit_loader}
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load both models in the background so the server answers right away (see /health).
+    # With ANONYMASK_PRELOAD=0 each model is only loaded by the first request that needs it.
+    if os.environ.get("ANONYMASK_PRELOAD", "1") != "0":
+        for model_loader in model_loaders.values():
+            model_loader.start()
+        if worker_pool is not None:
+            threading.Thread(target=ensure_worker_pool, name="worker-pool-start", daemon=True).start()
+    yield
+    if worker_pool is not None and worker_pool.started:
+        worker_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:4200", "http://tauri.localhost"  # The address of your Angular app
@@ -33,50 +75,659 @@ logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s | %(levelname)s | %(message)s"
 )
+# The log file is written by a background thread from here on
+request_log.start_async_logging()
+
+
+# Micro-batching: windows / sentences from concurrent requests share forward passes
+BATCH_WAIT_MS = float(os.environ.get("ANONYMASK_BATCH_WAIT_MS", "5"))
+
+# Forward passes run on INFERENCE_WORKERS batcher threads per model, and the cores are
+# split between all of them so concurrent forward passes do not oversubscribe the CPU
+TORCH_THREADS = torch_thread_budget(2 * INFERENCE_WORKERS)
+configure_torch_threads(TORCH_THREADS)
+
+explicit_batcher = MicroBatcher(
+    "explicit",
+    lambda windows: run_window_batches(windows, batch_size=len(windows)),
+    max_batch_size=EXPLICIT_BATCH_SIZE,
+    max_wait_ms=BATCH_WAIT_MS,
+    workers=INFERENCE_WORKERS,
+    worker_init=worker_initializer(TORCH_THREADS),
+)
+implicit_batcher = MicroBatcher(
+    "implicit",
+    lambda sentences: score_sentences(sentences, batch_size=len(sentences)),
+    max_batch_size=IMPLICIT_BATCH_SIZE,
+    max_wait_ms=BATCH_WAIT_MS,
+    workers=INFERENCE_WORKERS,
+    worker_init=worker_initializer(TORCH_THREADS),
+)
+
+# Bounded thread pools that the async handlers await, one per model
+explicit_executor = InferenceExecutor("explicit")
+implicit_executor = InferenceExecutor("implicit")
+
+# Cache of finished predictions, keyed by the text and the model that produced them.
+# ANONYMASK_CACHE_DIR (an absolute path) adds a disk tier that survives restarts.
+prediction_cache = PredictionCache(
+    max_entries=int(os.environ.get("ANONYMASK_CACHE_ENTRIES", "256")),
+    max_bytes=int(float(os.environ.get("ANONYMASK_CACHE_MB", "64")) * 1024 * 1024),
+    disk_dir=os.environ.get("ANONYMASK_CACHE_DIR") or None,
+)
+
+# Optional model-serving processes (ANONYMASK_PROCESS_WORKERS > 1), sharing the weights loaded here
+worker_pool = WorkerPool(PROCESS_WORKERS) if PROCESS_WORKERS > 1 else None
+
+def ensure_worker_pool():
+    """Starts the worker processes once both models are loaded. Returns False when they cannot be used."""
+    if worker_pool is None or worker_pool.error:
+        return False
+    if not worker_pool.started:
+        if not all(model_loader.ensure_loaded() for model_loader in model_loaders.values()):
+            return False
+        try:
+            worker_pool.start({"explicit": explicit_shared_state(), "implicit": implicit_shared_state()})
+        except Exception as e:
+            print(f"Could not start the model worker processes, predicting in-process: {e}")
+            logging.exception("Could not start the model worker processes, predicting in-process")
+            return False
+    return True
+
+def cached_explicit(text, tokens=None):
+    """`tokens` (from shared_tokens) lets /predict tokenize the text once for both detectors."""
+    explicit_loader.ensure_loaded()
+    if ensure_worker_pool():
+        compute = lambda: worker_pool.run("explicit", text)
+    else:
+        compute = lambda: predict_explicit_pii(text, infer=explicit_batcher.run, shared_tokens=tokens)
+    return prediction_cache.get_or_compute(explicit_model_identity(), text, compute)
+
+def cached_implicit(text, stats=None, tokens=None):
+    """
+    `stats` only receives the sentence memo counts when the document itself was not
+    cached and was predicted in this process.
+    """
+    implicit_loader.ensure_loaded()
+    if ensure_worker_pool():
+        compute = lambda: worker_pool.run("implicit", text)
+    else:
+        compute = lambda: predict_implicit_pii(text, infer=implicit_batcher.run, stats=stats, shared_tokens=tokens)
+    return prediction_cache.get_or_compute(implicit_model_identity(), text, compute)
+
+# Detection state of recently edited documents, for /predictIncremental
+document_store = DocumentStore(int(os.environ.get("ANONYMASK_DOCUMENT_STORE_ENTRIES", "64")))
+
+# Label tables of the compact response format, rebuilt when a model changes
+_label_tables = None
+
+def label_tables():
+    global _label_tables
+    identity = (explicit_model_identity(), implicit_model_identity())
+    if _label_tables is None or _label_tables[0] != identity:
+        _label_tables = (identity, compact_format.LabelTables(explicit_label_table(), implicit_topic_table()))
+    return _label_tables[1]
+
+def timed(function, *args, **kwargs):
+    """Calls `function` and returns (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
 
 
 # Request model for prediction
 class PredictionRequest(BaseModel):
     text: str
 
+# Request models for multi-document prediction
+class BatchDocument(BaseModel):
+    id: str
+    text: str
+    models: Literal["explicit", "implicit", "both"] = "both"
+
+class BatchPredictionRequest(BaseModel):
+    documents: List[BatchDocument]
+
+# Request models for incremental re-detection
+class TextEdit(BaseModel):
+    start: int  # Offsets into the document as the backend last saw it
+    end: int
+    text: str
+
+class IncrementalPredictionRequest(BaseModel):
+    document_id: Optional[str] = None
+    text: Optional[str] = None  # Full text: (re)starts the document from scratch
+    edits: List[TextEdit] = []
+    models: Literal["explicit", "implicit", "both"] = "both"
+
+# Request models for server-side masking
+class MaskSpan(BaseModel):
+    start: int
+    end: int
+    label: str
+
+class MaskRequest(BaseModel):
+    text: str
+    model: Literal["explicit", "implicit"] = "explicit"
+    spans: Optional[List[MaskSpan]] = None  # Mask these spans instead of running the model
+
+class MappingEntry(BaseModel):
+    original: str
+    masked: str
+
+class UnmaskRequest(BaseModel):
+    text: str
+    mapping: List[MappingEntry]
+
+# Request models for spreadsheet input
+class TableColumn(BaseModel):
+    name: str = ""
+    cells: List[Optional[str]]
+    hint: Optional[str] = None  # The class of every cell ("Phone_Number"), or "none" for a column without PII
+
+class TablePredictionRequest(BaseModel):
+    columns: List[TableColumn]
+    models: Literal["explicit", "implicit", "both"] = "both"
+    mask: Optional[Literal["explicit", "implicit"]] = None  # Also mask the cells with this model's results
+
+def wants_profile(request):
+    """?profile=1 or an X-AnonyMask-Profile: 1 header asks for a trace of the request's phases."""
+    flag = request.query_params.get("profile") or request.headers.get("x-anonymask-profile") or ""
+    return flag.lower() in ("1", "true", "yes")
+
+async def with_trace(response, timings, path):
+    """Adds the phase trace of the request to a JSON response under "trace"."""
+    if response.status_code != 200 or not response.headers.get("content-type", "").startswith("application/json"):
+        return response
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    content = json.loads(body)
+    if isinstance(content, dict):
+        content["trace"] = timings.trace(path)
+    # Keep the headers of the handler and the earlier middleware (CORS, ...); the length changes
+    headers = {key: value for key, value in response.headers.items() if key.lower() != "content-length"}
+    return JSONResponse(content, status_code=response.status_code, headers=headers)
+
 @app.middleware("http")
 async def log_requests(request, call_next):
-    logging.info(f"Incoming request: {request.method} | {request.headers} | {request.url} | {call_next}")
-    print(f"Incoming request: {request.method} | {request.headers} | {request.url} | {call_next}")
-    origin = request.headers.get("origin")
-    logging.info(f"Origin: {origin}")
-    print(f"Origin: {origin}")
-    response = await call_next(request)
-    return response
+    # One structured, sampled record per request with the phase timings (see request_log.py)
+    profile = wants_profile(request)
+    timings, token = request_log.begin_request(trace=profile)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if profile:
+            response = await with_trace(response, timings, request.url.path)
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        request_log.end_request(token)
+        request_log.log_request(
+            request.method, request.url.path, status, elapsed,
+            timings, request.headers.get("content-length"),
+        )
+        # The route template keeps the label set small (unknown paths share one series)
+        route = request.scope.get("route")
+        metrics.REQUEST_SECONDS.observe(elapsed, getattr(route, "path", "unmatched"), str(status))
 
+# The prediction endpoints answer in the compact format (see compact_format.py)
+# when the Accept header asks for it
 @app.post("/predictExplicit")
-def predict(request: PredictionRequest):
-    startDate = datetime.now()
-    logging.info("Received request for /predictExplicit")
-
-    results = predict_explicit_pii(request.text)
-
-    endDate = datetime.now()
-    elapsed = (endDate - startDate).total_seconds()
-    print(f"Start Date: {startDate}")
-    print(f"End Date: {endDate}")
-    print(f"Duration: {elapsed:.2f} seconds")
-    logging.info(f"/predictExplicit completed in {elapsed:.2f} seconds")
+async def predict(request: PredictionRequest, accept: Optional[str] = Header(None)):
+    results = await explicit_executor.run(cached_explicit, request.text)
+    encoding = compact_format.negotiate(accept)
+    if encoding:
+        tables = label_tables()
+        return compact_format.compact_response(
+            {"table": tables.version, "explicit": tables.compact_explicit(results)}, encoding
+        )
     return {"predictions": results}
 
 @app.post("/predictImplicit")
-def predict(request: PredictionRequest):
-    startDate = datetime.now()
-    logging.info("Received request for /predictImplicit")
-
-    results = predict_implicit_pii(request.text)
-    endDate = datetime.now()
-    elapsed = (endDate - startDate).total_seconds()
-    print(f"Start Date: {startDate}")
-    print(f"End Date: {endDate}")
-    print(f"Duration: {elapsed:.2f} seconds")
-    logging.info(f"/predictImplicit completed in {elapsed:.2f} seconds")
-    return {"predictions": results}
+async def predict(request: PredictionRequest, accept: Optional[str] = Header(None)):
+    sentence_stats = {}
+    results = await implicit_executor.run(cached_implicit, request.text, stats=sentence_stats)
+    encoding = compact_format.negotiate(accept)
+    if encoding:
+        tables = label_tables()
+        return compact_format.compact_response(
+            {"table": tables.version, "implicit": tables.compact_implicit(results)}, encoding
+        )
+    # None when the whole document came from the prediction cache
+    return {"predictions": results, "sentence_cache": sentence_stats or None}
+
+@app.get("/labelTable")
+def label_table():
+    """The label tables the ids of compact responses refer to."""
+    return label_tables().as_dict()
+
+@app.post("/predict")
+async def predict_all(request: PredictionRequest, accept: Optional[str] = Header(None)):
+    start = time.perf_counter()
+
+    # Both detectors work on the same decoded text at the same time, so the
+    # latency is the slower detector's time rather than the sum of both.
+    # The text is tokenized once, by whichever detector needs the tokens first.
+    tokens = shared_tokens(request.text)
+    (explicit_results, explicit_seconds), (implicit_results, implicit_seconds) = await asyncio.gather(
+        explicit_executor.run(timed, cached_explicit, request.text, tokens=tokens),
+        implicit_executor.run(timed, cached_implicit, request.text, tokens=tokens),
+    )
+
+    elapsed = time.perf_counter() - start
+    encoding = compact_format.negotiate(accept)
+    if encoding:
+        tables = label_tables()
+        return compact_format.compact_response({
+            "table": tables.version,
+            "explicit": tables.compact_explicit(explicit_results),
+            "implicit": tables.compact_implicit(implicit_results),
+        }, encoding)
+    return {
+        "explicit": explicit_results,
+        "implicit": implicit_results,
+        "timings": {
+            "explicit_seconds": explicit_seconds,
+            "implicit_seconds": implicit_seconds,
+            "total_seconds": elapsed,
+        },
+    }
+
+def ndjson_lines(batches):
+    """Writes every prediction of every finished batch as one JSON line."""
+    for predictions in batches:
+        for prediction in predictions:
+            yield json.dumps(prediction) + "\n"
+
+async def stream_predictions(name, text):
+    """
+    One model's predictions for /predict*Stream, through the same path as the other
+    endpoints. With model worker processes the document is predicted there as a
+    whole (cached_explicit / cached_implicit). Otherwise a cached document is written
+    at once, and a new one runs batch by batch on the model's executor and
+    MicroBatcher, every batch written as it finishes, and is cached at the end.
+    """
+    executor = {"explicit": explicit_executor, "implicit": implicit_executor}[name]
+    if not await executor.run(model_loaders[name].ensure_loaded):
+        return
+    if await executor.run(ensure_worker_pool):
+        cached = {"explicit": cached_explicit, "implicit": cached_implicit}[name]
+        for line in ndjson_lines([await executor.run(cached, text)]):
+            yield line
+        return
+
+    identity = {"explicit": explicit_model_identity, "implicit": implicit_model_identity}[name]()
+    key = cache_key(identity, text) if identity is not None else None
+    results = await executor.run(prediction_cache.get, key) if key is not None else None
+    if results is not None:
+        for line in ndjson_lines([results]):
+            yield line
+        return
+
+    if name == "explicit":
+        batches = iter_explicit_pii(text, infer=explicit_batcher.run)
+    else:
+        batches = iter_implicit_pii(text, infer=implicit_batcher.run)
+    results = []
+    while True:
+        predictions = await executor.run(next, batches, None)
+        if predictions is None:
+            break
+        results.extend(predictions)
+        for line in ndjson_lines([predictions]):
+            yield line
+    if key is not None:
+        prediction_cache.put(key, results)
+
+@app.post("/predictExplicitStream")
+async def predict_explicit_stream(request: PredictionRequest):
+    return StreamingResponse(stream_predictions("explicit", request.text), media_type="application/x-ndjson")
+
+@app.post("/predictImplicitStream")
+async def predict_implicit_stream(request: PredictionRequest):
+    return StreamingResponse(stream_predictions("implicit", request.text), media_type="application/x-ndjson")
+
+def cached_many(name, texts):
+    """Predicts one model on many texts; the texts that are not cached go through the model in shared batches."""
+    if name == "explicit":
+        return prediction_cache.get_or_compute_many(
+            explicit_model_identity(), texts, lambda missing: predict_explicit_pii_batch(missing, infer=explicit_batcher.run)
+        )
+    return prediction_cache.get_or_compute_many(
+        implicit_model_identity(), texts, lambda missing: predict_implicit_pii_batch(missing, infer=implicit_batcher.run)
+    )
+
+@app.post("/predictBatch")
+def predict_batch(request: BatchPredictionRequest):
+    seen_ids = set()
+    for document in request.documents:
+        if document.id in seen_ids:
+            raise HTTPException(status_code=400, detail=f"Duplicate document id: {document.id}")
+        seen_ids.add(document.id)
+
+    explicit_documents = [d for d in request.documents if d.models in ("explicit", "both")]
+    implicit_documents = [d for d in request.documents if d.models in ("implicit", "both")]
+
+    # All windows / sentences of the documents that are not cached yet go through the model in shared batches
+    if explicit_documents:
+        explicit_loader.ensure_loaded()
+    if implicit_documents:
+        implicit_loader.ensure_loaded()
+    explicit_results = cached_many("explicit", [d.text for d in explicit_documents])
+    implicit_results = cached_many("implicit", [d.text for d in implicit_documents])
+
+    results = {document.id: {} for document in request.documents}
+    for document, predictions in zip(explicit_documents, explicit_results):
+        results[document.id]["explicit"] = predictions
+    for document, predictions in zip(implicit_documents, implicit_results):
+        results[document.id]["implicit"] = predictions
+    return {"results": results}
+
+def redetect(name, previous, old_text, new_text, change):
+    """
+    Detects one model on `new_text`. When `previous` holds the state of the same
+    model for `old_text`, only what `change` touched is re-run: the windows whose
+    tokens changed, or the sentences around the change.
+    Returns (predictions, state, re-detected region).
+    """
+    if name == "explicit":
+        identity = explicit_model_identity()
+        if previous is not None and previous["identity"] == identity:
+            tokens, windows, region = update_explicit_tokens(previous["state"], new_text, infer=explicit_batcher.run)
+        else:
+            (tokens, windows, _), region = predict_explicit_tokens(new_text, infer=explicit_batcher.run), (0, len(new_text))
+        return group_entities(new_text, *tokens), {"identity": identity, "state": (tokens, windows)}, region
+
+    identity = implicit_model_identity()
+    if previous is not None and previous["identity"] == identity:
+        *sentences, region = update_implicit_sentences(previous["state"], old_text, new_text, *change, infer=implicit_batcher.run)
+    else:
+        sentences, region = predict_implicit_sentences(new_text, infer=implicit_batcher.run), (0, len(new_text))
+    return build_sentence_results(*sentences), {"identity": identity, "state": tuple(sentences)}, region
+
+@app.post("/predictIncremental")
+async def predict_incremental(request: IncrementalPredictionRequest):
+    """
+    Incremental detection for documents that are edited and re-checked. Send the
+    full `text` once (a `document_id` is returned), then only the `edits` made
+    since the last call, with that `document_id`. Only the windows / sentences
+    around the edits go through the models again.
+    """
+    names = ["explicit", "implicit"] if request.models == "both" else [request.models]
+
+    if request.text is not None:
+        document_id = request.document_id or document_store.new_id()
+        previous, old_text, new_text, change = {}, "", request.text, (0, 0)
+    else:
+        previous = document_store.get(request.document_id) if request.document_id else None
+        if previous is None:
+            raise HTTPException(status_code=404, detail="Unknown document_id, send the full text again")
+        document_id, old_text = request.document_id, previous["text"]
+        try:
+            new_text, *change = apply_edits(old_text, [(edit.start, edit.end, edit.text) for edit in request.edits])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    executors = {"explicit": explicit_executor, "implicit": implicit_executor}
+    for name in names:
+        if not await executors[name].run(model_loaders[name].ensure_loaded):
+            raise HTTPException(status_code=503, detail=f"The {name} model is not loaded")
+
+    outcomes = await asyncio.gather(*(
+        executors[name].run(redetect, name, previous.get(name), old_text, new_text, change) for name in names
+    ))
+    document = {"text": new_text}
+    response = {"document_id": document_id, "redetected": {}}
+    for name, (predictions, document[name], region) in zip(names, outcomes):
+        response[name] = predictions
+        response["redetected"][name] = {"start": region[0], "end": region[1]}
+    document_store.put(document_id, document)
+
+    return response
+
+@app.post("/predictTable")
+async def predict_table(request: TablePredictionRequest):
+    """
+    Detection for spreadsheets sent as columns of cells (see tabular.py). Every
+    distinct cell value is classified once and its results go to every cell that
+    holds it; hinted columns skip the models. Returns the results of every cell,
+    per column and model, with offsets into the cell. With "mask", every column also
+    gets its "masked" cells and the response the "mapping" of the placeholders, as /mask.
+    """
+    names = ["explicit", "implicit"] if request.models == "both" else [request.models]
+    if request.mask is not None and request.mask not in names:
+        raise HTTPException(status_code=400, detail=f"Cannot mask with the {request.mask} model, it is not in models")
+    executors = {"explicit": explicit_executor, "implicit": implicit_executor}
+    for name in names:
+        if not await executors[name].run(model_loaders[name].ensure_loaded):
+            raise HTTPException(status_code=503, detail=f"The {name} model is not loaded")
+
+    columns = [[cell or "" for cell in column.cells] for column in request.columns]
+    hints = [column.hint or None for column in request.columns]
+    tables = label_tables()
+    known_labels = {"explicit": set(tables.explicit), "implicit": set(tables.implicit)}
+    for column, hint in zip(request.columns, hints):
+        for name in names:
+            if hint is not None and hint != tabular.NO_PII_HINT and hint not in known_labels[name]:
+                raise HTTPException(status_code=400, detail=f"Unknown hint for column {column.name!r}: {hint} is not one of the {name} model's labels")
+
+    values = tabular.distinct_values(columns, hints)
+    outcomes = await asyncio.gather(*(executors[name].run(cached_many, name, values) for name in names))
+    hinted = {"explicit": tabular.hinted_entities, "implicit": tabular.hinted_sentences}
+
+    response_columns = [{"name": column.name} for column in request.columns]
+    for name, results in zip(names, outcomes):
+        for response_column, cell_results in zip(response_columns, tabular.broadcast(columns, hints, values, results, hinted[name])):
+            response_column[name] = cell_results
+
+    filled = [sum(1 for cell in cells if cell and not cell.isspace()) for cells in columns]
+    response = {
+        "columns": response_columns,
+        "stats": {
+            "cells": sum(filled),
+            "hinted_cells": sum(count for count, hint in zip(filled, hints) if hint is not None),
+            "classified_values": len(values),
+        },
+    }
+    if request.mask is not None:
+        cell_spans = [[result_spans(request.mask, results) for results in column[request.mask]] for column in response_columns]
+        masked_columns, response["mapping"] = tabular.mask_columns(columns, cell_spans)
+        for response_column, masked_cells in zip(response_columns, masked_columns):
+            response_column["masked"] = masked_cells
+    return response
+
+def shifted(results, offset):
+    """Copies of entity / sentence results with their offsets moved by `offset` (cached results are shared)."""
+    return [{**result, "start": result["start"] + offset, "end": result["end"] + offset} for result in results]
+
+async def detect_page(page, names):
+    """
+    Runs the detectors on one ingested page. Text pages are detected like /predict;
+    spreadsheet pages cell by cell, each distinct value once (see /predictTable).
+    Offsets are relative to the page.
+    """
+    executors = {"explicit": explicit_executor, "implicit": implicit_executor}
+    if page.cells is not None:
+        cell_texts = [page.text[start:end] for start, end in page.cells]
+        values = tabular.distinct_values([cell_texts], [None])
+        outcomes = await asyncio.gather(*(executors[name].run(cached_many, name, values) for name in names))
+        detected = {}
+        for name, results in zip(names, outcomes):
+            result_of = dict(zip(values, results))
+            detected[name] = [
+                result for (start, _), text in zip(page.cells, cell_texts) for result in shifted(result_of.get(text, []), start)
+            ]
+        return detected
+
+    tokens = shared_tokens(page.text)
+    cached = {"explicit": cached_explicit, "implicit": cached_implicit}
+    outcomes = await asyncio.gather(*(executors[name].run(cached[name], page.text, tokens=tokens) for name in names))
+    return dict(zip(names, outcomes))
+
+async def ingest_lines(upload, pages, names):
+    """
+    Extracts the pages in a background thread and detects every page as soon as it
+    is extracted, while the next ones are parsed. Writes one JSON line per page, in
+    page order, with its offsets in the document text (the page texts joined with
+    ingestion.PAGE_SEPARATOR) and its results in document offsets, then a summary line.
+    """
+    loop = asyncio.get_running_loop()
+    reader = ingestion.ReadAhead(pages)
+    pending = deque()
+    number = offset = 0
+
+    async def finish(entry):
+        page_number, page, start, task = entry
+        return page_number, page, start, await task
+
+    def page_line(page_number, page, start, detected):
+        line = {"page": page_number, "name": page.name, "start": start, "end": start + len(page.text), "text": page.text}
+        for name in names:
+            line[name] = shifted(detected[name], start)
+        return json.dumps(line) + "\n"
+
+    try:
+        while True:
+            try:
+                page = await loop.run_in_executor(None, reader.next)
+            except Exception as e:
+                logging.exception("Extraction failed")
+                while pending:
+                    yield page_line(*await finish(pending.popleft()))
+                yield json.dumps({"error": f"Extraction failed: {e}"}) + "\n"
+                return
+            if page is None:
+                break
+
+            pending.append((number, page, offset, asyncio.ensure_future(detect_page(page, names))))
+            number += 1
+            offset += len(page.text) + len(ingestion.PAGE_SEPARATOR)
+            # Write the finished pages; wait for the oldest one when too many are in flight
+            while pending and (pending[0][3].done() or len(pending) > ingestion.READ_AHEAD_PAGES):
+                yield page_line(*await finish(pending.popleft()))
+
+        while pending:
+            yield page_line(*await finish(pending.popleft()))
+        yield json.dumps({"done": True, "pages": number, "characters": max(0, offset - len(ingestion.PAGE_SEPARATOR))}) + "\n"
+    finally:
+        reader.close()
+        for *_, task in pending:
+            task.cancel()
+        upload.close()
+
+@app.post("/ingest")
+async def ingest(request: Request, filename: str = "", models: Literal["explicit", "implicit", "both"] = "both"):
+    """
+    Server-side extraction and detection of an uploaded document. The request body
+    is the file itself (PDF, DOCX, XLSX, CSV or TXT; the type comes from ?filename=
+    or the Content-Type header). The response is newline-delimited JSON: one line
+    per page as soon as it is detected (see ingest_lines), then {"done": true, ...}.
+    """
+    kind = ingestion.document_kind(filename, request.headers.get("content-type"))
+    if kind is None:
+        raise HTTPException(status_code=415, detail="Unsupported document type, send a PDF, DOCX, XLSX, CSV or TXT file")
+
+    names = ["explicit", "implicit"] if models == "both" else [models]
+    executors = {"explicit": explicit_executor, "implicit": implicit_executor}
+    for name in names:
+        if not await executors[name].run(model_loaders[name].ensure_loaded):
+            raise HTTPException(status_code=503, detail=f"The {name} model is not loaded")
+
+    try:
+        upload = await ingestion.receive_upload(request.stream())
+    except ingestion.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    try:
+        pages = ingestion.extract_pages(upload, kind)
+    except ingestion.UnsupportedDocument as e:
+        upload.close()
+        raise HTTPException(status_code=415, detail=str(e))
+    return StreamingResponse(ingest_lines(upload, pages, names), media_type="application/x-ndjson")
+
+def result_spans(model, results):
+    """The spans /mask replaces: explicit entities, or implicit sentences labelled with all their topics."""
+    if model == "explicit":
+        return [{"start": e["start"], "end": e["end"], "label": e["label"]} for e in results]
+    return [
+        {"start": s["start"], "end": s["end"], "label": ", ".join(t["topic"] for t in s["predicted_topics"])}
+        for s in results
+    ]
+
+@app.post("/mask")
+async def mask(request: MaskRequest):
+    """
+    Masks the detected PII (entities for the explicit model, whole sentences for the
+    implicit one) with numbered placeholders such as [Name] and [Name_2]. Returns the
+    masked text and the mapping from placeholders back to the originals, which /unmask takes.
+    """
+    if request.spans is not None:
+        spans = [span.model_dump() for span in request.spans]
+    elif request.model == "explicit":
+        spans = result_spans("explicit", await explicit_executor.run(cached_explicit, request.text))
+    else:
+        spans = result_spans("implicit", await implicit_executor.run(cached_implicit, request.text))
+    masked_text, mapping = mask_spans(request.text, spans)
+    return {"masked_text": masked_text, "mapping": mapping}
+
+@app.post("/unmask")
+def unmask(request: UnmaskRequest):
+    """Puts the originals of a masking log mapping back in place of their placeholders."""
+    text, replacements = unmask_text(request.text, [entry.model_dump() for entry in request.mapping])
+    return {"text": text, "replacements": replacements}
+
+@app.get("/health")
+def health():
+    """Liveness: the server is up. Reports the load state of every model."""
+    return {"status": "ok", "models": {name: loader.status() for name, loader in model_loaders.items()}}
+
+@app.get("/ready")
+def ready(model: str = None):
+    """Readiness of all models, or of one model with ?model=explicit / ?model=implicit."""
+    if model is not None and model not in model_loaders:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {model}")
+    names = [model] if model else list(model_loaders)
+    models = {name: model_loaders[name].status() for name in names}
+    is_ready = all(model_loaders[name].ready for name in names)
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "models": models},
+    )
+
+@app.get("/cacheStats")
+def cache_stats():
+    stats = prediction_cache.stats()
+    stats["sentence_cache_entries"] = len(implicit_sentence_cache)
+    return stats
+
+@app.post("/cacheClear")
+def cache_clear():
+    prediction_cache.clear()
+    implicit_sentence_cache.clear()
+    return {"cleared": True}
+
+@app.get("/batchingStats")
+def batching_stats():
+    return {"explicit": explicit_batcher.stats(), "implicit": implicit_batcher.stats()}
+
+@app.get("/executorStats")
+def executor_stats():
+    return {
+        "torch_threads": TORCH_THREADS,
+        "inference_workers": INFERENCE_WORKERS,
+        "explicit": explicit_executor.stats(),
+        "implicit": implicit_executor.stats(),
+        "process_workers": worker_pool.stats() if worker_pool is not None else None,
+    }
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """
+    Histograms in the Prometheus text format: time per detector phase and per
+    route, document sizes (characters, tokens, windows, sentences) and batch sizes.
+    Work done in model worker processes is not included.
+    """
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 print("Current working dir:", os.getcwd())
@@ -88,6 +739,8 @@ print("base_dir:", BASE_DIR)
 
 print("Full path of this file:", os.path.abspath(__file__))
 if __name__ == "__main__":
+    # Needed by the model worker processes (ANONYMASK_PROCESS_WORKERS) in the PyInstaller build
+    multiprocessing.freeze_support()
     logging.info("Launching FastAPI backend on 127.0.0.1:8000")
     this_file = os.path.splitext(os.path.basename(__file__))[0]
     print(f"{this_file}:app")
@@ -1,11 +1,30 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+
+# Run `python model_cache.py manifest` before building, so the backend can check its model cache.
+# With ANONYMASK_EXTERNAL_WEIGHTS=1 the *.safetensors files are left out of the onefile archive
+# (no unpacking of the weights at every launch); ship them in bin/models/<package>/ instead.
+EXTERNAL_WEIGHTS = os.environ.get("ANONYMASK_EXTERNAL_WEIGHTS") == "1"
+
+
+def model_datas(package):
+    if not EXTERNAL_WEIGHTS:
+        return [(package, package)]
+    datas = []
+    for name in os.listdir(package):
+        path = os.path.join(package, name)
+        if os.path.isdir(path):
+            datas.append((path, os.path.join(package, name)))
+        elif not name.endswith('.safetensors'):
+            datas.append((path, package))
+    return datas
 
 
 a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('explicit_model', 'explicit_model'), ('implicit_model', 'implicit_model')],
+    datas=model_datas('explicit_model') + model_datas('implicit_model'),
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
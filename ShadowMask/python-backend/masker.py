@@ -1,3 +1,5 @@
+import re
+
 from mask_config import mask_additional_words, excluded_words, partial_mask
 
 def mask_text(text: str) -> list:
@@ -15,3 +17,178 @@ def mask_text(text: str) -> list:
             masked_words.append(word)
 
     return " ".join(masked_words)
+
+
+# --- Span-based masking ---
+
+def substitute_spans(text, replacements):
+    """
+    Replaces text[start:end] with `replacement` for every (start, end, replacement),
+    in one pass: the untouched pieces and the replacements are collected and
+    joined once. Spans that overlap an earlier span are skipped. Returns
+    (new_text, applied) with the replacements that were applied.
+    """
+    pieces = []
+    applied = []
+    position = 0
+    for start, end, replacement in sorted(replacements, key=lambda r: (r[0], -r[1])):
+        if start < position or not 0 <= start <= end <= len(text):
+            continue
+        pieces.append(text[position:start])
+        pieces.append(replacement)
+        applied.append((start, end, replacement))
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces), applied
+
+
+BRACKETED = re.compile(r"\[[^\[\]]*\]")
+
+
+def placeholder(category, count):
+    """The placeholder of the `count`-th value of a category: [Name], [Name_2], [Name_3], ..."""
+    return f"[{category}]" if count == 1 else f"[{category}_{count}]"
+
+
+def mask_spans(text, spans, counts=None):
+    """
+    Masks every {"start", "end", "label"} span of `text` with a numbered placeholder
+    per label, in document order. Returns (masked_text, mapping) where mapping holds
+    {"original", "masked", "label", "start", "end"} for every replaced span,
+    with offsets into the original text. `counts` (placeholders used so far per
+    label) carries the numbering on when several texts are masked as one document.
+    A placeholder that the text already holds is skipped, so unmasking gives the
+    text back exactly.
+    """
+    ordered = sorted(spans, key=lambda span: (span["start"], -span["end"]))
+    counts = {} if counts is None else counts
+    taken = set(BRACKETED.findall(text))
+    replacements = []
+    labels = {}
+    position = 0
+    for span in ordered:
+        start, end = span["start"], span["end"]
+        if start < position:
+            continue  # Overlaps the previous span, which keeps its placeholder
+        category = span["label"]
+        counts[category] = counts.get(category, 0) + 1
+        while placeholder(category, counts[category]) in taken:
+            counts[category] += 1
+        replacements.append((start, end, placeholder(category, counts[category])))
+        labels[start] = category
+        position = end
+
+    masked_text, applied = substitute_spans(text, replacements)
+    mapping = [
+        {"original": text[start:end], "masked": masked, "label": labels[start], "start": start, "end": end}
+        for start, end, masked in applied
+    ]
+    return masked_text, mapping
+
+
+# --- Unmasking ---
+
+class Unmasker:
+    """
+    Aho-Corasick automaton over all placeholders of a mapping. unmask() finds every
+    placeholder in one left-to-right scan, so it takes time linear in the document
+    size however many placeholders there are.
+
+    Where placeholders overlap, the leftmost one wins, and of those the longest.
+    When a placeholder appears more than once in the mapping, its first original
+    is used. Short placeholders made of word characters only (two characters or
+    fewer) only match as whole words, as in the unmasking page.
+    """
+
+    def __init__(self, mapping):
+        self.originals = []
+        self.lengths = []
+        self.whole_word = []
+        # Trie: one dict of transitions per state, the pattern ending at every state
+        self.transitions = [{}]
+        self.pattern_at = [-1]
+
+        seen = {}
+        for entry in mapping:
+            masked, original = entry["masked"], entry["original"]
+            if not masked or masked in seen:
+                continue
+            seen[masked] = len(self.originals)
+            self.originals.append(original)
+            self.lengths.append(len(masked))
+            self.whole_word.append(len(masked) <= 2 and all(c.isalnum() or c == "_" for c in masked))
+            self._add(masked, seen[masked])
+        self._link()
+
+    def _add(self, pattern, index):
+        state = 0
+        for char in pattern:
+            next_state = self.transitions[state].get(char)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions[state][char] = next_state
+                self.transitions.append({})
+                self.pattern_at.append(-1)
+            state = next_state
+        self.pattern_at[state] = index
+
+    def _link(self):
+        """Breadth-first pass setting the failure link and the next pattern-ending suffix of every state."""
+        count = len(self.transitions)
+        self.fail = [0] * count
+        self.output_link = [-1] * count  # Nearest proper suffix state that ends a pattern
+        queue = list(self.transitions[0].values())
+        for state in queue:
+            for char, next_state in self.transitions[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.transitions[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                link = self.fail[next_state]
+                self.output_link[next_state] = link if self.pattern_at[link] >= 0 else self.output_link[link]
+                queue.append(next_state)
+
+    def find(self, text):
+        """Returns the non-overlapping (start, end, pattern index) matches, leftmost-longest first."""
+        transitions, fail, pattern_at, output_link = self.transitions, self.fail, self.pattern_at, self.output_link
+        lengths = self.lengths
+        candidates = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(char, 0)
+            match_state = state if pattern_at[state] >= 0 else output_link[state]
+            while match_state > 0:
+                index = pattern_at[match_state]
+                end = position + 1
+                start = end - lengths[index]
+                if not self.whole_word[index] or self._is_whole_word(text, start, end):
+                    candidates.append((start, -end, index))
+                match_state = output_link[match_state]
+
+        matches = []
+        position = 0
+        for start, negative_end, index in sorted(candidates):
+            if start >= position:
+                matches.append((start, -negative_end, index))
+                position = -negative_end
+        return matches
+
+    @staticmethod
+    def _is_whole_word(text, start, end):
+        before = text[start - 1] if start > 0 else " "
+        after = text[end] if end < len(text) else " "
+        return not (before.isalnum() or before == "_") and not (after.isalnum() or after == "_")
+
+    def unmask(self, text):
+        """Returns (unmasked_text, number of placeholders replaced)."""
+        matches = self.find(text)
+        unmasked, _ = substitute_spans(text, [(start, end, self.originals[index]) for start, end, index in matches])
+        return unmasked, len(matches)
+
+
+def unmask_text(text, mapping):
+    """Puts the originals of a masking log mapping ({"original", "masked"} entries) back into `text`."""
+    return Unmasker(mapping).unmask(text)
@@ -0,0 +1,98 @@
+"""
+Prometheus-style metrics, served as text on GET /metrics.
+
+Only histograms are needed, so they are implemented here rather than pulling
+in prometheus_client. Every histogram keeps cumulative bucket counts, a sum
+and a count per label combination.
+"""
+import threading
+from bisect import bisect_left
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CHARACTER_BUCKETS = (100, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+TOKEN_BUCKETS = (32, 128, 512, 1024, 4096, 16384, 65536, 262144)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series_items = sorted((values, list(series)) for values, series in self._series.items())
+        for label_values, series in series_items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.labels, label_values, ['le="' + le + '"'])
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {cumulative}")
+        return "\n".join(lines)
+
+
+REGISTRY = []
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(histogram.render() for histogram in REGISTRY) + "\n"
+
+
+# --- Metrics of the detection backend ---
+
+PHASE_SECONDS = Histogram(
+    "anonymask_phase_seconds", "Time spent in one phase of a detector (tokenize, inference, decode, group, split).",
+    TIME_BUCKETS, ("detector", "phase"),
+)
+REQUEST_SECONDS = Histogram(
+    "anonymask_request_seconds", "HTTP request duration by route.",
+    TIME_BUCKETS, ("path", "status"),
+)
+DOCUMENT_CHARACTERS = Histogram(
+    "anonymask_document_characters", "Size of the documents a detector ran on, in characters.",
+    CHARACTER_BUCKETS, ("detector",),
+)
+DOCUMENT_TOKENS = Histogram(
+    "anonymask_document_tokens", "Size of the documents the explicit detector ran on, in tokens.",
+    TOKEN_BUCKETS, ("detector",),
+)
+DOCUMENT_WINDOWS = Histogram(
+    "anonymask_document_windows", "Sliding windows per document (explicit detector).",
+    COUNT_BUCKETS, (),
+)
+DOCUMENT_SENTENCES = Histogram(
+    "anonymask_document_sentences", "Sentences per document (implicit detector).",
+    COUNT_BUCKETS, (),
+)
+BATCH_SIZE = Histogram(
+    "anonymask_batch_size", "Rows (windows or sentences) per forward pass.",
+    COUNT_BUCKETS, ("model",),
+)
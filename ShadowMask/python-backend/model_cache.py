@@ -0,0 +1,175 @@
+"""
+Persistent on-disk model cache for the packaged backend.
+
+The PyInstaller build unpacks everything into a fresh _MEIPASS directory at
+every launch. Loading the weights from there means reading them in full from a
+just-written temp file each time. Instead, the model files are copied once into
+a persistent cache directory, checked against a manifest, and loaded from
+there on every later launch. safetensors memory-maps the file, so a warm
+start only touches the pages the OS does not have cached yet.
+
+    ANONYMASK_MODEL_CACHE_DIR   cache location (default: %LOCALAPPDATA%/AnonyMask/models
+                                on Windows, ~/.cache/anonymask/models elsewhere)
+
+Each model folder carries a model_manifest.json (file sizes and SHA-256), written
+at build time with:
+    python model_cache.py manifest
+When the manifest of the cached copy matches the bundled one, the cached copy
+is used as is. When it does not (first launch, new model version), the files are
+copied and hashed again. Builds that leave the weights out of the onefile
+archive (see main.spec) ship them in models/<package>/ next to the executable.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+from pathlib import Path
+
+MANIFEST_FILENAME = "model_manifest.json"
+# Files of a model package that are not needed to run the model
+SKIPPED_SUFFIXES = (".py", ".pyc", ".log")
+SKIPPED_PREFIXES = ("training_args", ".")
+SKIPPED_NAMES = {MANIFEST_FILENAME}
+
+
+def default_cache_dir():
+    configured = os.environ.get("ANONYMASK_MODEL_CACHE_DIR")
+    if configured:
+        return Path(configured)
+    if sys.platform == "win32" and os.environ.get("LOCALAPPDATA"):
+        return Path(os.environ["LOCALAPPDATA"]) / "AnonyMask" / "models"
+    return Path.home() / ".cache" / "anonymask" / "models"
+
+
+def file_sha256(path, chunk_size=4 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_files(model_dir):
+    """Names of the files in `model_dir` that make up the model (weights, config, tokenizer, labels)."""
+    return sorted(
+        path.name for path in Path(model_dir).iterdir()
+        if path.is_file() and path.name not in SKIPPED_NAMES
+        and not path.name.endswith(SKIPPED_SUFFIXES) and not path.name.startswith(SKIPPED_PREFIXES)
+    )
+
+
+def build_manifest(model_dir):
+    model_dir = Path(model_dir)
+    return {
+        "files": {
+            name: {"size": (model_dir / name).stat().st_size, "sha256": file_sha256(model_dir / name)}
+            for name in model_files(model_dir)
+        }
+    }
+
+
+def read_manifest(model_dir):
+    try:
+        with open(Path(model_dir) / MANIFEST_FILENAME, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(model_dir):
+    manifest = build_manifest(model_dir)
+    with open(Path(model_dir) / MANIFEST_FILENAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"Wrote {Path(model_dir) / MANIFEST_FILENAME} ({len(manifest['files'])} files)")
+    return manifest
+
+
+def manifest_version(manifest):
+    """Short, stable id of a manifest, used as the folder name of a cached model version."""
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def is_complete(model_dir, manifest):
+    """Cheap check of a cached copy: same manifest and every file has the expected size."""
+    if read_manifest(model_dir) != manifest:
+        return False
+    for name, entry in manifest["files"].items():
+        try:
+            if (Path(model_dir) / name).stat().st_size != entry["size"]:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def external_weights_dir(package_name):
+    """Where builds that keep the weights out of the onefile archive ship them: next to the executable."""
+    return Path(sys.executable).resolve().parent / "models" / package_name
+
+
+def resolve_model_dir(package_name, bundled_dir, cache_dir=None):
+    """
+    Returns the directory the model should be loaded from. Without a bundled
+    manifest (development checkout, Hugging Face id) that is `bundled_dir` itself.
+    Otherwise it is the cached copy in `cache_dir`, created first if needed.
+    Falls back to `bundled_dir` when the cache cannot be written.
+    """
+    manifest = read_manifest(bundled_dir) if Path(bundled_dir).is_dir() else None
+    if manifest is None:
+        return str(bundled_dir)
+
+    cache_root = Path(cache_dir or default_cache_dir()) / package_name
+    target = cache_root / manifest_version(manifest)
+    if is_complete(target, manifest):
+        logging.info(f"Model cache hit for {package_name}: {target}")
+        return str(target)
+
+    try:
+        copy_model(manifest, [Path(bundled_dir), external_weights_dir(package_name)], target)
+    except (OSError, ValueError) as e:
+        print(f"Could not fill the model cache for {package_name}, loading from {bundled_dir}: {e}")
+        logging.warning(f"Could not fill the model cache for {package_name}, loading from {bundled_dir}: {e}")
+        return str(bundled_dir)
+
+    # Older versions of this model are not needed anymore
+    for old_version in cache_root.iterdir():
+        if old_version != target and old_version.is_dir():
+            shutil.rmtree(old_version, ignore_errors=True)
+    return str(target)
+
+
+def copy_model(manifest, source_dirs, target):
+    """
+    Copies the files listed in `manifest` into `target`, checking every hash.
+    The manifest is written last, so an interrupted copy is never mistaken for
+    a complete one.
+    """
+    temp_target = target.with_name(target.name + ".partial")
+    shutil.rmtree(temp_target, ignore_errors=True)
+    temp_target.mkdir(parents=True)
+
+    for name, entry in manifest["files"].items():
+        source = next((d / name for d in source_dirs if (d / name).is_file()), None)
+        if source is None:
+            raise ValueError(f"{name} is missing from {', '.join(str(d) for d in source_dirs)}")
+        shutil.copyfile(source, temp_target / name)
+        if file_sha256(temp_target / name) != entry["sha256"]:
+            raise ValueError(f"Checksum mismatch for {source}")
+
+    with open(temp_target / MANIFEST_FILENAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(temp_target, target)
+    print(f"Cached model files in {target}")
+    logging.info(f"Cached model files in {target}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "manifest":
+        print("Usage: python model_cache.py manifest")
+        sys.exit(1)
+    backend_dir = Path(__file__).resolve().parent
+    for package in ("explicit_model", "implicit_model"):
+        write_manifest(backend_dir / package)
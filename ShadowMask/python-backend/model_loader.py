@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# transformers resolves its classes lazily and that is not thread-safe: loaders
+# running side by side must take this lock around their transformers imports.
+import_lock = threading.Lock()
+
+
+class ModelLoader:
+    """
+    Loads one model in a background thread and tracks its state
+    ("not_loaded", "loading", "ready" or "failed").
+
+    `load` is called once, without arguments, and should raise on failure.
+    Callers that need the model use ensure_loaded(), which starts the load
+    if nobody did yet and only waits for this model, never for the others.
+    """
+
+    def __init__(self, name, load):
+        self.name = name
+        self._load = load
+        self.state = "not_loaded"
+        self.error = None
+        self.load_seconds = None
+        self.phases = {}  # Seconds spent in every step of `load`, see phase()
+
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts loading in the background. Calling it again is a no-op."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.state = "loading"
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-loader", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout=None):
+        """Waits for the load to finish. Returns True when the model is ready."""
+        self._done.wait(timeout)
+        return self.state == "ready"
+
+    def ensure_loaded(self, timeout=None):
+        self.start()
+        return self.wait(timeout)
+
+    def mark_ready(self):
+        """Marks the model as loaded without running `load`, for state installed by hand (worker processes)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.current_thread()
+            self.state = "ready"
+            self.load_seconds = 0.0
+        self._done.set()
+
+    @contextmanager
+    def phase(self, name):
+        """Times one step of the load function: `with loader.phase("weights"): ...`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def status(self):
+        return {"state": self.state, "error": self.error, "load_seconds": self.load_seconds, "phases": dict(self.phases)}
+
+    def _run(self):
+        start = time.perf_counter()
+        logging.info(f"Loading {self.name} model in the background")
+        try:
+            self._load()
+            self.state = "ready"
+            logging.info(f"{self.name} model ready")
+        except Exception as e:
+            print(f"Error loading {self.name} model: {e}")
+            logging.exception(f"Error loading {self.name} model")
+            self.error = str(e)
+            self.state = "failed"
+        finally:
+            self.load_seconds = time.perf_counter() - start
+            self._done.set()
@@ -0,0 +1,158 @@
+"""
+Optional ONNX Runtime inference engine for the explicit and implicit models.
+
+The engine is picked with the ANONYMASK_ENGINE environment variable:
+    torch      - eager PyTorch (default)
+    onnx       - ONNX Runtime, FP32 export
+    onnx-int8  - ONNX Runtime, dynamically quantized INT8 export
+
+The ONNX engines need the packages of requirements-onnx.txt:
+    pip install -r requirements-onnx.txt
+The ONNX files are produced offline, once, from the loaded PyTorch models:
+    python onnx_engine.py export
+They are written to <model package>/onnx/, e.g. explicit_model/onnx/model.onnx
+and explicit_model/onnx/model.int8.onnx, so PyInstaller bundles them together
+with the rest of the model folder.
+"""
+import logging
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ENGINES = ("torch", "onnx", "onnx-int8")
+ENGINE = os.environ.get("ANONYMASK_ENGINE", "torch").lower()
+
+ONNX_FILENAME = "model.onnx"
+INT8_FILENAME = "model.int8.onnx"
+
+
+def onnx_path(onnx_dir, engine):
+    """Returns the ONNX file that backs `engine` inside `onnx_dir`."""
+    filename = INT8_FILENAME if engine == "onnx-int8" else ONNX_FILENAME
+    return Path(onnx_dir) / filename
+
+
+class OnnxLogitsModel:
+    """
+    Thin wrapper around an ONNX Runtime session that takes the same int64
+    input_ids / attention_mask arrays as the PyTorch path and returns logits.
+    """
+
+    def __init__(self, path, intra_op_threads=0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.path = str(path)
+        self.session = ort.InferenceSession(self.path, options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, input_ids, attention_mask):
+        return self.session.run(
+            ["logits"],
+            {"input_ids": np.ascontiguousarray(input_ids, dtype=np.int64),
+             "attention_mask": np.ascontiguousarray(attention_mask, dtype=np.int64)},
+        )[0]
+
+
+def load_engine(engine, onnx_dir):
+    """
+    Loads the ONNX session for `engine`. Returns None for the torch engine, or
+    when the export / onnxruntime is missing, so the caller keeps using PyTorch.
+    """
+    if engine not in ENGINES:
+        logging.warning(f"Unknown ANONYMASK_ENGINE '{engine}', using torch")
+        return None
+    if engine == "torch":
+        return None
+
+    path = onnx_path(onnx_dir, engine)
+    if not path.exists():
+        print(f"ONNX model not found at {path}, falling back to PyTorch. Run 'python onnx_engine.py export' first.")
+        logging.warning(f"ONNX model not found at {path}, falling back to PyTorch")
+        return None
+    try:
+        session = OnnxLogitsModel(path, intra_op_threads=int(os.environ.get("ANONYMASK_ONNX_THREADS", "0")))
+    except ImportError:
+        print("onnxruntime is not installed (pip install -r requirements-onnx.txt), falling back to PyTorch.")
+        logging.warning("onnxruntime is not installed, falling back to PyTorch")
+        return None
+
+    print(f"Using ONNX Runtime engine: {path}")
+    logging.info(f"Using ONNX Runtime engine: {path}")
+    return session
+
+
+# --- OFFLINE EXPORT ---
+
+def export_onnx(model, tokenizer, output_path, opset_version=17):
+    """Exports a Hugging Face classification model to ONNX with dynamic batch and sequence axes."""
+    import torch
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, wrapped):
+            super().__init__()
+            self.wrapped = wrapped
+
+        def forward(self, input_ids, attention_mask):
+            return self.wrapped(input_ids=input_ids, attention_mask=attention_mask).logits
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    sample = tokenizer(["Nama saya Budi.", "Tinggal di Jakarta"], padding=True, return_tensors="pt")
+    wrapped = LogitsOnly(model.cpu()).eval()
+
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapped,
+            (sample["input_ids"], sample["attention_mask"]),
+            str(output_path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=opset_version,
+            dynamo=False,
+        )
+    print(f"Exported {output_path}")
+    return output_path
+
+
+def quantize_onnx(input_path, output_path):
+    """Writes a dynamically quantized (INT8 weights) copy of an ONNX model."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(input_path), str(output_path), weight_type=QuantType.QInt8)
+    print(f"Quantized {output_path}")
+    return output_path
+
+
+def export_all():
+    """Exports and quantizes both the explicit and the implicit model."""
+    from explicit_model import model as explicit
+    from implicit_model import model as implicit
+
+    for name, module in (("explicit", explicit), ("implicit", implicit)):
+        if not module.loader.ensure_loaded():
+            print(f"The {name} model could not be loaded, skipping export.")
+            continue
+        if name == "explicit":
+            model, tokenizer = explicit.model, explicit.tokenizer
+        else:
+            model, tokenizer = implicit.implicit_model, implicit.implicit_tokenizer
+        onnx_dir = module.ONNX_DIR
+        fp32_path = export_onnx(model, tokenizer, onnx_path(onnx_dir, "onnx"))
+        quantize_onnx(fp32_path, onnx_path(onnx_dir, "onnx-int8"))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "export":
+        print("Usage: python onnx_engine.py export")
+        sys.exit(1)
+    export_all()
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+def cache_key(model_identity, text):
+    """Content address of a prediction: hash of the model identity and the exact text."""
+    digest = hashlib.sha256()
+    digest.update(model_identity.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+def _modified_time(path):
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+class PredictionCache:
+    """
+    LRU cache of prediction results, bounded both by entry count and by the
+    size of the serialized results in memory.
+
+    Results are stored as JSON bytes, so every hit hands out a fresh copy that
+    the caller is free to modify. When `disk_dir` is set, entries are also
+    written there and survive backend restarts. The disk tier keeps plain
+    predictions (including the detected PII words), so it is off unless
+    explicitly configured.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, disk_dir=None, max_disk_entries=10000):
+        self.max_entries = max(0, int(max_entries))
+        self.max_bytes = max(0, int(max_bytes))
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_disk_entries = max_disk_entries
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # --- Public API ---
+
+    def get_or_compute(self, model_identity, text, compute):
+        """
+        Returns the cached result for (`model_identity`, `text`), or calls `compute()`
+        and caches its result. A `model_identity` of None bypasses the cache.
+        """
+        if model_identity is None:
+            return compute()
+
+        key = cache_key(model_identity, text)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        result = compute()
+        self.put(key, result)
+        return result
+
+    def get_or_compute_many(self, model_identity, texts, compute_many):
+        """
+        Like get_or_compute for a list of texts: `compute_many` is called once,
+        with only the texts that were not cached, and must return one result each.
+        """
+        if model_identity is None:
+            return compute_many(texts)
+
+        keys = [cache_key(model_identity, text) for text in texts]
+        results = [self.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            computed = compute_many([texts[i] for i in missing])
+            for i, result in zip(missing, computed):
+                self.put(keys[i], result)
+                results[i] = result
+        return results
+
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(payload)
+
+        payload = self._read_disk(key)
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, payload)
+        return json.loads(payload)
+
+    def put(self, key, result):
+        payload = json.dumps(result, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            self._store(key, payload)
+        self._write_disk(key, payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "disk_dir": str(self.disk_dir) if self.disk_dir else None,
+            }
+
+    # --- Memory tier ---
+
+    def _store(self, key, payload):
+        # Caller holds the lock
+        if len(payload) > self.max_bytes or self.max_entries == 0:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = payload
+        self._bytes += len(payload)
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    # --- Disk tier ---
+
+    def _disk_path(self, key):
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            payload = path.read_bytes()
+            os.utime(path)  # Keep recently used entries when pruning
+            return payload
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.warning(f"Prediction cache: could not read {path}: {e}")
+            return None
+
+    def _write_disk(self, key, payload):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            temp_path.write_bytes(payload)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logging.warning(f"Prediction cache: could not write {path}: {e}")
+            return
+
+        self._disk_writes += 1
+        if self._disk_writes % 64 == 0:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Removes the least recently used files once the disk tier holds too many entries."""
+        files = list(self.disk_dir.glob("*/*.json"))
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=_modified_time)
+        for path in files[:len(files) - self.max_disk_entries]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
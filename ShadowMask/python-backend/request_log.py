@@ -0,0 +1,150 @@
+"""
+Structured request logging.
+
+Every request produces at most one JSON record in anonymask_backend.log, e.g.
+    {"event": "request", "method": "POST", "path": "/predictExplicit", "status": 200,
+     "ms": 41.7, "bytes": 5123, "phases": {"explicit": {"tokenize": 2.1, "inference": 35.0,
+     "decode": 0.4, "group": 0.9}}}
+with the time (in ms) the request spent in each phase of each detector. The
+implicit detector reports split / inference / decode; its tokenization happens
+together with the forward passes and is part of inference. Phases are only
+measured for work done in the server process, not in model worker processes.
+
+Log records are written by a background thread (QueueHandler / QueueListener),
+so a slow disk never holds up a request.
+
+    ANONYMASK_LOG_SAMPLE_RATE  share of requests that are logged, 0..1 (default 1)
+    ANONYMASK_LOG_SLOW_MS      requests slower than this are always logged (default 1000)
+
+Failed requests (status >= 500) are always logged too.
+
+Every phase also goes to the anonymask_phase_seconds histogram on /metrics, and
+a request made with ?profile=1 gets its phases back as a trace (RequestTimings.trace).
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+SAMPLE_RATE = float(os.environ.get("ANONYMASK_LOG_SAMPLE_RATE", "1"))
+SLOW_MS = float(os.environ.get("ANONYMASK_LOG_SLOW_MS", "1000"))
+
+request_logger = logging.getLogger("anonymask.requests")
+
+# Phase timings of the request being handled (a RequestTimings)
+_timings = contextvars.ContextVar("request_timings", default=None)
+_listener = None
+
+
+class RequestTimings:
+    """
+    Time per phase of each detector for one request: {detector: {phase: seconds}}.
+    With `trace`, every phase is also kept as a Chrome trace event (see trace()).
+    """
+
+    def __init__(self, trace=False):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.events = [] if trace else None
+
+    def add(self, detector, name, start, end):
+        phases = self.phases.setdefault(detector, {})
+        phases[name] = phases.get(name, 0.0) + end - start
+        if self.events is not None:
+            self.events.append({
+                "name": name,
+                "cat": detector,
+                "ph": "X",
+                "ts": round((start - self.start) * 1e6, 1),
+                "dur": round((end - start) * 1e6, 1),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            })
+
+    def trace(self, name):
+        """
+        The recorded phases in the Trace Event format, with the whole request as the
+        root event. Opens in chrome://tracing, Perfetto or speedscope as a flame graph.
+        """
+        root = {
+            "name": name, "cat": "request", "ph": "X", "ts": 0.0,
+            "dur": round((time.perf_counter() - self.start) * 1e6, 1),
+            "pid": os.getpid(), "tid": threading.get_ident(),
+        }
+        return {"traceEvents": [root] + (self.events or []), "displayTimeUnit": "ms"}
+
+
+def start_async_logging():
+    """
+    Moves the handlers of the root logger (the log file set up by basicConfig)
+    behind a queue, so logging calls only enqueue the record. Calling it again is a no-op.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    root = logging.getLogger()
+    handlers = [handler for handler in root.handlers if not isinstance(handler, logging.handlers.QueueHandler)]
+    log_queue = queue.SimpleQueue()
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def begin_request(trace=False):
+    """Starts collecting phase timings for the current request. Returns (RequestTimings, token for end_request)."""
+    timings = RequestTimings(trace)
+    return timings, _timings.set(timings)
+
+
+def end_request(token):
+    _timings.reset(token)
+
+
+@contextmanager
+def phase(detector, name):
+    """
+    Times the block as phase `name` of `detector`: it goes to the phase histogram
+    on /metrics and, inside a request, to that request's timings.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        metrics.PHASE_SECONDS.observe(end - start, detector, name)
+        timings = _timings.get()
+        if timings is not None:
+            timings.add(detector, name, start, end)
+
+
+def should_log(status, elapsed_ms):
+    return status >= 500 or elapsed_ms >= SLOW_MS or random.random() < SAMPLE_RATE
+
+
+def log_request(method, path, status, elapsed, timings, content_length=None):
+    """Writes the one record of a request, if it is sampled."""
+    elapsed_ms = elapsed * 1000.0
+    if not should_log(status, elapsed_ms):
+        return
+    record = {"event": "request", "method": method, "path": path, "status": status, "ms": round(elapsed_ms, 2)}
+    if content_length and content_length.isdigit():
+        record["bytes"] = int(content_length)
+    if timings.phases:
+        record["phases"] = {
+            detector: {name: round(seconds * 1000.0, 2) for name, seconds in phases.items()}
+            for detector, phases in timings.phases.items()
+        }
+    request_logger.info(json.dumps(record, separators=(",", ":")))
@@ -0,0 +1,91 @@
+"""
+Structured input for spreadsheets (CSV/XLSX): detection per cell instead of on
+a flattened text.
+
+Every cell is its own document, so offsets are relative to the cell and a
+result never runs across a cell boundary. Repeated values (a status column, the
+same city on every row) are classified once: the distinct values of all columns
+go through the models together, and the results are broadcast back to every
+cell holding that value.
+
+A column hint names the one class of the whole column ("Phone_Number") or says
+that it holds no PII ("none"). Hinted columns never reach the models: every
+non-blank cell becomes one result of the hinted class.
+
+Masking numbers the placeholders across the whole table, column by column and
+down every column, as /mask numbers them across a document.
+"""
+from masker import mask_spans
+
+NO_PII_HINT = "none"
+
+
+def distinct_values(columns, hints):
+    """The distinct non-blank cell values of the columns without a hint, in first-seen order."""
+    seen = {}
+    for cells, hint in zip(columns, hints):
+        if hint is not None:
+            continue
+        for cell in cells:
+            if cell and not cell.isspace() and cell not in seen:
+                seen[cell] = len(seen)
+    return list(seen)
+
+
+def _trimmed(cell):
+    """(start, end) of the cell without its surrounding whitespace, None for a blank cell."""
+    if not cell or cell.isspace():
+        return None
+    start = len(cell) - len(cell.lstrip())
+    return start, len(cell.rstrip())
+
+
+def hinted_entities(cell, hint):
+    """The explicit result of a cell in a hinted column: the whole cell as one entity."""
+    span = _trimmed(cell)
+    if span is None or hint == NO_PII_HINT:
+        return []
+    start, end = span
+    return [{"word": cell[start:end], "label": hint, "start": start, "end": end}]
+
+
+def hinted_sentences(cell, hint):
+    """The implicit result of a cell in a hinted column: the whole cell as one sentence of the hinted topic."""
+    span = _trimmed(cell)
+    if span is None or hint == NO_PII_HINT:
+        return []
+    start, end = span
+    return [{"sentence": cell[start:end], "predicted_topics": [{"topic": hint, "score": 1.0}], "start": start, "end": end}]
+
+
+def mask_columns(columns, cell_spans):
+    """
+    Masks every cell with its {"start", "end", "label"} spans (`cell_spans` holds the
+    spans of every cell, column by column). Returns (masked columns, mapping) where
+    every mapping entry also holds the "column" and "row" of its cell, with offsets
+    into the cell.
+    """
+    counts = {}
+    masked_columns = []
+    mapping = []
+    for column_index, (cells, spans) in enumerate(zip(columns, cell_spans)):
+        masked_cells = []
+        for row, (cell, cell_span) in enumerate(zip(cells, spans)):
+            masked, cell_mapping = mask_spans(cell, cell_span, counts)
+            masked_cells.append(masked)
+            mapping.extend({**entry, "column": column_index, "row": row} for entry in cell_mapping)
+        masked_columns.append(masked_cells)
+    return masked_columns, mapping
+
+
+def broadcast(columns, hints, values, results, hinted):
+    """
+    The result of every cell, column by column: the result of its value (`results`
+    holds one per entry of `values`) or, in a hinted column, `hinted(cell, hint)`.
+    Blank cells get no results.
+    """
+    result_of = dict(zip(values, results))
+    return [
+        [hinted(cell, hint) for cell in cells] if hint is not None else [result_of.get(cell, []) for cell in cells]
+        for cells, hint in zip(columns, hints)
+    ]
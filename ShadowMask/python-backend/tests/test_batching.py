@@ -0,0 +1,27 @@
+import pytest
+
+from batching import MicroBatcher
+
+
+def test_results_come_back_in_order():
+    batcher = MicroBatcher("test", lambda items: [item * 2 for item in items], max_batch_size=4, max_wait_ms=20)
+    assert batcher.run(list(range(10))) == [item * 2 for item in range(10)]
+
+
+def test_wrong_number_of_results_fails_every_item():
+    batcher = MicroBatcher("test", lambda items: items[:-1], max_batch_size=8, max_wait_ms=50)
+    futures = [batcher.submit(item) for item in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+
+
+def test_batch_error_fails_every_item():
+    def fail(items):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher("test", fail, max_wait_ms=20)
+    futures = [batcher.submit(item) for item in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
@@ -0,0 +1,115 @@
+import json
+
+import msgpack
+import numpy as np
+
+import compact_format
+from compact_format import LabelTables
+
+TEXT = "Hai 😀 Budi Santoso, HP 0812 3456 7890 😀. Saya sedang sakit 🤒 parah. Terima kasih."
+
+
+def span(part):
+    start = TEXT.index(part)
+    return start, start + len(part)
+
+
+def entity(part, label):
+    start, end = span(part)
+    return {"word": part, "label": label, "start": start, "end": end}
+
+
+def sentence(part, topics):
+    start, end = span(part)
+    return {"sentence": part, "predicted_topics": [{"topic": t, "score": s} for t, s in topics], "start": start, "end": end}
+
+
+TABLES = LabelTables(["Name", "Phone_Number"], ["Med_Hist", "Name", "Phone_Number"])
+ENTITIES = [entity("Budi Santoso", "Name"), entity("0812 3456 7890", "Phone_Number")]
+SENTENCES = [
+    sentence("Hai 😀 Budi Santoso, HP 0812 3456 7890 😀.", [("Name", 0.875), ("Phone_Number", 0.5)]),
+    sentence("Saya sedang sakit 🤒 parah.", [("Med_Hist", 0.75)]),
+    sentence("Terima kasih.", []),
+]
+
+
+def int32s(value):
+    return np.frombuffer(value, dtype="<i4").tolist() if isinstance(value, bytes) else list(value)
+
+
+def float32s(value):
+    return np.frombuffer(value, dtype="<f4").tolist() if isinstance(value, bytes) else list(value)
+
+
+def expand_explicit(compact, text, tables):
+    labels, offsets = int32s(compact["labels"]), int32s(compact["offsets"])
+    return [
+        {"word": text[offsets[2 * i]:offsets[2 * i + 1]], "label": tables["explicit"][label],
+         "start": offsets[2 * i], "end": offsets[2 * i + 1]}
+        for i, label in enumerate(labels)
+    ]
+
+
+def expand_implicit(compact, text, tables):
+    offsets, counts = int32s(compact["offsets"]), int32s(compact["topic_counts"])
+    topic_ids, scores = int32s(compact["topic_ids"]), float32s(compact["topic_scores"])
+    sentences, topic = [], 0
+    for i, count in enumerate(counts):
+        start, end = offsets[2 * i], offsets[2 * i + 1]
+        predicted = [
+            {"topic": tables["implicit"][topic_ids[j]], "score": scores[j]} for j in range(topic, topic + count)
+        ]
+        topic += count
+        sentences.append({"sentence": text[start:end], "predicted_topics": predicted, "start": start, "end": end})
+    return sentences
+
+
+def compact_content():
+    return {
+        "table": TABLES.version,
+        "explicit": TABLES.compact_explicit(ENTITIES),
+        "implicit": TABLES.compact_implicit(SENTENCES),
+    }
+
+
+def test_msgpack_round_trip():
+    decoded = msgpack.unpackb(compact_format.packb(compact_content()), raw=False)
+    tables = TABLES.as_dict()
+
+    assert decoded["table"] == tables["version"]
+    assert isinstance(decoded["explicit"]["offsets"], bytes)
+    assert expand_explicit(decoded["explicit"], TEXT, tables) == ENTITIES
+    assert expand_implicit(decoded["implicit"], TEXT, tables) == SENTENCES
+
+
+def test_offsets_count_code_points():
+    # Offsets are Python str (code point) offsets; a UTF-16 client has to map them (compact-decoder.ts)
+    decoded = msgpack.unpackb(compact_format.packb(compact_content()), raw=False)
+    starts = int32s(decoded["explicit"]["offsets"])[::2]
+    assert starts[0] == TEXT.index("Budi")
+    # One emoji before "Budi": a surrogate pair, so its UTF-16 index is one more
+    assert len(TEXT[:starts[0]].encode("utf-16-le")) // 2 == starts[0] + 1
+
+
+def test_compact_json_round_trip():
+    response = compact_format.compact_response(compact_content(), "json")
+    decoded = json.loads(response.body)
+    tables = TABLES.as_dict()
+    assert response.media_type == compact_format.COMPACT_JSON_MEDIA_TYPE
+    assert expand_explicit(decoded["explicit"], TEXT, tables) == ENTITIES
+    assert expand_implicit(decoded["implicit"], TEXT, tables) == SENTENCES
+
+
+def test_packs_plain_values():
+    value = {"none": None, "flags": [True, False], "int": -5, "big": 2 ** 40, "float": 0.25, "text": "😀", "data": b"\x00\x01",
+             "numpy": np.int64(7)}
+    decoded = msgpack.unpackb(compact_format.packb(value), raw=False)
+    assert decoded == {**value, "numpy": 7}
+
+
+def test_negotiate():
+    assert compact_format.negotiate("application/msgpack") == "msgpack"
+    assert compact_format.negotiate("application/json, application/x-msgpack;q=0.9") == "msgpack"
+    assert compact_format.negotiate(compact_format.COMPACT_JSON_MEDIA_TYPE) == "json"
+    assert compact_format.negotiate("application/json") is None
+    assert compact_format.negotiate(None) is None
@@ -0,0 +1,72 @@
+"""
+Incremental re-detection (/predictIncremental) against a full run on the edited
+text, over random edits. Needs the models; skipped when they cannot be loaded.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from document_store import apply_edits
+from explicit_model import model as explicit
+
+SAMPLE = (
+    "Nama saya Budi Santoso, tinggal di Jl. Merdeka No. 10 Jakarta. Nomor HP saya 081234567890. "
+    "Email budi.santoso@example.com, NIK 3174091203900001. Saya lahir di Bandung pada 12 Maret 1990. "
+)
+def document(lines):
+    return "".join(f"Baris {line}: {SAMPLE}" for line in range(lines))
+
+
+WORDS = ["Budi", "Santoso", "Jakarta", "081298765432", "dan", "alamat", "Jl. Sudirman", "\n", "😀", "rekening 123-456-789"]
+
+
+def random_edit(rng, text):
+    start = rng.randrange(len(text) + 1)
+    end = min(len(text), start + rng.choice([0, 0, 1, 5, 20, 80]))
+    replacement = "" if rng.random() < 0.25 else " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+    return start, end, replacement
+
+
+@pytest.fixture(scope="module")
+def loaded():
+    if not explicit.loader.ensure_loaded():
+        pytest.skip("the explicit model could not be loaded")
+
+
+@pytest.mark.parametrize("windowing", ["fixed", "adaptive"])
+def test_explicit_incremental_equals_full_run(loaded, monkeypatch, windowing):
+    monkeypatch.setattr(explicit, "WINDOWING", windowing)
+    monkeypatch.setattr(explicit, "MAX_WINDOW", 64)  # Several adaptive windows on a short text
+    rng = random.Random(f"incremental-{windowing}")
+    text = document(6)
+    tokens, windows, _ = explicit.predict_explicit_tokens(text)
+
+    for _ in range(60):
+        text, *_ = apply_edits(text, [random_edit(rng, text)])
+        tokens, windows, region = explicit.update_explicit_tokens((tokens, windows), text)
+        full, _, _ = explicit.predict_explicit_tokens(text)
+
+        for incremental_array, full_array in zip(tokens, full):
+            np.testing.assert_array_equal(incremental_array, full_array)
+        assert explicit.group_entities(text, *tokens) == explicit.group_entities(text, *full)
+        assert 0 <= region[0] <= region[1] <= len(text)
+
+
+def test_explicit_reruns_only_changed_windows(loaded, monkeypatch):
+    monkeypatch.setattr(explicit, "WINDOWING", "fixed")
+    text = document(6)
+    tokens, windows, _ = explicit.predict_explicit_tokens(text)
+    calls = []
+
+    def infer(window_ids):
+        calls.append(len(window_ids))
+        return explicit.run_window_batches(window_ids)
+
+    _, _, region = explicit.update_explicit_tokens((tokens, windows), text, infer=infer)
+    assert calls == [] and region == (0, 0)
+
+    # An edit near the end only re-runs the windows that see it
+    edited = text[:-10] + "Budi Santoso" + text[-10:]
+    explicit.update_explicit_tokens((tokens, windows), edited, infer=infer)
+    assert 0 < sum(calls) < len(explicit.tokenize_windows(edited)[1])
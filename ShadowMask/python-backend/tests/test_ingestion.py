@@ -0,0 +1,160 @@
+"""
+Text extraction of uploaded documents (ingestion.py). The DOCX, XLSX and PDF
+files are built here with the standard library.
+"""
+import io
+import zipfile
+
+import pytest
+
+import ingestion
+from ingestion import UnsupportedDocument, document_kind, extract_pages
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+M = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+
+
+def zipped(parts):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in parts.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def docx(paragraphs):
+    body = "".join(f"<w:p>{paragraph}</w:p>" for paragraph in paragraphs)
+    return zipped({"word/document.xml": f"<w:document {W}><w:body>{body}</w:body></w:document>"})
+
+
+def run(text):
+    return f"<w:r><w:t>{text}</w:t></w:r>"
+
+
+def xlsx(rows, shared):
+    sheet = "".join(f'<row r="{number}">{cells}</row>' for number, cells in enumerate(rows, 1))
+    return zipped({
+        "xl/workbook.xml": f'<workbook {M} {R}><sheets><sheet name="People" sheetId="1" r:id="rId1"/></sheets></workbook>',
+        "xl/_rels/workbook.xml.rels": (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>'
+        ),
+        "xl/sharedStrings.xml": f"<sst {M}>{''.join(shared)}</sst>",
+        "xl/worksheets/sheet1.xml": f"<worksheet {M}><sheetData>{sheet}</sheetData></worksheet>",
+    })
+
+
+def pdf(pages):
+    """A minimal PDF with one line of Helvetica text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream.decode('latin-1')}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def pages(content, kind):
+    return [(page.name, page.text, page.cells) for page in extract_pages(io.BytesIO(content), kind)]
+
+
+def test_document_kind():
+    assert document_kind("Laporan.DOCX", None) == "docx"
+    assert document_kind("data.xlsm", "text/plain") == "xlsx"
+    assert document_kind("upload", "text/csv; charset=utf-8") == "csv"
+    assert document_kind("program.exe", "application/octet-stream") is None
+
+
+def test_docx_paragraphs_and_page_breaks():
+    content = docx([
+        run("Nama saya Budi Santoso."),
+        run("Alamat") + "<w:r><w:tab/></w:r>" + run("Jl. Merdeka") + "<w:r><w:br/></w:r>" + run("No. 10"),
+        '<w:r><w:br w:type="page"/></w:r>' + run("Telepon 08123456789."),
+        run("Email budi@example.com") + '<w:r><w:br w:type="page"/></w:r>' + run("Selesai."),
+    ])
+    assert pages(content, "docx") == [
+        ("Page 1", "Nama saya Budi Santoso.\nAlamat\tJl. Merdeka\nNo. 10", None),
+        ("Page 2", "Telepon 08123456789.\nEmail budi@example.com", None),
+        ("Page 3", "Selesai.", None),
+    ]
+
+
+def test_docx_without_page_breaks_splits_by_size(monkeypatch):
+    monkeypatch.setattr(ingestion, "PAGE_CHARACTERS", 30)
+    content = docx([run(f"Paragraf nomor {number} di sini.") for number in range(4)])
+    # A page ends at the first paragraph end past PAGE_CHARACTERS
+    assert pages(content, "docx") == [
+        ("Page 1", "Paragraf nomor 0 di sini.\nParagraf nomor 1 di sini.", None),
+        ("Page 2", "Paragraf nomor 2 di sini.\nParagraf nomor 3 di sini.", None),
+    ]
+    assert pages(docx([]), "docx") == [("Page 1", "", None)]
+
+
+def test_xlsx_shared_and_inline_strings():
+    shared = ["<si><t>Name</t></si>", "<si><t>Budi Santoso</t></si>", "<si><t>Phone</t></si>", "<si><r><t>Ani </t></r><r><t>Wijaya</t></r></si>"]
+    rows = [
+        '<c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>2</v></c>',
+        '<c r="A2" t="s"><v>1</v></c><c r="B2"><v>8123456789</v></c>',
+        '<c r="A3" t="s"><v>3</v></c><c r="B3" t="inlineStr"><is><t>0812</t></is></c>',
+        '<c r="B4"><v>0813</v></c>',
+    ]
+    [(name, text, cells)] = pages(xlsx(rows, shared), "xlsx")
+
+    assert name == "Sheet: People"
+    assert text == "Sheet: People\nName: Budi Santoso | Ani Wijaya.\nPhone: 8123456789 | 0812 | 813.\n"
+    assert [text[start:end] for start, end in cells] == ["Budi Santoso", "Ani Wijaya", "8123456789", "0812", "813"]
+
+
+def test_csv(monkeypatch):
+    monkeypatch.setattr(ingestion, "CSV_ROWS_PER_PAGE", 2)
+    content = "﻿name;phone\nBudi;0812\n\nAni;\nJoko;0813\n".encode("utf-8")
+    result = pages(content, "csv")
+
+    assert [name for name, _, _ in result] == ["Sheet: Rows 2-3", "Sheet: Rows 4-4"]
+    assert result[0][1] == "Sheet: Rows 2-3\nname: Budi | Ani.\nphone: 0812.\n"
+    for _, text, cells in result:
+        assert all(text[start:end] and "|" not in text[start:end] for start, end in cells)
+    assert pages(b"", "csv") == [("Sheet: Rows", "Sheet: Rows\n", [])]
+
+
+def test_text(monkeypatch):
+    monkeypatch.setattr(ingestion, "PAGE_CHARACTERS", 20)
+    text = "Baris pertama di sini.\r\nBaris kedua.\nBaris ketiga 😀\n"
+    result = pages(text.encode("utf-8"), "txt")
+    assert "".join(page_text for _, page_text, _ in result) == text
+    assert [name for name, _, _ in result] == ["Page 1", "Page 2"]
+
+
+def test_pdf():
+    result = pages(pdf(["Nama saya Budi Santoso.", "Telepon 08123456789."]), "pdf")
+    assert [(name, text.strip()) for name, text, _ in result] == [
+        ("Page 1", "Nama saya Budi Santoso."),
+        ("Page 2", "Telepon 08123456789."),
+    ]
+
+
+@pytest.mark.parametrize("kind, content", [
+    ("docx", b"not a zip at all"),
+    ("docx", docx([run("Nama saya Budi.")])[:-30]),  # Truncated: no central directory
+    ("docx", zipped({"word/other.xml": "<x/>"})),  # A zip, but not a Word document
+    ("xlsx", zipped({"xl/worksheets/sheet1.xml": "<x/>"})),
+    ("pdf", b"%PDF-1.4 and nothing else"),
+    ("exe", b"MZ"),
+])
+def test_invalid_documents(kind, content):
+    with pytest.raises(UnsupportedDocument):
+        list(extract_pages(io.BytesIO(content), kind))
@@ -0,0 +1,91 @@
+from masker import Unmasker, mask_spans, placeholder, substitute_spans, unmask_text
+
+
+def spans(*items):
+    return [{"start": start, "end": end, "label": label} for start, end, label in items]
+
+
+def test_placeholders_are_numbered_per_label_in_document_order():
+    text = "Budi dan Ani di Jakarta"
+    masked, mapping = mask_spans(text, spans((9, 12, "Name"), (0, 4, "Name"), (16, 23, "Location")))
+
+    assert masked == "[Name] dan [Name_2] di [Location]"
+    assert [(m["original"], m["masked"], m["start"], m["end"]) for m in mapping] == [
+        ("Budi", "[Name]", 0, 4), ("Ani", "[Name_2]", 9, 12), ("Jakarta", "[Location]", 16, 23),
+    ]
+    assert placeholder("Name", 1) == "[Name]" and placeholder("Name", 3) == "[Name_3]"
+
+
+def test_overlapping_spans_keep_the_first():
+    text = "Budi Santoso"
+    masked, mapping = mask_spans(text, spans((5, 12, "Name"), (0, 12, "Name"), (0, 4, "Nickname")))
+    # Same start: the longer span wins; the spans inside it are skipped
+    assert masked == "[Name]"
+    assert [m["original"] for m in mapping] == ["Budi Santoso"]
+
+
+def test_adjacent_spans_are_both_masked():
+    masked, mapping = mask_spans("BudiSantoso", spans((0, 4, "Name"), (4, 11, "Name")))
+    assert masked == "[Name][Name_2]"
+    assert len(mapping) == 2
+
+
+def test_counts_carry_on_across_texts():
+    counts = {}
+    first, _ = mask_spans("Budi", spans((0, 4, "Name")), counts)
+    second, _ = mask_spans("Ani", spans((0, 3, "Name")), counts)
+    assert (first, second) == ("[Name]", "[Name_2]")
+
+
+def test_substitute_spans_skips_invalid_spans():
+    text, applied = substitute_spans("abcdef", [(1, 3, "X"), (2, 4, "Y"), (5, 9, "Z")])
+    assert text == "aXdef"
+    assert applied == [(1, 3, "X")]
+
+
+def test_round_trip():
+    text = "Nama saya Budi, HP 0812. Budi tinggal di Jakarta 😀 dengan Ani."
+    found = [("Budi", "Name"), ("0812", "Phone_Number"), ("Jakarta", "Location"), ("Ani", "Name")]
+    items = [(text.index(word), text.index(word) + len(word), label) for word, label in found]
+    items.append((text.rindex("Budi"), text.rindex("Budi") + 4, "Name"))
+
+    masked, mapping = mask_spans(text, spans(*items))
+    assert "Budi" not in masked and "[Name_3]" in masked
+    unmasked, replacements = unmask_text(masked, mapping)
+    assert unmasked == text
+    assert replacements == len(mapping) == 5
+
+
+def test_prefix_placeholders_take_the_longest_match():
+    mapping = [{"original": "Budi", "masked": "[Name]"}, {"original": "Ani", "masked": "[Name_2]"},
+               {"original": "Siti", "masked": "[Name_22]"}]
+    assert unmask_text("[Name_22] [Name_2] [Name]", mapping) == ("Siti Ani Budi", 3)
+
+
+def test_placeholder_text_already_in_the_input():
+    # "[Name]" and "[Name_2]" are part of the original document, so masking skips them
+    text = "Tulis [Name] atau [Name_2] di sini, Budi"
+    masked, mapping = mask_spans(text, spans((36, 40, "Name")))
+    assert masked == "Tulis [Name] atau [Name_2] di sini, [Name_3]"
+    assert unmask_text(masked, mapping) == (text, 1)
+
+
+def test_empty_mapping():
+    assert unmask_text("[Name] tetap", []) == ("[Name] tetap", 0)
+    assert mask_spans("teks", []) == ("teks", [])
+
+
+def test_first_original_of_a_repeated_placeholder_wins():
+    mapping = [{"original": "Budi", "masked": "[Name]"}, {"original": "Ani", "masked": "[Name]"}]
+    assert unmask_text("[Name]", mapping) == ("Budi", 1)
+
+
+def test_short_placeholders_match_whole_words_only():
+    mapping = [{"original": "Budi", "masked": "X1"}]
+    assert unmask_text("X1 AX1 X1B X1.", mapping) == ("Budi AX1 X1B Budi.", 2)
+
+
+def test_unmasker_finds_overlapping_patterns_leftmost_longest():
+    unmasker = Unmasker([{"original": "1", "masked": "abc"}, {"original": "2", "masked": "bcd"}, {"original": "3", "masked": "abcd"}])
+    assert unmasker.unmask("xabcdx") == ("x3x", 1)
+    assert unmasker.unmask("abcbcd") == ("12", 2)
@@ -0,0 +1,116 @@
+"""
+Accuracy parity between the PyTorch models and their ONNX Runtime exports
+(ANONYMASK_ENGINE=onnx / onnx-int8). Both models are exported into a temporary
+folder, and on the example documents the tests compare:
+  - explicit: token labels (argmax of the logits) and the final entities
+  - implicit: the topics above the confidence threshold, per sentence
+Skipped when onnx / onnxruntime are not installed (requirements-onnx.txt) or the
+models cannot be loaded.
+"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+import onnx_engine
+from explicit_model import model as explicit
+from implicit_model import model as implicit
+from tokenization import special_tokens
+
+EXAMPLE_DIR = Path(__file__).resolve().parents[3] / "ExampleFile" / "original_document"
+FALLBACK_SAMPLE = "Nama saya Budi Santoso, tinggal di Jl. Merdeka No. 10 Jakarta. Nomor HP saya 081234567890."
+
+# Required agreement of the token / topic labels with PyTorch, per engine
+REQUIRED_AGREEMENT = {"onnx": 1.0, "onnx-int8": 0.98}
+
+
+def sample_texts():
+    texts = [p.read_text(encoding="utf-8") for p in sorted(EXAMPLE_DIR.glob("*.txt"))]
+    return texts or [FALLBACK_SAMPLE]
+
+
+def explicit_outputs(texts):
+    labels, entities = [], []
+    prefix, suffix = special_tokens(explicit.tokenizer)
+    for text in texts:
+        tokens, windows = explicit.tokenize_windows(text)
+        for ids in explicit.window_input_ids(tokens, windows):
+            input_ids = np.concatenate((prefix, ids, suffix)).astype(np.int64)[None, :]
+            labels.append(np.argmax(explicit.forward_logits(input_ids, np.ones_like(input_ids))[0], axis=-1))
+        entities.append(explicit.predict_explicit_pii(text))
+    return labels, entities
+
+
+def implicit_outputs(texts):
+    labels, topics = [], []
+    for text in texts:
+        sentences = [sentence for sentence, _, _ in implicit.split_sentences(text)]
+        if sentences:
+            labels.append(implicit.score_sentences(sentences) > implicit.CONFIDENCE_THRESHOLD)
+        topics.append([
+            (r["start"], sorted(t["topic"] for t in r["predicted_topics"]))
+            for r in implicit.predict_implicit_pii(text)
+        ])
+    return labels, topics
+
+
+def agreement(reference, candidate):
+    return float(np.mean(np.concatenate([(a == b).ravel() for a, b in zip(reference, candidate)])))
+
+
+@pytest.fixture(scope="module")
+def engines(tmp_path_factory):
+    """Exports both models into a temporary folder and yields the PyTorch outputs."""
+    if not (explicit.loader.ensure_loaded() and implicit.loader.ensure_loaded()):
+        pytest.skip("the models could not be loaded")
+
+    onnx_dirs = (explicit.ONNX_DIR, implicit.ONNX_DIR)
+    explicit.ONNX_DIR = tmp_path_factory.mktemp("explicit_onnx")
+    implicit.ONNX_DIR = tmp_path_factory.mktemp("implicit_onnx")
+    for onnx_dir, model, tokenizer in (
+        (explicit.ONNX_DIR, explicit.model, explicit.tokenizer),
+        (implicit.ONNX_DIR, implicit.implicit_model, implicit.implicit_tokenizer),
+    ):
+        fp32_path = onnx_engine.export_onnx(model, tokenizer, onnx_engine.onnx_path(onnx_dir, "onnx"))
+        onnx_engine.quantize_onnx(fp32_path, onnx_engine.onnx_path(onnx_dir, "onnx-int8"))
+
+    texts = sample_texts()
+    explicit.use_engine("torch")
+    implicit.use_engine("torch")
+    yield texts, explicit_outputs(texts), implicit_outputs(texts)
+
+    explicit.use_engine("torch")
+    implicit.use_engine("torch")
+    explicit.ONNX_DIR, implicit.ONNX_DIR = onnx_dirs
+
+
+@pytest.mark.parametrize("engine", ["onnx", "onnx-int8"])
+def test_explicit_parity(engines, engine):
+    texts, (reference_labels, reference_entities), _ = engines
+    assert explicit.use_engine(engine)
+    try:
+        labels, entities = explicit_outputs(texts)
+    finally:
+        explicit.use_engine("torch")
+
+    assert agreement(reference_labels, labels) >= REQUIRED_AGREEMENT[engine]
+    if engine == "onnx":
+        assert entities == reference_entities
+
+
+@pytest.mark.parametrize("engine", ["onnx", "onnx-int8"])
+def test_implicit_parity(engines, engine):
+    texts, _, (reference_labels, reference_topics) = engines
+    assert implicit.use_engine(engine)
+    try:
+        labels, topics = implicit_outputs(texts)
+    finally:
+        implicit.use_engine("torch")
+
+    if reference_labels:
+        assert agreement(reference_labels, labels) >= REQUIRED_AGREEMENT[engine]
+    if engine == "onnx":
+        assert topics == reference_topics
@@ -0,0 +1,94 @@
+from prediction_cache import PredictionCache, cache_key
+
+
+def test_evicts_least_recently_used_by_count():
+    cache = PredictionCache(max_entries=2)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    assert cache.get("a") == [1]  # "b" is now the least recently used
+    cache.put("c", [3])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [1]
+    assert cache.get("c") == [3]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_evicts_by_bytes():
+    cache = PredictionCache(max_entries=100, max_bytes=40)
+    for key in "abcd":
+        cache.put(key, ["x" * 10])  # 16 bytes of JSON each
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 40
+    assert stats["entries"] == 2
+    assert cache.get("a") is None
+    assert cache.get("d") == ["x" * 10]
+
+
+def test_result_larger_than_the_cache_is_not_stored():
+    cache = PredictionCache(max_bytes=10)
+    cache.put("a", ["x" * 100])
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_hits_are_copies():
+    cache = PredictionCache()
+    cache.put("a", [{"start": 0}])
+    cache.get("a")[0]["start"] = 5
+    assert cache.get("a") == [{"start": 0}]
+
+
+def test_model_identity_separates_keys():
+    cache = PredictionCache()
+    calls = []
+
+    def compute(result):
+        calls.append(result)
+        return result
+
+    assert cache.get_or_compute("model|v1", "text", lambda: compute(["v1"])) == ["v1"]
+    assert cache.get_or_compute("model|v2", "text", lambda: compute(["v2"])) == ["v2"]
+    assert cache.get_or_compute("model|v1", "text", lambda: compute(["again"])) == ["v1"]
+    assert calls == [["v1"], ["v2"]]
+    assert cache_key("model|v1", "text") != cache_key("model|v2", "text")
+
+
+def test_no_model_identity_bypasses_the_cache():
+    cache = PredictionCache()
+    assert cache.get_or_compute(None, "text", lambda: [1]) == [1]
+    assert cache.get_or_compute(None, "text", lambda: [2]) == [2]
+    assert cache.stats()["entries"] == 0
+
+
+def test_get_or_compute_many_computes_only_the_missing_texts():
+    cache = PredictionCache()
+    cache.get_or_compute("model", "b", lambda: ["B"])
+    computed = []
+
+    def compute_many(texts):
+        computed.append(list(texts))
+        return [[text.upper()] for text in texts]
+
+    assert cache.get_or_compute_many("model", ["a", "b", "c"], compute_many) == [["A"], ["B"], ["C"]]
+    assert computed == [["a", "c"]]
+    assert cache.get_or_compute_many("model", ["c", "a"], compute_many) == [["C"], ["A"]]
+    assert len(computed) == 1
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    PredictionCache(disk_dir=tmp_path).put("a" * 64, [1])
+
+    restarted = PredictionCache(disk_dir=tmp_path)
+    assert restarted.get("a" * 64) == [1]
+    assert restarted.stats()["disk_hits"] == 1
+    assert restarted.get("a" * 64) == [1]
+    assert restarted.stats()["hits"] == 1  # Promoted to memory
+
+
+def test_disk_tier_is_pruned(tmp_path):
+    cache = PredictionCache(disk_dir=tmp_path, max_disk_entries=10)
+    for index in range(64):  # Pruning runs every 64 writes
+        cache.put(cache_key("model", str(index)), [index])
+    assert len(list(tmp_path.glob("*/*.json"))) == 10
@@ -0,0 +1,73 @@
+import random
+
+import regex
+
+from implicit_model import segmenter
+from implicit_model.segmenter import Segmenter, default_segmenter
+
+# The splitter the segmenter replaced (implicit_model/model.py before the segmenter module)
+LEGACY_SPLIT_REGEX = r'(?<!\b(Jl|No|Bpk|Ibu|Dr|Prof|H))\.\s+|(?<=[?!])\s+|\s*[\r\n]+\s*'
+
+
+def legacy_sentences(text):
+    return [s.strip() for s in regex.split(LEGACY_SPLIT_REGEX, text) if s and s.strip()]
+
+
+def sentences(text, split=default_segmenter):
+    spans = split.split(text)
+    for sentence, start, end in spans:
+        assert text[start:end] == sentence
+    return [sentence for sentence, _, _ in spans]
+
+
+def test_abbreviations_do_not_end_a_sentence():
+    # The period that ends a sentence is part of the separator, as it was for the legacy splitter
+    text = "Dr. Budi tinggal di Jl. Merdeka No. 10 Jakarta. Bpk. Ani dan Ibu. Siti datang bersama H. Rahmat. Selesai."
+    assert sentences(text) == [
+        "Dr. Budi tinggal di Jl. Merdeka No. 10 Jakarta",
+        "Bpk. Ani dan Ibu. Siti datang bersama H. Rahmat",
+        "Selesai.",
+    ]
+
+
+def test_abbreviation_must_be_a_whole_word():
+    assert sentences("Kasino. Halo. Dia pulang.") == ["Kasino", "Halo", "Dia pulang."]
+
+
+def test_question_and_exclamation_marks():
+    assert sentences("Apa kabar? Baik sekali! Terima kasih.") == ["Apa kabar?", "Baik sekali!", "Terima kasih."]  # "?" and "!" stay
+    assert sentences("Apa?!Tidak mungkin") == ["Apa?!Tidak mungkin"]  # No whitespace, no break
+
+
+def test_line_breaks_crlf_and_blank_lines():
+    text = "  Baris satu  \r\nBaris dua\r\n\r\n\r\n\tBaris tiga\n\nBaris empat tanpa titik  "
+    assert sentences(text) == ["Baris satu", "Baris dua", "Baris tiga", "Baris empat tanpa titik"]
+
+
+def test_no_sentences():
+    assert sentences("") == []
+    assert sentences(" \r\n\n\t ") == []
+
+
+def test_offsets_point_at_the_sentences():
+    text = "Nama saya Budi 😀. Saya sakit!  \r\n. \nHP 0812?"
+    spans = default_segmenter.split(text)
+    assert [sentence for sentence, _, _ in spans] == ["Nama saya Budi 😀", "Saya sakit!", "HP 0812?"]
+    assert all(text[start:end] == sentence for sentence, start, end in spans)
+    assert [start for _, start, _ in spans] == sorted(start for _, start, _ in spans)
+
+
+def test_custom_abbreviations(monkeypatch):
+    assert sentences("Tn. Budi datang.", Segmenter(("Tn",))) == ["Tn. Budi datang."]
+    assert sentences("Dr. Budi datang.", Segmenter(())) == ["Dr", "Budi datang."]
+
+    monkeypatch.setenv("ANONYMASK_SENTENCE_ABBREVIATIONS", "Tn, Ny")
+    assert segmenter.configured_abbreviations()[-2:] == ("Tn", "Ny")
+
+
+def test_same_sentences_as_the_legacy_splitter():
+    rng = random.Random("segmenter")
+    pieces = ["Budi", "Jl.", "No.", "Dr.", "H.", "Halo.", "kata", "?", "!", ".", " ", " ", "  ", "\n", "\r\n", "\n\n", "\t", "😀"]
+    for _ in range(500):
+        text = "".join(rng.choice(pieces) + rng.choice(["", " "]) for _ in range(rng.randint(0, 40)))
+        assert sentences(text) == legacy_sentences(text), repr(text)
@@ -0,0 +1,52 @@
+import numpy as np
+
+from implicit_model.sentence_cache import SentenceScoreCache
+
+
+def scorer(calls):
+    def score_missing(sentences):
+        calls.append(list(sentences))
+        return [[float(len(sentence))] for sentence in sentences]
+    return score_missing
+
+
+def test_scores_every_distinct_sentence_once():
+    cache = SentenceScoreCache()
+    calls = []
+    stats = {}
+    rows = cache.score(["Halo dunia.", "Apa kabar?", "Halo  dunia."], scorer(calls), stats=stats)
+
+    assert calls == [["Halo dunia.", "Apa kabar?"]]  # Whitespace runs are normalized
+    np.testing.assert_array_equal(rows, [[11.0], [10.0], [11.0]])
+    assert stats == {"sentences": 3, "cache_hits": 0, "scored": 2, "hit_rate": 0.0}
+
+    stats = {}
+    cache.score(["Apa kabar?"], scorer(calls), stats=stats)
+    assert len(calls) == 1
+    assert stats["cache_hits"] == 1
+
+
+def test_evicts_least_recently_used():
+    cache = SentenceScoreCache(max_entries=2)
+    calls = []
+    cache.score(["a", "b"], scorer(calls))
+    cache.score(["a"], scorer(calls))  # "b" is now the least recently used
+    cache.score(["c"], scorer(calls))
+    assert len(cache) == 2
+
+    cache.score(["a", "b"], scorer(calls))
+    assert calls[-1] == ["b"]
+
+
+def test_no_sentences():
+    assert SentenceScoreCache().score([], scorer([])).shape == (0, 0)
+
+
+def test_engine_switch_clears_the_cache():
+    # Cached rows belong to the engine that produced them
+    from implicit_model import model as implicit
+
+    implicit.sentence_cache.score(["Saya sakit."], scorer([]))
+    assert len(implicit.sentence_cache) > 0
+    implicit.use_engine("torch")
+    assert len(implicit.sentence_cache) == 0
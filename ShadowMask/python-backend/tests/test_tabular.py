@@ -0,0 +1,146 @@
+"""
+Cell-by-cell detection for spreadsheets (tabular.py and /predictTable). The
+endpoint tests replace the models with a fake detector, so they only need the
+models to load for their label tables.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import tabular
+
+
+def fake_entities(cell):
+    """A stand-in explicit result: every word starting with a capital is a Name."""
+    entities = []
+    position = 0
+    for word in cell.split():
+        start = cell.index(word, position)
+        position = start + len(word)
+        if word[0].isupper():
+            entities.append({"word": word, "label": "Name", "start": start, "end": position})
+    return entities
+
+
+# --- tabular.py ---
+
+def test_distinct_values_skip_blank_cells_hinted_columns_and_repeats():
+    columns = [["Budi", None, "", "  ", "Ani", "Budi"], ["0812", "Budi"], ["Siti", "Joko"]]
+    assert tabular.distinct_values(columns, [None, None, "Phone_Number"]) == ["Budi", "Ani", "0812"]
+    assert tabular.distinct_values(columns, ["none", "none", "Name"]) == []
+
+
+def test_hinted_cells():
+    assert tabular.hinted_entities("  0812 345 ", "Phone_Number") == [
+        {"word": "0812 345", "label": "Phone_Number", "start": 2, "end": 10}
+    ]
+    assert tabular.hinted_sentences(" Sakit flu.", "Med_Hist") == [
+        {"sentence": "Sakit flu.", "predicted_topics": [{"topic": "Med_Hist", "score": 1.0}], "start": 1, "end": 11}
+    ]
+    for cell in [None, "", " \t"]:
+        assert tabular.hinted_entities(cell, "Phone_Number") == []
+        assert tabular.hinted_sentences(cell, "Med_Hist") == []
+    assert tabular.hinted_entities("Budi", tabular.NO_PII_HINT) == []
+    assert tabular.hinted_sentences("Budi", tabular.NO_PII_HINT) == []
+
+
+def test_broadcast_gives_every_repeat_the_result_of_its_value():
+    columns = [["Budi", "Ani", "", "Budi"], ["0812", "Budi"]]
+    hints = [None, "Phone_Number"]
+    values = tabular.distinct_values(columns, hints)
+    results = [fake_entities(value) for value in values]
+
+    cell_results = tabular.broadcast(columns, hints, values, results, tabular.hinted_entities)
+
+    assert cell_results[0] == [results[0], results[1], [], results[0]]
+    assert cell_results[1] == [tabular.hinted_entities("0812", "Phone_Number"), tabular.hinted_entities("Budi", "Phone_Number")]
+
+
+def test_mask_columns_numbers_across_the_table():
+    columns = [["Budi Santoso", "", "Ani dan Budi"], ["  0812  ", "[Name_4] Joko"]]
+    cell_spans = [
+        [[{"start": 0, "end": 12, "label": "Name"}], [], [{"start": 0, "end": 3, "label": "Name"}, {"start": 8, "end": 12, "label": "Name"}]],
+        [[{"start": 2, "end": 6, "label": "Phone_Number"}], [{"start": 9, "end": 13, "label": "Name"}]],
+    ]
+
+    masked_columns, mapping = tabular.mask_columns(columns, cell_spans)
+
+    # Numbered as /mask numbers a document; a placeholder already in a cell is skipped
+    assert masked_columns == [["[Name]", "", "[Name_2] dan [Name_3]"], ["  [Phone_Number]  ", "[Name_4] [Name_5]"]]
+    assert [(entry["column"], entry["row"], entry["masked"]) for entry in mapping] == [
+        (0, 0, "[Name]"), (0, 2, "[Name_2]"), (0, 2, "[Name_3]"), (1, 0, "[Phone_Number]"), (1, 1, "[Name_5]"),
+    ]
+    for entry in mapping:
+        cell = columns[entry["column"]][entry["row"]]
+        assert cell[entry["start"]:entry["end"]] == entry["original"]
+
+    # The offsets index the original cell; every placeholder sits where its span was, shifted by the earlier replacements
+    for column_index, cells in enumerate(columns):
+        for row, cell in enumerate(cells):
+            entries = [entry for entry in mapping if (entry["column"], entry["row"]) == (column_index, row)]
+            shift = 0
+            for entry in entries:
+                start = entry["start"] + shift
+                assert masked_columns[column_index][row][start:start + len(entry["masked"])] == entry["masked"]
+                shift += len(entry["masked"]) - (entry["end"] - entry["start"])
+
+
+# --- /predictTable ---
+
+@pytest.fixture
+def client(monkeypatch):
+    classified = []
+
+    def cached_many(name, texts):
+        classified.append(list(texts))
+        return [fake_entities(text) if name == "explicit" else [] for text in texts]
+
+    monkeypatch.setattr(main, "cached_many", cached_many)
+    client = TestClient(main.app)
+    client.classified = classified
+    return client
+
+
+def post_table(client, columns, **options):
+    response = client.post("/predictTable", json={"columns": columns, "models": "explicit", **options})
+    if response.status_code == 503:
+        pytest.skip("the explicit model could not be loaded")
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_predict_table(client):
+    body = post_table(client, [
+        {"name": "name", "cells": ["Budi Santoso", None, " ", "Budi Santoso", "ani"]},
+        {"name": "phone", "cells": ["0812", None, "0813"], "hint": "Phone_Number"},
+        {"name": "status", "cells": ["Aktif", "Aktif"], "hint": "none"},
+    ])
+
+    # Hinted columns never reach the model, repeated values are classified once
+    assert client.classified == [["Budi Santoso", "ani"]]
+    name, phone, status = [column["explicit"] for column in body["columns"]]
+    assert name == [fake_entities("Budi Santoso"), [], [], fake_entities("Budi Santoso"), []]
+    assert phone == [tabular.hinted_entities("0812", "Phone_Number"), [], tabular.hinted_entities("0813", "Phone_Number")]
+    assert status == [[], []]
+    assert body["stats"] == {"cells": 7, "hinted_cells": 4, "classified_values": 2}
+
+
+def test_predict_table_mask(client):
+    cells = ["Budi Santoso", None, "Budi Santoso", "Joko [Name_5]"]
+    body = post_table(client, [
+        {"name": "name", "cells": cells},
+        {"name": "phone", "cells": ["0812", ""], "hint": "Phone_Number"},
+    ], mask="explicit")
+
+    assert body["columns"][0]["masked"] == ["[Name] [Name_2]", "", "[Name_3] [Name_4]", "[Name_6] [Name_5]"]
+    assert body["columns"][1]["masked"] == ["[Phone_Number]", ""]
+    for entry in body["mapping"]:
+        cell = (cells if entry["column"] == 0 else ["0812", ""])[entry["row"]]
+        assert cell[entry["start"]:entry["end"]] == entry["original"]
+
+
+def test_predict_table_rejects_unknown_hints_and_masking_without_the_model(client):
+    response = client.post("/predictTable", json={"columns": [{"cells": ["x"], "hint": "Shoe_Size"}], "models": "explicit"})
+    assert response.status_code in (400, 503)
+    response = client.post("/predictTable", json={"columns": [{"cells": ["x"]}], "models": "explicit", "mask": "implicit"})
+    assert response.status_code == 400
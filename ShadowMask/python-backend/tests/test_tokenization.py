@@ -0,0 +1,85 @@
+"""
+Window layout of the explicit model: fixed and adaptive sliding windows, their keep
+ranges, and the fixed windows against the tokenizer's own overflowing windows.
+"""
+import pytest
+
+from tokenization import adaptive_window_bounds, special_tokens, tokenize_document, window_bounds
+
+TOKEN_COUNTS = [1, 2, 9, 10, 11, 29, 30, 31, 97, 98, 99, 126, 127, 128, 129, 300, 511, 512, 513, 1000]
+LAYOUTS = [(10, 0), (10, 3), (10, 9), (32, 8), (126, 30), (510, 30), (510, 128)]
+
+
+def check_windows(windows, token_count, max_width):
+    assert windows, "no windows"
+    # The windows cover [0, token_count) in order, none wider than max_width
+    assert windows[0][0] == 0
+    assert windows[-1][1] == token_count
+    for (start, end, _, _), (next_start, next_end, _, _) in zip(windows, windows[1:]):
+        assert start < next_start <= end < next_end
+    assert all(0 < end - start <= max_width for start, end, _, _ in windows)
+
+    # The keep ranges tile [0, token_count): every token is kept by exactly one window, which sees it
+    assert windows[0][2] == 0
+    assert windows[-1][3] == token_count
+    for (_, _, _, keep_end), (_, _, next_keep_start, _) in zip(windows, windows[1:]):
+        assert keep_end == next_keep_start
+    for start, end, keep_start, keep_end in windows:
+        assert start <= keep_start < keep_end <= end
+
+
+@pytest.mark.parametrize("width, overlap", LAYOUTS)
+def test_fixed_windows(width, overlap):
+    for token_count in TOKEN_COUNTS:
+        windows = window_bounds(token_count, width, overlap)
+        check_windows(windows, token_count, width)
+        # Every window but the last is full and overlaps the next by `overlap` tokens
+        for (start, end, _, _), (next_start, _, _, _) in zip(windows, windows[1:]):
+            assert end - start == width
+            assert end - next_start == overlap
+        # The later window keeps the overlap
+        for (_, _, _, keep_end), (next_start, _, _, _) in zip(windows, windows[1:]):
+            assert keep_end == next_start
+
+
+@pytest.mark.parametrize("max_width, overlap", LAYOUTS)
+def test_adaptive_windows(max_width, overlap):
+    for token_count in TOKEN_COUNTS:
+        windows = adaptive_window_bounds(token_count, max_width, overlap)
+        check_windows(windows, token_count, max_width)
+        if token_count <= max_width:
+            assert windows == [(0, token_count, 0, token_count)]
+            continue
+        # The fewest windows for the overlap, of equal width up to a rounded-off last one
+        assert len(windows) == -(-(token_count - overlap) // (max_width - overlap))
+        widths = [end - start for start, end, _, _ in windows]
+        assert max(widths) - min(widths) <= len(windows)
+
+
+def test_no_tokens():
+    assert window_bounds(0, 10, 3) == []
+    assert adaptive_window_bounds(0, 10, 3) == []
+
+
+@pytest.fixture(scope="module")
+def explicit():
+    from explicit_model import model as explicit
+
+    if not explicit.loader.ensure_loaded():
+        pytest.skip("the explicit model could not be loaded")
+    return explicit
+
+
+@pytest.mark.parametrize("lines", [1, 12, 40, 95])
+def test_fixed_windows_match_tokenizer_overflow(explicit, lines):
+    tokenizer = explicit.tokenizer
+    text = " ".join(f"Baris {line}: Nama saya Budi Santoso 😀 di Jl. Merdeka No. {line}, HP 0812{line:04d}." for line in range(lines))
+    encoded = tokenizer(
+        text, truncation=True, max_length=explicit.MAX_LENGTH, stride=explicit.OVERLAP, return_overflowing_tokens=True,
+    )
+    prefix, suffix = special_tokens(tokenizer)
+    expected = [ids[len(prefix):len(ids) - len(suffix)] for ids in encoded["input_ids"]]
+
+    tokens = tokenize_document(tokenizer, text)
+    windows = window_bounds(len(tokens), explicit.MAX_LENGTH - len(prefix) - len(suffix), explicit.OVERLAP)
+    assert [tokens.ids[start:end].tolist() for start, end, _, _ in windows] == expected
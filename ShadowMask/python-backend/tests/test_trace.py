@@ -0,0 +1,14 @@
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_trace_keeps_the_response_headers():
+    client = TestClient(main.app)
+    response = client.get("/health?profile=1", headers={"Origin": "http://localhost:4200"})
+
+    assert response.status_code == 200
+    assert "trace" in response.json()
+    assert response.headers["access-control-allow-origin"]
+    assert response.headers["content-type"].startswith("application/json")
+    assert int(response.headers["content-length"]) == len(response.content)
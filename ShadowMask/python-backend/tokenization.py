@@ -0,0 +1,186 @@
+"""
+Shared tokenization stage of both models.
+
+A document is tokenized once, without special tokens, into two contiguous
+arrays: the token ids and the (start, end) character offsets of every token.
+The explicit model's sliding windows are token ranges over those arrays and
+read them through views, so the tokens two windows share are never
+copied. The special tokens (<s> ... </s>) are added while a window is copied
+into its padded batch.
+
+When both models use the same tokenizer, the implicit model takes the tokens of
+every sentence from the same arrays instead of tokenizing its sentences again.
+"""
+import hashlib
+import threading
+
+import numpy as np
+
+# Per tokenizer object: (tokenizer, value). The tokenizer is kept so its id() stays valid.
+_special_tokens = {}
+_fingerprints = {}
+
+
+def special_tokens(tokenizer):
+    """
+    The special token ids the tokenizer puts (before, after) a single sequence,
+    found by tokenizing a one-character text with and without them.
+    """
+    entry = _special_tokens.get(id(tokenizer))
+    if entry is None or entry[0] is not tokenizer:
+        with_special = tokenizer("a")["input_ids"]
+        plain = tokenizer("a", add_special_tokens=False)["input_ids"]
+        position = next(i for i in range(len(with_special)) if with_special[i:i + len(plain)] == plain)
+        entry = (tokenizer, (list(with_special[:position]), list(with_special[position + len(plain):])))
+        _special_tokens[id(tokenizer)] = entry
+    return entry[1]
+
+
+def fingerprint(tokenizer):
+    """Identifies the vocabulary and rules of a tokenizer: equal fingerprints tokenize text the same way."""
+    entry = _fingerprints.get(id(tokenizer))
+    if entry is None or entry[0] is not tokenizer:
+        backend = getattr(tokenizer, "backend_tokenizer", None)
+        if backend is not None:
+            value = hashlib.sha256(backend.to_str().encode("utf-8")).hexdigest()
+        else:
+            value = f"{type(tokenizer).__name__}|{getattr(tokenizer, 'name_or_path', id(tokenizer))}"
+        entry = (tokenizer, value)
+        _fingerprints[id(tokenizer)] = entry
+    return entry[1]
+
+
+def window_bounds(token_count, width, overlap):
+    """
+    Fixed sliding windows over `token_count` tokens: `width` tokens per window and
+    `overlap` tokens shared between neighbours, the same windows the tokenizer's
+    return_overflowing_tokens/stride produces. A token seen by two windows keeps
+    the prediction of the later one. See keep_ranges for the returned tuples.
+    """
+    if token_count == 0:
+        return []
+    step = max(1, width - overlap)
+    bounds = []
+    start = 0
+    while True:
+        end = min(start + width, token_count)
+        bounds.append((start, end))
+        if end == token_count:
+            return keep_ranges(bounds, central=False)
+        start += step
+
+
+def adaptive_window_bounds(token_count, max_width, overlap):
+    """
+    Sliding windows sized to the document. A document of up to `max_width` tokens
+    is one window with no overlap. A longer one gets the fewest windows of at most
+    `max_width` tokens that overlap by `overlap`, all of the same length, so the
+    last window is not a short leftover padded up to a full one. A token seen by
+    two windows keeps the prediction of the one where it is most central.
+    """
+    if token_count == 0:
+        return []
+    if token_count <= max_width:
+        return keep_ranges([(0, token_count)], central=True)
+    overlap = min(overlap, max_width - 1)
+    count = -(-(token_count - overlap) // (max_width - overlap))
+    width = -(-(token_count + (count - 1) * overlap) // count)
+    step = width - overlap
+    bounds = [(index * step, min(index * step + width, token_count)) for index in range(count)]
+    return keep_ranges(bounds, central=True)
+
+
+def keep_ranges(bounds, central=True):
+    """
+    Adds to every (start, end) window the token range whose predictions it keeps:
+    (start, end, keep_start, keep_end). Neighbouring windows split their overlap in
+    the middle when `central`, otherwise the later window keeps all of it.
+    """
+    cuts = []
+    for (_, end), (next_start, _) in zip(bounds, bounds[1:]):
+        cut = (next_start + end) // 2 if central else next_start
+        cuts.append(min(max(cut, next_start), end))
+    keep_starts = [bounds[0][0]] + cuts
+    keep_ends = cuts + [bounds[-1][1]]
+    return [(start, end, keep_start, keep_end) for (start, end), keep_start, keep_end in zip(bounds, keep_starts, keep_ends)]
+
+
+class DocumentTokens:
+    """
+    One tokenization of a document: `ids` (int64, N) and `offsets` (int64, N x 2)
+    without special tokens, and the fingerprint of the tokenizer that made them.
+    """
+
+    def __init__(self, ids, offsets, tokenizer_fingerprint):
+        self.ids = ids
+        self.offsets = offsets
+        self.fingerprint = tokenizer_fingerprint
+
+    def __len__(self):
+        return len(self.ids)
+
+    def sentence_ids(self, spans):
+        """
+        Token ids of every (sentence, start, end) span, as views into `ids`. None for
+        a sentence whose first or last token reaches over its boundary, which has to
+        be tokenized on its own.
+        """
+        if not spans:
+            return []
+        starts, ends = self.offsets[:, 0], self.offsets[:, 1]
+        span_starts = np.fromiter((start for _, start, _ in spans), dtype=np.int64, count=len(spans))
+        span_ends = np.fromiter((end for _, _, end in spans), dtype=np.int64, count=len(spans))
+        first = np.searchsorted(starts, span_starts, side="left")
+        last = np.searchsorted(starts, span_ends, side="left")
+
+        # The token before the sentence must end before it, the last token must end inside it
+        clean = last > first
+        before = first - 1
+        clean &= (before < 0) | (ends[np.maximum(before, 0)] <= span_starts)
+        clean &= ends[np.maximum(last - 1, 0)] <= span_ends
+        return [self.ids[a:b] if ok else None for a, b, ok in zip(first.tolist(), last.tolist(), clean.tolist())]
+
+
+def tokenize_documents(tokenizer, texts):
+    """Tokenizes all texts in one call of the fast tokenizer and returns a DocumentTokens per text."""
+    texts = list(texts)
+    if not texts:
+        return []
+    encoded = tokenizer(texts, add_special_tokens=False, return_offsets_mapping=True)
+    tokenizer_fingerprint = fingerprint(tokenizer)
+    documents = []
+    for ids, offsets in zip(encoded["input_ids"], encoded["offset_mapping"]):
+        documents.append(DocumentTokens(
+            np.asarray(ids, dtype=np.int64),
+            np.asarray(offsets, dtype=np.int64).reshape(-1, 2),
+            tokenizer_fingerprint,
+        ))
+    return documents
+
+
+def tokenize_document(tokenizer, text):
+    return tokenize_documents(tokenizer, [text])[0]
+
+
+class SharedTokens:
+    """
+    The tokens of one document, tokenized on first use by whichever model asks
+    first. /predict hands the same instance to both models. `get_tokenizer`
+    returns the tokenizer to use, or None while it is not loaded.
+    """
+
+    def __init__(self, text, get_tokenizer):
+        self.text = text
+        self.get_tokenizer = get_tokenizer
+        self._tokens = None
+        self._lock = threading.Lock()
+
+    def fingerprint(self):
+        tokenizer = self.get_tokenizer()
+        return fingerprint(tokenizer) if tokenizer is not None else None
+
+    def get(self):
+        with self._lock:
+            if self._tokens is None:
+                self._tokens = tokenize_document(self.get_tokenizer(), self.text)
+            return self._tokens
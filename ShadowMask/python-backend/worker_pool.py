@@ -0,0 +1,193 @@
+"""
+Multi-process model serving. One interpreter can only keep about one core busy
+with the Python parts of a prediction (tokenizing, decoding, grouping), so with
+ANONYMASK_PROCESS_WORKERS=N (N > 1) the /predictExplicit, /predictImplicit and
+/predict requests are executed by N worker processes instead.
+
+The models are loaded once, in the server process, and their weights are moved
+to shared memory (torch `share_memory()`). The workers receive the models through
+torch.multiprocessing, which hands over the shared memory rather than the data,
+so an extra worker costs its interpreter and activations, not a copy of the weights.
+Every request goes to the worker with the fewest requests in flight.
+"""
+import itertools
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+import torch
+import torch.multiprocessing as multiprocessing
+
+PROCESS_WORKERS = int(os.environ.get("ANONYMASK_PROCESS_WORKERS", "1"))
+
+
+def _worker_main(index, states, requests, results, torch_threads):
+    """Entry point of a worker process: installs the shared models and serves requests until it gets None."""
+    torch.set_num_threads(torch_threads)
+    from explicit_model import model as explicit
+    from implicit_model import model as implicit
+
+    explicit.install_shared_state(states["explicit"])
+    implicit.install_shared_state(states["implicit"])
+    handlers = {"explicit": explicit.predict_explicit_pii, "implicit": implicit.predict_implicit_pii}
+    results.put((index, None, "ready", None))
+
+    while True:
+        message = requests.get()
+        if message is None:
+            return
+        request_id, kind, text = message
+        try:
+            results.put((index, request_id, "ok", handlers[kind](text)))
+        except Exception as e:
+            results.put((index, request_id, "error", f"{type(e).__name__}: {e}"))
+
+
+class WorkerPool:
+    """
+    Starts `num_workers` model-serving processes and routes prediction requests
+    to the least loaded one. Results come back through one queue that a
+    dispatcher thread hands to the waiting callers.
+    """
+
+    def __init__(self, num_workers, torch_threads=None):
+        self.num_workers = max(1, int(num_workers))
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.num_workers)
+
+        self._lock = threading.Lock()
+        self._started = False
+        self.error = None  # Set when the workers could not be started; the pool is not retried
+        self._processes = []
+        self._request_queues = []
+        self._in_flight = []  # Per worker: request id -> Future
+        self._completed = []
+        self._request_ids = itertools.count()
+        self._results = None
+
+    # --- Public API ---
+
+    def start(self, states):
+        """
+        Starts the workers with the model states from shared_state() and waits until
+        all of them are ready. Calling it again is a no-op.
+        """
+        with self._lock:
+            if self._started:
+                return
+            if self.error:
+                raise RuntimeError(self.error)
+            # spawn works the same on Linux, macOS and Windows, and avoids forking a process
+            # whose torch / OpenMP threads are already running
+            context = multiprocessing.get_context("spawn")
+            self._results = context.Queue()
+            for index in range(self.num_workers):
+                requests = context.Queue()
+                process = context.Process(
+                    target=_worker_main,
+                    args=(index, states, requests, self._results, self.torch_threads),
+                    name=f"anonymask-worker-{index}",
+                    daemon=True,
+                )
+                process.start()
+                self._processes.append(process)
+                self._request_queues.append(requests)
+                self._in_flight.append({})
+                self._completed.append(0)
+
+            waiting = set(range(self.num_workers))
+            while waiting:
+                try:
+                    index, _, status, _ = self._results.get(timeout=1.0)
+                except queue.Empty:
+                    dead = [i for i in waiting if not self._processes[i].is_alive()]
+                    if dead:
+                        self._terminate()
+                        self.error = f"Model worker {dead[0]} exited during startup"
+                        raise RuntimeError(self.error)
+                    continue
+                if status == "ready":
+                    waiting.discard(index)
+
+            threading.Thread(target=self._dispatch, name="worker-pool-dispatcher", daemon=True).start()
+            self._started = True
+            print(f"Started {self.num_workers} model worker processes ({self.torch_threads} torch threads each)")
+            logging.info(f"Started {self.num_workers} model worker processes ({self.torch_threads} torch threads each)")
+
+    @property
+    def started(self):
+        return self._started
+
+    def submit(self, kind, text):
+        """Sends one "explicit" or "implicit" prediction to the least loaded worker. Returns a Future."""
+        future = Future()
+        with self._lock:
+            alive = [i for i, process in enumerate(self._processes) if process.is_alive()]
+            if not alive:
+                raise RuntimeError("No model worker process is running")
+            index = min(alive, key=lambda i: len(self._in_flight[i]))
+            request_id = next(self._request_ids)
+            self._in_flight[index][request_id] = future
+        self._request_queues[index].put((request_id, kind, text))
+        return future
+
+    def run(self, kind, text):
+        return self.submit(kind, text).result()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": [
+                    {
+                        "pid": process.pid,
+                        "alive": process.is_alive(),
+                        "in_flight": len(in_flight),
+                        "completed": completed,
+                    }
+                    for process, in_flight, completed in zip(self._processes, self._in_flight, self._completed)
+                ],
+                "torch_threads": self.torch_threads,
+            }
+
+    def shutdown(self):
+        for requests in self._request_queues:
+            requests.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+
+    def _terminate(self):
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        self._processes, self._request_queues, self._in_flight, self._completed = [], [], [], []
+
+    # --- Dispatcher ---
+
+    def _dispatch(self):
+        while True:
+            try:
+                index, request_id, status, payload = self._results.get(timeout=1.0)
+            except queue.Empty:
+                self._fail_dead_workers()
+                continue
+
+            with self._lock:
+                future = self._in_flight[index].pop(request_id, None)
+                self._completed[index] += 1
+            if future is None:
+                continue
+            if status == "ok":
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(f"Worker {index} failed: {payload}"))
+
+    def _fail_dead_workers(self):
+        with self._lock:
+            for index, process in enumerate(self._processes):
+                if process.is_alive() or not self._in_flight[index]:
+                    continue
+                logging.error(f"Model worker {index} (pid {process.pid}) died with exit code {process.exitcode}")
+                for future in self._in_flight[index].values():
+                    future.set_exception(RuntimeError(f"Worker {index} died"))
+                self._in_flight[index].clear()
@@ -15,7 +15,7 @@ import * as XLSX from 'xlsx';
 import jsPDF from 'jspdf';
 import { Document, Packer, Paragraph } from 'docx';
 import { Observable } from 'rxjs';
-import { map } from 'rxjs/operators';
+import { map, toArray } from 'rxjs/operators';
 import { ApiService } from '../services/api';
 import { DomSanitizer, SafeHtml } from '@angular/platform-browser';
 
@@ -57,6 +57,13 @@ export class MaskingFile implements OnInit {
 
   replacementLog: { original: string; replaced: string }[] = [];
 
+  // Spans the backend detected while ingesting the upload (/ingest), per model, with offsets into
+  // originalContent; null when the content was extracted in the browser
+  ingestedSpans: Record<'explicit' | 'implicit', { start: number; end: number; label: string }[]> | null = null;
+
+  // Cells of the uploaded spreadsheet (null for other files), column by column per sheet
+  spreadsheet: { sheetName: string; headers: string[]; columns: string[][] }[] | null = null;
+
   randomizedPreview: Array<{ ori: string; type: string; result: string }> = [];
 
   allRandomizedPreview: Array<{ ori: string; type: string; result: string }> =
@@ -165,6 +172,8 @@ export class MaskingFile implements OnInit {
     this.fileName = file.name;
     const fileType = file.type;
     const reader = new FileReader();
+    this.spreadsheet = null;
+    this.ingestedSpans = null;
 
     // TXT
     if (fileType === supportedTypes[0]) {
@@ -175,8 +184,89 @@ export class MaskingFile implements OnInit {
       };
       reader.readAsText(file);
 
-      // PDF
-    } else if (fileType === supportedTypes[1]) {
+      // PDF / DOCX
+    } else if (fileType === supportedTypes[1] || fileType === supportedTypes[2]) {
+      this.ingestUpload(file, fileType);
+
+      // XLSX / XLS / CSV
+    } else if (
+      fileType === supportedTypes[3] ||
+      fileType === supportedTypes[4] ||
+      fileType === supportedTypes[5]
+    ) {
+      reader.onload = (e) => {
+        const data = new Uint8Array(reader.result as ArrayBuffer);
+        const workbook = XLSX.read(data, { type: 'array' });
+
+        this.spreadsheet = workbook.SheetNames.map((sheetName) => {
+          const worksheet = workbook.Sheets[sheetName];
+          const jsonData = XLSX.utils.sheet_to_json(worksheet, {
+            header: 1,
+          }) as any[][]; // array of arrays
+
+          const headers = jsonData.length > 0 ? jsonData[0] : [];
+          const rows = jsonData.slice(1);
+          return {
+            sheetName,
+            headers: headers.map((header: any) => `${header}`),
+            columns: headers.map((_: any, index: number) =>
+              rows
+                .map((row) => row[index])
+                .filter((v) => v !== undefined && v !== null)
+                .map((v) => `${v}`)
+            ),
+          };
+        });
+
+        this.originalContent = this.flattenSpreadsheet(this.spreadsheet);
+        this.processOriginalContent();
+      };
+      reader.readAsArrayBuffer(file);
+    } else {
+      alert('Unsupported file type. Please upload .txt, .pdf, or .docx');
+    }
+  }
+
+  // PDF and DOCX are extracted and detected by the backend page by page (/ingest), so parsing
+  // does not block the UI. The detected spans of both models are kept for masking. When the
+  // backend cannot extract the file (e.g. no PDF support installed), it is parsed here instead.
+  ingestUpload(file: File, fileType: string): void {
+    this.apiService.ingestDocument(file, 'both').pipe(toArray()).subscribe({
+      next: (lines) => {
+        const failure = lines.find((line) => line.error);
+        if (failure || !lines.some((line) => line.done)) {
+          console.warn('Backend extraction failed, parsing in the browser:', failure?.error);
+          this.extractInBrowser(file, fileType);
+          return;
+        }
+
+        const pages = lines.filter((line) => line.page !== undefined);
+        this.originalContent = pages.map((page) => page.text).join('\n');
+        this.ingestedSpans = {
+          explicit: pages.flatMap((page) =>
+            page.explicit.map((e: any) => ({ start: e.start, end: e.end, label: e.label }))
+          ),
+          implicit: pages.flatMap((page) =>
+            page.implicit.map((s: any) => ({
+              start: s.start,
+              end: s.end,
+              label: s.predicted_topics.map((t: any) => t.topic).join(', '),
+            }))
+          ),
+        };
+        this.processOriginalContent();
+      },
+      error: (err) => {
+        console.warn('Backend extraction failed, parsing in the browser:', err);
+        this.extractInBrowser(file, fileType);
+      },
+    });
+  }
+
+  // The former client-side extraction: pdf.js for PDF, mammoth for DOCX
+  extractInBrowser(file: File, fileType: string): void {
+    const reader = new FileReader();
+    if (fileType === 'application/pdf') {
       reader.onload = async () => {
         const typedArray = new Uint8Array(reader.result as ArrayBuffer);
         const pdf = await pdfjsLib.getDocument({ data: typedArray }).promise;
@@ -210,9 +300,7 @@ export class MaskingFile implements OnInit {
         this.processOriginalContent();
       };
       reader.readAsArrayBuffer(file);
-
-      // DOCX
-    } else if (fileType === supportedTypes[2]) {
+    } else {
       reader.onload = async () => {
         const result = await mammoth.extractRawText({
           arrayBuffer: reader.result as ArrayBuffer,
@@ -222,47 +310,6 @@ export class MaskingFile implements OnInit {
       };
 
       reader.readAsArrayBuffer(file);
-
-      // XLSX / XLS / CSV
-    } else if (
-      fileType === supportedTypes[3] ||
-      fileType === supportedTypes[4] ||
-      fileType === supportedTypes[5]
-    ) {
-      reader.onload = (e) => {
-        const data = new Uint8Array(reader.result as ArrayBuffer);
-        const workbook = XLSX.read(data, { type: 'array' });
-
-        let result = '';
-        workbook.SheetNames.forEach((sheetName) => {
-          const worksheet = workbook.Sheets[sheetName];
-          const jsonData = XLSX.utils.sheet_to_json(worksheet, {
-            header: 1,
-          }) as any[][]; // array of arrays
-
-          result += `Sheet: ${sheetName}\n`;
-
-          if (jsonData.length > 0) {
-            const headers = jsonData[0];
-            const rows = jsonData.slice(1);
-
-            headers.forEach((header: string, index: number) => {
-              const values = rows
-                .map((row) => row[index])
-                .filter((v) => v !== undefined && v !== null);
-              result += `${header}: ${values.join(' | ')}.\n`;
-            });
-          }
-
-          result += '\n';
-        });
-
-        this.originalContent = result;
-        this.processOriginalContent();
-      };
-      reader.readAsArrayBuffer(file);
-    } else {
-      alert('Unsupported file type. Please upload .txt, .pdf, or .docx');
     }
   }
 
@@ -329,7 +376,10 @@ export class MaskingFile implements OnInit {
 
   processOriginalContent(): void {
     this.resetCategoryCounts();
-    this.maskPrivacy(this.originalContent).subscribe({
+    const masking$ = this.spreadsheet
+      ? this.maskSpreadsheet(this.spreadsheet)
+      : this.maskPrivacy(this.originalContent);
+    masking$.subscribe({
           next: (resultString) => {
             // This code runs ONLY after the API call is successful
             console.log("API call successful, result received!");
@@ -423,142 +473,74 @@ export class MaskingFile implements OnInit {
     this.replacementTermsRandomized = [];
   }
 
-  maskPrivacy(content: string): Observable<string> {
-    this.replacementLog = [];
-    if (this.selectedModel == 'explicit') {
-      return this.apiService.getPredictionsExplicit(content).pipe(
-        map((response) => {
-          const predictions = response.predictions;
-
-          if (!predictions) {
-            return content;
-          }
-
-          const sortedPredictions = predictions.sort(
-            (a: any, b: any) => a.start - b.start
-          );
-
-          let lastIndex = 0;
-          const maskedParts: string[] = [];
-          const localCategoryCounts: Record<string, number> = {};
-
-          sortedPredictions.forEach(
-            (p: {
-              word: string;
-              label: string;
-              start: number;
-              end: number;
-            }) => {
-              if (p.start > lastIndex) {
-                maskedParts.push(content.substring(lastIndex, p.start));
-              }
-
-              const category = p.label.replace(/^[BI]_/, '');
-              const count = localCategoryCounts[category] || 0;
-              localCategoryCounts[category] = count + 1;
-              const replacement =
-                count === 0 ? `[${category}]` : `[${category}_${count + 1}]`;
-
-              maskedParts.push(replacement);
+  // One text per spreadsheet: "Sheet: <name>", then one "<header>: <cell> | <cell>." line per column
+  flattenSpreadsheet(sheets: { sheetName: string; headers: string[]; columns: string[][] }[]): string {
+    let result = '';
+    sheets.forEach((sheet) => {
+      result += `Sheet: ${sheet.sheetName}\n`;
+      sheet.headers.forEach((header, index) => {
+        result += `${header}: ${sheet.columns[index].join(' | ')}.\n`;
+      });
+      result += '\n';
+    });
+    return result;
+  }
 
-              this.replacementLog.push({
-                original: p.word,
-                replaced: replacement,
-              });
+  // Spreadsheets are sent as columns of cells rather than as the flattened text, so a
+  // detection never runs across cells and a value repeated down a column is detected once.
+  // The backend masks the cells as /mask masks a document; they are flattened like the original.
+  maskSpreadsheet(sheets: { sheetName: string; headers: string[]; columns: string[][] }[]): Observable<string> {
+    this.replacementLog = [];
+    const columns = sheets.flatMap((sheet) =>
+      sheet.headers.map((header, index) => ({
+        name: `${sheet.sheetName}: ${header}`,
+        cells: sheet.columns[index],
+      }))
+    );
 
-              lastIndex = p.end;
-            }
-          );
+    return this.apiService.getPredictionsTable(columns, this.selectedModel, this.selectedModel).pipe(
+      map((response) => {
+        const mapping: { original: string; masked: string; label: string }[] = response.mapping ?? [];
 
-          if (lastIndex < content.length) {
-            maskedParts.push(content.substring(lastIndex));
+        mapping.forEach((entry) => {
+          if (this.selectedModel === 'implicit') {
+            this.categoryFromModel.push(entry.label);
           }
+          this.replacementLog.push({ original: entry.original, replaced: entry.masked });
+        });
 
-          const maskedCont = maskedParts.join('');
-
-          console.log('Log generated from API Explicit:', this.replacementLog);
-          return maskedCont;
-        })
-      );
-    } else {
-      // Implicit
-      return this.apiService.getPredictionsImplicit(content).pipe(
-//         map((response) => {
-//           const predictions = response.predictions;
-
-//           if (
-//             !predictions ||
-//             !Array.isArray(predictions) ||
-//             predictions.length === 0
-//           ) {
-//             return content;
-//           }
-        map(response => {
-            // The API now returns a list of objects with sentence, topics, start, and end
-            const predictions: any[] = response.predictions;
-
-            console.log("Received predictions from backend:", predictions);
-
-            console.log(response.predictions)
-            this.replacementLog = [];
-
-            // This handles cases where the API returns {} or an empty list [].
-            if (!predictions || !Array.isArray(predictions) || predictions.length === 0) {
-                return content;
-            }
-
-            // 3. Sort predictions in REVERSE order of their start position.
-            // This is critical to avoid messing up the indices of subsequent replacements.
-            const sortedPredictions = predictions.sort((a: any, b: any) => b.start - a.start);
-            let maskedCont = content;
-
-            // 4. Loop through the predictions and replace the original sentence with a mask
-            // sortedPredictions.forEach((prediction: { sentence: string, predicted_topics: string[], start: number, end: number }) => {
-            //     const topics = prediction.predicted_topics.join(', ');
-            //     const category = topics;
-            //     this.categoryFromModel.push(category);
-            //     const replacement = this.checkCategoryCount(category, prediction.sentence);
-            //     console.log("replace: " + prediction.sentence + " , " + replacement);
-
-            //     // Replace the content from start to end with the new mask
-            //     maskedCont = maskedCont.substring(0, prediction.start) + replacement + maskedCont.substring(prediction.end);
-
-            //     // Add a detailed entry to the log
-            //     this.replacementLog.push({ original: prediction.sentence, replaced: replacement });
-            // });
-
-          // Gunakan localCategoryCounts untuk API call ini
-          const localCategoryCounts: Record<string, number> = {};
-          sortedPredictions.forEach((prediction: any) => { // Treat each prediction as 'any' type
-
-            // --- THE KEY CHANGE IS HERE ---
-            // Extract the 'topic' string from each object in the array, then join.
-              const topics = prediction.predicted_topics
-                  .map((topicObj: any) => topicObj.topic) // Map the array of objects to an array of strings
-                  .join(', ');                            // Join the strings: "Card_Number, BankAccount"
-
-              const category = topics;
-              this.categoryFromModel.push(category);
-
-              // Gunakan localCategoryCounts
-              const count = localCategoryCounts[category] || 0;
-              localCategoryCounts[category] = count + 1;
-              const replacement =
-                count === 0 ? `[${category}]` : `[${category}_${count + 1}]`;
-
-              console.log(`Replacing sentence: "${prediction.sentence}" with mask: "${replacement}"`);
+        let columnIndex = 0;
+        const maskedSheets = sheets.map((sheet) => ({
+          ...sheet,
+          columns: sheet.columns.map((cells) => response.columns[columnIndex++].masked ?? cells),
+        }));
 
-              // This replacement logic is correct.
-              maskedCont = maskedCont.substring(0, prediction.start) + replacement + maskedCont.substring(prediction.end);
+        console.log(`Log generated from API ${this.selectedModel} (table):`, this.replacementLog, response.stats);
+        return this.flattenSpreadsheet(maskedSheets);
+      })
+    );
+  }
 
-              this.replacementLog.push({ original: prediction.sentence, replaced: replacement });
-          });
+  maskPrivacy(content: string): Observable<string> {
+    this.replacementLog = [];
+    // The backend detects the PII and replaces it with numbered placeholders ([Name], [Name_2], ...)
+    // in one pass; the mapping it returns is the replacement log. Spans found while ingesting
+    // the upload are masked as they are, without running the model again.
+    return this.apiService.mask(content, this.selectedModel, this.ingestedSpans?.[this.selectedModel] ?? null).pipe(
+      map((response) => {
+        const mapping: { original: string; masked: string; label: string }[] = response.mapping ?? [];
+
+        mapping.forEach((entry) => {
+          if (this.selectedModel === 'implicit') {
+            this.categoryFromModel.push(entry.label);
+          }
+          this.replacementLog.push({ original: entry.original, replaced: entry.masked });
+        });
 
-          console.log('Log generated from API Implicit:', this.replacementLog);
-          return maskedCont;
-        })
-      );
-    }
+        console.log(`Log generated from API ${this.selectedModel}:`, this.replacementLog);
+        return response.masked_text ?? content;
+      })
+    );
   }
 
   checkCategoryCount(category: string, word: string): string {
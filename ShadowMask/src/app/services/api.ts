@@ -1,12 +1,14 @@
 import { Injectable } from '@angular/core';
-import { HttpClient } from '@angular/common/http';
-import { Observable } from 'rxjs';
+import { HttpClient, HttpHeaders } from '@angular/common/http';
+import { Observable, forkJoin, map, of, switchMap, tap } from 'rxjs';
+import { LabelTables, decodeMsgpack, expandExplicit, expandImplicit } from './compact-decoder';
 
 @Injectable({
   providedIn: 'root'
 })
 export class ApiService {
   private apiUrl = 'http://localhost:8000'; // Your Python API address
+  private labelTables: LabelTables | null = null;
 
   constructor(private http: HttpClient) { }
 
@@ -20,4 +22,149 @@ export class ApiService {
     const body = { text: text };
     return this.http.post<any>(`${this.apiUrl}/predictImplicit`, body);
   }
+
+  // Runs both detectors in one call: { explicit, implicit, timings }
+  getPredictions(text: string): Observable<any> {
+    const body = { text: text };
+    return this.http.post<any>(`${this.apiUrl}/predict`, body);
+  }
+
+  // Same results as getPredictions, but transferred in the compact MessagePack format:
+  // no echoed text, label ids instead of names. The label tables are fetched once and
+  // again whenever the backend reports a different table version (after a model update).
+  getPredictionsCompact(text: string): Observable<any> {
+    const body = { text: text };
+    const headers = new HttpHeaders({ Accept: 'application/msgpack' });
+    return this.http.post(`${this.apiUrl}/predict`, body, { headers, responseType: 'arraybuffer' }).pipe(
+      map(buffer => decodeMsgpack(buffer)),
+      switchMap(compact => forkJoin([of(compact), this.getLabelTables(compact.table)])),
+      map(([compact, tables]) => ({
+        explicit: expandExplicit(compact.explicit, text, tables),
+        implicit: expandImplicit(compact.implicit, text, tables)
+      }))
+    );
+  }
+
+  private getLabelTables(version: string): Observable<LabelTables> {
+    if (this.labelTables && this.labelTables.version === version) {
+      return of(this.labelTables);
+    }
+    return this.http.get<LabelTables>(`${this.apiUrl}/labelTable`).pipe(
+      tap(tables => this.labelTables = tables)
+    );
+  }
+
+  // Masks the detected PII with numbered placeholders: { masked_text, mapping: [{ original, masked, label, start, end }] }
+  // Given spans ({ start, end, label }, code point offsets), masks those instead of running the model
+  mask(
+    text: string,
+    model: 'explicit' | 'implicit',
+    spans: { start: number; end: number; label: string }[] | null = null
+  ): Observable<any> {
+    const body = { text: text, model: model, spans: spans };
+    return this.http.post<any>(`${this.apiUrl}/mask`, body);
+  }
+
+  // Puts the originals of a masking log mapping back in place of their placeholders: { text, replacements }
+  unmask(text: string, mapping: { original: string; masked: string }[]): Observable<any> {
+    const body = { text: text, mapping: mapping };
+    return this.http.post<any>(`${this.apiUrl}/unmask`, body);
+  }
+
+  // Spreadsheet input: columns of cells, detected cell by cell (a repeated value only once).
+  // A column hint gives the label of every cell of the column, or 'none' for a column without PII.
+  // Returns { columns: [{ name, explicit?: results per cell, implicit?: results per cell }], stats }.
+  // With mask, the cells are also masked with that model's results, numbered as /mask does:
+  // every column gets its masked cells and the response the mapping ({ ..., column, row } per entry)
+  getPredictionsTable(
+    columns: { name: string; cells: (string | null)[]; hint?: string | null }[],
+    models: 'explicit' | 'implicit' | 'both' = 'both',
+    mask: 'explicit' | 'implicit' | null = null
+  ): Observable<any> {
+    const body = { columns: columns, models: models, mask: mask };
+    return this.http.post<any>(`${this.apiUrl}/predictTable`, body);
+  }
+
+  // Sends many documents in one call; results come back keyed by document id
+  getPredictionsBatch(documents: { id: string; text: string; models?: 'explicit' | 'implicit' | 'both' }[]): Observable<any> {
+    const body = { documents: documents };
+    return this.http.post<any>(`${this.apiUrl}/predictBatch`, body);
+  }
+
+  // Incremental detection: send the full text once, then only the edits made since the last call.
+  // Edit offsets refer to the text the backend last saw for that documentId.
+  getPredictionsIncremental(request: {
+    documentId?: string;
+    text?: string;
+    edits?: { start: number; end: number; text: string }[];
+    models?: 'explicit' | 'implicit' | 'both';
+  }): Observable<any> {
+    const body = {
+      document_id: request.documentId ?? null,
+      text: request.text ?? null,
+      edits: request.edits ?? [],
+      models: request.models ?? 'both'
+    };
+    return this.http.post<any>(`${this.apiUrl}/predictIncremental`, body);
+  }
+
+  // Streaming variants: emit every entity / sentence result as soon as the backend has it
+  streamPredictionsExplicit(text: string): Observable<any> {
+    return this.streamNdjson('/predictExplicitStream', { text: text });
+  }
+
+  streamPredictionsImplicit(text: string): Observable<any> {
+    return this.streamNdjson('/predictImplicitStream', { text: text });
+  }
+
+  // Uploads a PDF/DOCX/XLSX/CSV/TXT file for server-side extraction; emits one result per page
+  // (offsets in the page texts joined with '\n'), then a final { done, pages, characters } line
+  ingestDocument(file: File, models: 'explicit' | 'implicit' | 'both' = 'both'): Observable<any> {
+    const query = `filename=${encodeURIComponent(file.name)}&models=${models}`;
+    return this.streamNdjson(`/ingest?${query}`, file, file.type || 'application/octet-stream');
+  }
+
+  // Reads a newline-delimited JSON response and emits one parsed object per line
+  // (a Blob body is sent as is, anything else as JSON)
+  private streamNdjson(path: string, body: any, contentType = 'application/json'): Observable<any> {
+    return new Observable<any>(subscriber => {
+      const controller = new AbortController();
+
+      fetch(`${this.apiUrl}${path}`, {
+        method: 'POST',
+        headers: { 'Content-Type': contentType },
+        body: body instanceof Blob ? body : JSON.stringify(body),
+        signal: controller.signal
+      })
+        .then(async response => {
+          if (!response.ok || !response.body) {
+            throw new Error(`${path} failed with status ${response.status}`);
+          }
+
+          const reader = response.body.getReader();
+          const decoder = new TextDecoder();
+          let buffer = '';
+
+          while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop() ?? '';
+            for (const line of lines) {
+              if (line.trim()) subscriber.next(JSON.parse(line));
+            }
+          }
+
+          if (buffer.trim()) subscriber.next(JSON.parse(buffer));
+          subscriber.complete();
+        })
+        .catch(error => {
+          if (!controller.signal.aborted) subscriber.error(error);
+        });
+
+      return () => controller.abort();
+    });
+  }
 }
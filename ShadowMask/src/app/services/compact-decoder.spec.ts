@@ -0,0 +1,33 @@
+import { LabelTables, codePointSlicer, expandExplicit, expandImplicit } from './compact-decoder';
+
+describe('compact decoder', () => {
+  const tables: LabelTables = { version: 'test', explicit: ['Name', 'Phone_Number'], implicit: ['Med_Hist'] };
+
+  // Offsets as the backend computes them: code points of a Python str
+  const text = 'Hai 😀 Budi Santoso, telepon 0812 😀. Saya sakit.';
+  const points = Array.from(text);
+  const offsetOf = (part: string) => Array.from(text.slice(0, text.indexOf(part))).length;
+  const span = (part: string) => [offsetOf(part), offsetOf(part) + Array.from(part).length];
+
+  it('slices by code points', () => {
+    const slice = codePointSlicer(text);
+    const [start, end] = span('Budi Santoso');
+    expect(slice(start, end)).toBe('Budi Santoso');
+    expect(codePointSlicer('abc')(1, 3)).toBe('bc');
+  });
+
+  it('expands explicit entities after an astral character', () => {
+    const compact = { labels: [0, 1], offsets: [...span('Budi Santoso'), ...span('0812')] };
+    const entities = expandExplicit(compact, text, tables);
+    expect(entities.map(e => e.word)).toEqual(['Budi Santoso', '0812']);
+    expect(entities.map(e => [e.start, e.end])).toEqual([span('Budi Santoso'), span('0812')]);
+    expect(entities.map(e => e.label)).toEqual(['Name', 'Phone_Number']);
+  });
+
+  it('expands implicit sentences after an astral character', () => {
+    const compact = { offsets: span('Saya sakit.'), topic_counts: [1], topic_ids: [0], topic_scores: [0.9] };
+    const sentences = expandImplicit(compact, text, tables);
+    expect(sentences[0].sentence).toBe('Saya sakit.');
+    expect(sentences[0].predicted_topics).toEqual([{ topic: 'Med_Hist', score: 0.9 }]);
+  });
+});
@@ -0,0 +1,162 @@
+// Decoder for the compact prediction format of the backend (see python-backend/compact_format.py).
+// The backend leaves out every piece of text the client already has; these helpers put the
+// results back into the usual shape, using the original text and the label tables.
+
+export interface LabelTables {
+  version: string;
+  explicit: string[];
+  implicit: string[];
+}
+
+export interface ExplicitEntity {
+  word: string;
+  label: string;
+  start: number;
+  end: number;
+}
+
+export interface ImplicitSentence {
+  sentence: string;
+  predicted_topics: { topic: string; score: number }[];
+  start: number;
+  end: number;
+}
+
+// Minimal MessagePack decoder: nil, booleans, integers, floats, strings, binary, arrays and maps.
+// Binary values come back as Uint8Array.
+export function decodeMsgpack(buffer: ArrayBuffer): any {
+  const view = new DataView(buffer);
+  const bytes = new Uint8Array(buffer);
+  const text = new TextDecoder();
+  let position = 0;
+
+  const readString = (length: number) => {
+    const value = text.decode(bytes.subarray(position, position + length));
+    position += length;
+    return value;
+  };
+  const readBinary = (length: number) => {
+    const value = bytes.subarray(position, position + length);
+    position += length;
+    return value;
+  };
+  const readArray = (length: number) => {
+    const value = new Array(length);
+    for (let i = 0; i < length; i++) value[i] = read();
+    return value;
+  };
+  const readMap = (length: number) => {
+    const value: { [key: string]: any } = {};
+    for (let i = 0; i < length; i++) {
+      const key = read();
+      value[key] = read();
+    }
+    return value;
+  };
+
+  const read = (): any => {
+    const marker = bytes[position++];
+    if (marker < 0x80) return marker;
+    if (marker < 0x90) return readMap(marker & 0x0f);
+    if (marker < 0xa0) return readArray(marker & 0x0f);
+    if (marker < 0xc0) return readString(marker & 0x1f);
+    if (marker >= 0xe0) return marker - 0x100;
+
+    let value: any;
+    switch (marker) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: value = view.getUint8(position); position += 1; return readBinary(value);
+      case 0xc5: value = view.getUint16(position); position += 2; return readBinary(value);
+      case 0xc6: value = view.getUint32(position); position += 4; return readBinary(value);
+      case 0xca: value = view.getFloat32(position); position += 4; return value;
+      case 0xcb: value = view.getFloat64(position); position += 8; return value;
+      case 0xcc: value = view.getUint8(position); position += 1; return value;
+      case 0xcd: value = view.getUint16(position); position += 2; return value;
+      case 0xce: value = view.getUint32(position); position += 4; return value;
+      case 0xcf: value = Number(view.getBigUint64(position)); position += 8; return value;
+      case 0xd0: value = view.getInt8(position); position += 1; return value;
+      case 0xd1: value = view.getInt16(position); position += 2; return value;
+      case 0xd2: value = view.getInt32(position); position += 4; return value;
+      case 0xd3: value = Number(view.getBigInt64(position)); position += 8; return value;
+      case 0xd9: value = view.getUint8(position); position += 1; return readString(value);
+      case 0xda: value = view.getUint16(position); position += 2; return readString(value);
+      case 0xdb: value = view.getUint32(position); position += 4; return readString(value);
+      case 0xdc: value = view.getUint16(position); position += 2; return readArray(value);
+      case 0xdd: value = view.getUint32(position); position += 4; return readArray(value);
+      case 0xde: value = view.getUint16(position); position += 2; return readMap(value);
+      case 0xdf: value = view.getUint32(position); position += 4; return readMap(value);
+    }
+    throw new Error(`Unsupported MessagePack type 0x${marker.toString(16)}`);
+  };
+
+  return read();
+}
+
+// Integer arrays arrive as little-endian int32 binary (MessagePack) or as plain arrays (compact JSON).
+// The binary is copied first, since Int32Array needs a 4-byte aligned offset.
+function int32s(value: Uint8Array | number[]): ArrayLike<number> {
+  if (Array.isArray(value)) return value;
+  return new Int32Array(value.slice().buffer);
+}
+
+function float32s(value: Uint8Array | number[]): ArrayLike<number> {
+  if (Array.isArray(value)) return value;
+  return new Float32Array(value.slice().buffer);
+}
+
+// The backend counts offsets in code points (Python str), JS strings index UTF-16 code units:
+// returns the function that slices `text` between two code point offsets. Offsets stay in code
+// points in the results, the same values the JSON responses carry.
+export function codePointSlicer(text: string): (start: number, end: number) => string {
+  if (!/[\uD800-\uDFFF]/.test(text)) {
+    return (start, end) => text.slice(start, end);
+  }
+  // units[i]: the UTF-16 index of code point i
+  const units: number[] = [];
+  for (let unit = 0; unit < text.length; unit++) {
+    units.push(unit);
+    const code = text.charCodeAt(unit);
+    if (code >= 0xd800 && code <= 0xdbff && unit + 1 < text.length) {
+      const next = text.charCodeAt(unit + 1);
+      if (next >= 0xdc00 && next <= 0xdfff) unit++;
+    }
+  }
+  units.push(text.length);
+  const index = (offset: number) => units[Math.min(Math.max(offset, 0), units.length - 1)];
+  return (start, end) => text.slice(index(start), index(end));
+}
+
+export function expandExplicit(compact: any, text: string, tables: LabelTables): ExplicitEntity[] {
+  const labels = int32s(compact.labels);
+  const offsets = int32s(compact.offsets);
+  const slice = codePointSlicer(text);
+  const entities: ExplicitEntity[] = [];
+  for (let i = 0; i < labels.length; i++) {
+    const start = offsets[2 * i];
+    const end = offsets[2 * i + 1];
+    entities.push({ word: slice(start, end), label: tables.explicit[labels[i]], start, end });
+  }
+  return entities;
+}
+
+export function expandImplicit(compact: any, text: string, tables: LabelTables): ImplicitSentence[] {
+  const offsets = int32s(compact.offsets);
+  const counts = int32s(compact.topic_counts);
+  const topicIds = int32s(compact.topic_ids);
+  const scores = float32s(compact.topic_scores);
+  const slice = codePointSlicer(text);
+  const sentences: ImplicitSentence[] = [];
+  let topic = 0;
+  for (let i = 0; i < counts.length; i++) {
+    const start = offsets[2 * i];
+    const end = offsets[2 * i + 1];
+    const predicted_topics = [];
+    for (let j = 0; j < counts[i]; j++, topic++) {
+      predicted_topics.push({ topic: tables.implicit[topicIds[topic]], score: scores[topic] });
+    }
+    sentences.push({ sentence: slice(start, end), predicted_topics, start, end });
+  }
+  return sentences;
+}
@@ -5,6 +5,7 @@ import * as mammoth from 'mammoth';
 import * as XLSX from 'xlsx';
 import jsPDF from 'jspdf';
 import { Document, Packer, Paragraph } from 'docx';
+import { ApiService } from '../services/api';
 
 @Component({
   selector: 'app-unmasking-file',
@@ -44,7 +45,7 @@ export class UnmaskingFile {
 
   // highlightedContent: string = '';
 
-  constructor() {
+  constructor(private apiService: ApiService) {
     pdfjsLib.GlobalWorkerOptions.workerSrc = new URL(
       'pdfjs-dist/build/pdf.worker.min.mjs',
       import.meta.url,
@@ -391,53 +392,42 @@ export class UnmaskingFile {
     this.fileReady = false;
     this.isGenerating = true;
 
-    setTimeout(() => {
-      let unmasked = this.processedText;
+    // The backend finds every placeholder of the mapping in one pass over the text
+    this.apiService.unmask(this.processedText, this.maskedMapping).subscribe({
+      next: (response) => {
+        this.unmaskedResult = response.text;
+        this.resultContent = this.unmaskedResult;
 
-      // Replace full masked phrases (case sensitive exact match)
-      this.maskedMapping.forEach(pair => {
-        const masked = pair.masked;
-        const original = pair.original;
+        const processedTokens = this.processedText.split(/(\s+|\n)/).filter(t => t.length);
+        const resultTokens = this.unmaskedResult.split(/(\s+|\n)/).filter(t => t.length);
 
-        const escapedMasked = masked.replace(/[.*+?^${}()|[\]\\]/g, '\\$&'); // escape regex
+        this.processedTokensWithDiff = [];
+        this.resultTokensWithDiff = [];
 
-        // If masked word is long or contains brackets/symbols, allow in-word replacement
-        const isSafeToReplaceAnywhere = masked.length > 2 || /\W/.test(masked); // non-word character like [ ] or special chars
+        const len = Math.max(processedTokens.length, resultTokens.length);
+        for (let i = 0; i < processedTokens.length; i++) {
+          const pWord = processedTokens[i];
+          const rWord = resultTokens[i] || '';
 
-        const regex = isSafeToReplaceAnywhere
-          ? new RegExp(escapedMasked, 'g')                       // replace anywhere
-          : new RegExp(`\\b${escapedMasked}\\b`, 'g');           // word boundary only for short masked word
+          const isWhitespace = /^\s+$/.test(pWord);
+          const changed = isWhitespace ? false : pWord !== rWord;
 
-        unmasked = unmasked.replace(regex, original);
-      });
-
-      this.unmaskedResult = unmasked;
-      this.resultContent = this.unmaskedResult;
-
-      const processedTokens = this.processedText.split(/(\s+|\n)/).filter(t => t.length);
-      const resultTokens = this.unmaskedResult.split(/(\s+|\n)/).filter(t => t.length);
-
-      this.processedTokensWithDiff = [];
-      this.resultTokensWithDiff = [];
-
-      const len = Math.max(processedTokens.length, resultTokens.length);
-      for (let i = 0; i < processedTokens.length; i++) {
-        const pWord = processedTokens[i];
-        const rWord = resultTokens[i] || '';
+          this.processedTokensWithDiff.push({ word: pWord, changed });
+          this.resultTokensWithDiff.push({ word: rWord, changed });
+        }
 
-        const isWhitespace = /^\s+$/.test(pWord);
-        const changed = isWhitespace ? false : pWord !== rWord;
+        this.processedHighlightedContent = this.generateHighlightedContent(this.processedText, this.maskedMapping);
+        this.resultHighlightedContent = this.generateHighlightedContent(this.unmaskedResult, this.maskedMapping);
 
-        this.processedTokensWithDiff.push({ word: pWord, changed });
-        this.resultTokensWithDiff.push({ word: rWord, changed });
+        this.fileReady = true;
+        this.isGenerating = false;
+      },
+      error: (err) => {
+        console.error('API Error:', err);
+        this.isGenerating = false;
+        alert('Failed to connect to the unmasking API. Please ensure the backend is running.');
       }
-
-      this.processedHighlightedContent = this.generateHighlightedContent(this.processedText, this.maskedMapping);
-      this.resultHighlightedContent = this.generateHighlightedContent(this.unmaskedResult, this.maskedMapping);
-
-      this.fileReady = true;
-      this.isGenerating = false;
-    }, 300);
+    });
   }
 
   generateHighlightedContent(content: string, mapping: { original: string, masked: string }[]): string {